@@ -0,0 +1,67 @@
+# Benchmark of SQL statements of SQLQuery.py on a table converted to a
+# COLUMNAR file by CsvToColumns.py against the same statements on the CSV
+# file, as they ran before.
+#
+#     python benchmarks/columnar.py [posts [workers]]
+#
+#     posts  : Number of rows of the Posts table, 1000000 by default.
+#     workers: Number of workers, 1 by default.
+#
+# Needs NumPy. The Posts table is written in the CSV format of
+# datasets/cstheory_sample (see common.writeTables) and converted once. Every
+# statement scans the whole table. The wall time and peak memory of each run
+# are printed, and the results on both files compared.
+import os
+
+import common
+
+STATEMENTS = [
+    ("filter",
+     "SELECT Id, Score FROM Posts WHERE Score > 45 AND ViewCount < 100"),
+    ("text filter",
+     "SELECT Id FROM Posts WHERE Title > 'Question 99'"),
+    ("group by",
+     "SELECT PostTypeId, COUNT(*), AVG(Score), MAX(ViewCount) FROM Posts "
+     "GROUP BY PostTypeId"),
+    ("group by owner",
+     "SELECT OwnerUserId, SUM(Score) FROM Posts WHERE AnswerCount = 0 "
+     "GROUP BY OwnerUserId"),
+]
+
+# Writes a statement on the table fileName to an SQL file of SQLQuery.py.
+def writeStatement(sqlFileName, statement, fileName):
+    with open(sqlFileName, "w") as sql:
+        sql.write('<SQL>\n<Table name="Posts" file="%s" path="%s"/>\n%s\n'
+                  '</SQL>\n' % (os.path.basename(fileName),
+                                os.path.dirname(fileName), statement))
+
+def benchmark(posts="1000000", workers="1"):
+    directory = common.workDirectory("columnar")
+    outputPath = os.path.join(directory, "output.txt")
+    sqlFileName = os.path.join(directory, "statement.sql")
+    try:
+        usersFileName, postsFileName = common.writeTables(
+            directory, max(1, int(posts) // 10))
+        seconds, peak = common.runLab("mapred-lab2/CsvToColumns.py",
+                                      postsFileName)
+        common.report("%s posts, conversion" % posts, seconds, peak)
+        columnsFileName = os.path.splitext(postsFileName)[0] + ".columns"
+
+        for label, statement in STATEMENTS:
+            results = []
+            for fileFormat, fileName in (("CSV", postsFileName),
+                                         ("COLUMNAR", columnsFileName)):
+                writeStatement(sqlFileName, statement, fileName)
+                seconds, peak = common.runLab("mapred-lab2/SQLQuery.py",
+                                              sqlFileName, workers,
+                                              outputPath=outputPath)
+                results.append(common.sortedLines(outputPath))
+                common.report("%s, %s" % (label, fileFormat), seconds, peak,
+                              "%d rows" % len(results[-1]))
+            if results[0] != results[1]:
+                print("the results differ")
+    finally:
+        common.removeWorkDirectory(directory)
+
+if __name__ == '__main__':
+    common.main(benchmark, {})
@@ -0,0 +1,94 @@
+# Benchmark of the map-side combiner (combiner in MapReduce.execute) of
+# WordCount.py and SQLGroupBy.py against the same jobs without it, as they
+# ran before.
+#
+#     python benchmarks/combiner.py [megabytes [posts [budget]]]
+#
+#     megabytes: Size in MB of the scaled up text of the word count, 20 by
+#                default.
+#     posts    : Number of rows of the Posts table of SQLGroupBy.py, 1000000
+#                by default.
+#     budget   : Memory budget of the jobs in MB, 16 by default.
+#
+# The word count runs on the datasets/Swami_discourse texts repeated up to
+# the size (see tokenizer.py), SQLGroupBy.py on a synthetic Posts table (see
+# common.writeTables). Every job runs with and without its combiner, with all
+# the intermediate data in memory and under the memory budget. The wall
+# time, peak memory, shuffleBytes and spilledRuns (see the job report) of
+# every run are printed, and the results of the four runs of a job compared.
+import os
+import sys
+
+import common
+import mapreduce
+import tokenizer
+
+# Imports the program of a lab, such as ("mapred-lab1", "WordCount").
+def importLab(lab, program):
+    sys.path.insert(0, os.path.join(common.ROOT, lab))
+    return __import__(program)
+
+# The measured path: the job of an application ("WordCount" or
+# "SQLGroupBy") with its combiner or not ("combiner", "none"), and a budget
+# in MB or "none". Prints the shuffleBytes and spilledRuns of the job.
+def run(application, fileName, combining, budget, outputPath, reportPath):
+    if application == "WordCount":
+        job = importLab("mapred-lab1", "WordCount")
+        job.commonWords.extend(tokenizer.readStopWords("shipped"))
+        job.tokenizer = mapreduce.Tokenizer(job.commonWords)
+        fileFormat = "TEXT"
+        encoding = "cp1252"
+    else:
+        job = importLab("mapred-lab2", "SQLGroupBy")
+        with open(fileName) as table:
+            for position, name in enumerate(
+                    table.readline().rstrip("\n").split(",")):
+                job.columnNames[name] = position
+        fileFormat = "CSV-SkipFirstLine"
+        encoding = None
+    combiner = job.combiner if combining == "combiner" else None
+    memoryBudget = None if budget == "none" else int(budget)
+    job.mr.execute(fileName, job.mapper, job.reducer, fileFormat,
+                   combiner=combiner, memoryBudget=memoryBudget,
+                   encoding=encoding, outputPath=outputPath,
+                   report=reportPath)
+    counts = job.mr.counters.counts
+    print("%d shuffleBytes, %d spilledRuns" % (counts["shuffleBytes"],
+                                               counts["spilledRuns"]))
+
+def benchmark(megabytes="20", posts="1000000", budget="16"):
+    directory = common.workDirectory("combiner")
+    outputPath = os.path.join(directory, "output.txt")
+    statsPath = os.path.join(directory, "stats.txt")
+    reportPath = os.path.join(directory, "report.json")
+    try:
+        textFileName = os.path.join(directory, "discourse.txt")
+        tokenizer.scaleUp(textFileName, int(megabytes))
+        usersFileName, postsFileName = common.writeTables(
+            directory, max(1, int(posts) // 10))
+        for application, fileName, label in (
+                ("WordCount", textFileName, "WordCount, %s MB" % megabytes),
+                ("SQLGroupBy", postsFileName, "SQLGroupBy, %s posts" % posts)):
+            print(label)
+            results = []
+            for memoryBudget in ("none", budget):
+                for combining in ("none", "combiner"):
+                    seconds, peak = common.runPath(
+                        __file__, "run", application, fileName, combining,
+                        memoryBudget, outputPath, reportPath,
+                        outputPath=statsPath)
+                    with open(statsPath) as stats:
+                        common.report("  %s, %s" % (
+                            "in memory" if memoryBudget == "none"
+                            else "budget %s MB" % memoryBudget,
+                            "combiner" if combining == "combiner"
+                            else "no combiner"),
+                            seconds, peak, stats.read().strip())
+                    results.append(common.sortedLines(outputPath))
+            if any(result != results[0] for result in results):
+                print("the results of %s differ" % application)
+    finally:
+        common.removeWorkDirectory(directory)
+
+if __name__ == '__main__':
+    common.main(benchmark, {"run": run})
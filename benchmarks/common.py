@@ -0,0 +1,210 @@
+# Helpers of the benchmarks: running the paths a benchmark compares in
+# processes of their own, so that their wall time and peak memory are
+# measured apart, and writing the synthetic inputs they run on.
+#
+# A benchmark script measures a path by running itself again, as
+#
+#     python benchmark.py run <path> <arguments...>
+#
+# which calls the function of the path, see runPath and main. Inputs are
+# written to a temporary directory that is removed at the end, unless the
+# environment variable BENCHMARK_KEEP is set.
+import os
+import sys
+import bisect
+import random
+import itertools
+import shutil
+import tempfile
+import subprocess
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS)
+DATASETS = os.path.join(ROOT, "datasets")
+try:
+    import mapreduce
+except ImportError:
+    sys.path.insert(0, ROOT)
+    import mapreduce
+
+# Runs a command with its standard output written to outputPath, and its
+# standard error to errorPath if it is given. Returns its wall time in
+# seconds and the peak resident memory, in MB, of the largest of its
+# processes. The command is started by measure.py, so that the memory of the
+# benchmark is not counted in its peak.
+def runCommand(arguments, outputPath=os.devnull, cwd=None, errorPath=None):
+    resultFile, resultPath = tempfile.mkstemp(prefix="mapreduce-benchmark-")
+    os.close(resultFile)
+    try:
+        with open(outputPath, "w") as output:
+            errors = None if errorPath is None else open(errorPath, "w")
+            try:
+                returnCode = subprocess.call(
+                    [sys.executable, os.path.join(BENCHMARKS, "measure.py"),
+                     resultPath] + arguments,
+                    stdout=output, stderr=errors, cwd=cwd)
+            finally:
+                if errors is not None:
+                    errors.close()
+        if returnCode != 0:
+            raise RuntimeError("%s failed with exit code %d"
+                               % (" ".join(arguments), returnCode))
+        with open(resultPath) as result:
+            seconds, peakKB = result.read().split()
+    finally:
+        os.remove(resultPath)
+    return float(seconds), int(peakKB) / 1024.0
+
+# Runs a path of the benchmark script in a new process, see main.
+def runPath(script, path, *arguments, **options):
+    return runCommand([sys.executable, os.path.abspath(script), "run", path] +
+                      [str(argument) for argument in arguments], **options)
+
+# Runs a program of a lab, such as "mapred-lab1/WordCount.py", in its
+# directory.
+def runLab(program, *arguments, **options):
+    program = os.path.join(ROOT, program)
+    options.setdefault("cwd", os.path.dirname(program))
+    return runCommand([sys.executable, program] +
+                      [str(argument) for argument in arguments], **options)
+
+# Prints a line of results: what was measured, its time and peak memory, and
+# optionally more.
+def report(label, seconds, peakMB, note=""):
+    print("%-40s %8.2f s %8.1f MB  %s" % (label, seconds, peakMB, note))
+    sys.stdout.flush()
+
+# Returns a new directory for the inputs of a benchmark.
+def workDirectory(name):
+    return tempfile.mkdtemp(prefix="mapreduce-benchmark-%s-" % name)
+
+def removeWorkDirectory(directory):
+    if os.environ.get("BENCHMARK_KEEP"):
+        print("inputs kept in %s" % directory)
+    else:
+        shutil.rmtree(directory, True)
+
+# Runs a benchmark script: "run <path> <arguments...>" calls paths[path]
+# with the arguments, anything else calls benchmark with the arguments. The
+# run of a path is what runPath measures.
+def main(benchmark, paths):
+    if len(sys.argv) > 2 and sys.argv[1] == "run":
+        paths[sys.argv[2]](*sys.argv[3:])
+    else:
+        benchmark(*sys.argv[1:])
+
+# Returns the sorted lines of a file, to check that two paths give the same
+# result.
+def sortedLines(fileName):
+    with open(fileName) as lines:
+        return sorted(lines)
+
+# The IMAGE reader before it gave lazily decoded arrays: a record is the file
+# name and the list of all the pixels of the image. Benchmarks register it
+# under a format of their own to run the jobs before.
+def pixelListReader(fileName, start, end):
+    from PIL import Image
+    imageFile = Image.open(fileName)
+    try:
+        yield [fileName, list(imageFile.getdata())]
+    finally:
+        imageFile.close()
+
+# Returns the value of a counter of a job report printed to the file
+# fileName, as "report" makes the labs print it to standard error, or 0 if
+# the report has no such counter.
+def reportCounter(fileName, counter):
+    with open(fileName) as report:
+        for line in report:
+            name, separator, value = line.strip().partition(": ")
+            if name == counter:
+                return int(value)
+    return 0
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# Synthetic inputs.
+
+# Exponent of the Zipf distribution of the owners of skewed Posts: the user
+# of rank i, from 0, owns a share of the posts proportional to
+# 1 / (i + 1) ** ZIPF_EXPONENT.
+ZIPF_EXPONENT = 1.1
+
+# Writes count Users rows and count * postsPerUser Posts rows in the CSV
+# format of datasets/cstheory_sample. With skewed set, the owners of the
+# posts follow a Zipf distribution, so a few users own most of them, and
+# users gain 1000 of reputation per percent of the posts they own.
+def writeTables(directory, count, postsPerUser=10, skewed=False, seed=1):
+    randomness = random.Random(seed)
+    cumulativeShares = list(itertools.accumulate(
+        1.0 / (rank + 1) ** ZIPF_EXPONENT for rank in range(count)))
+    usersFileName = os.path.join(directory, "Users.csv")
+    postsFileName = os.path.join(directory, "Posts.csv")
+    with open(usersFileName, "w") as users:
+        users.write("TableName,Id,Reputation,DisplayName,UpVotes,DownVotes\n")
+        for userId in range(count):
+            reputation = int(10 ** randomness.uniform(0, 4))
+            if skewed:
+                reputation += int(100000 / (userId + 1) ** ZIPF_EXPONENT
+                                  / cumulativeShares[-1])
+            users.write("USERS,%d,%d,User %d,%d,%d\n" % (
+                userId, reputation, userId,
+                randomness.randrange(100), randomness.randrange(10)))
+    with open(postsFileName, "w") as posts:
+        posts.write("TableName,Id,PostTypeId,Score,ViewCount,OwnerUserId,"
+                    "AnswerCount,CommentCount,AcceptedAnswerId,CommentsCount,"
+                    "Title\n")
+        for postId in range(count * postsPerUser):
+            if skewed:
+                owner = min(bisect.bisect(cumulativeShares, randomness.random()
+                                          * cumulativeShares[-1]), count - 1)
+            else:
+                owner = randomness.randrange(count)
+            question = randomness.random() < 0.6
+            posts.write("POSTS,%d,%d,%d,%d,%d,%s,%d,,%s,%s\n" % (
+                postId, 1 if question else 2, randomness.randrange(-2, 50),
+                randomness.randrange(10, 5000), owner,
+                randomness.randrange(4) if question else "",
+                randomness.randrange(6),
+                randomness.randrange(3) if question else "",
+                "Question %d about topic %d" % (postId,
+                                                randomness.randrange(500))
+                if question else ""))
+    return usersFileName, postsFileName
+
+# Writes count variants of the images of datasets/images, which need Pillow:
+# each is brighter or darker, resized, blurred or slightly rotated, and saved
+# as PNG or JPEG. With size, a (width, height), the variants are scaled to
+# it. Returns the name of a file listing the variants, one per line, as
+# DuplicateImages.py reads them.
+def writeImageVariants(directory, count, size=None, seed=1):
+    from PIL import Image, ImageEnhance, ImageFilter
+    randomness = random.Random(seed)
+    imagesDirectory = os.path.join(DATASETS, "images")
+    originals = []
+    for name in sorted(os.listdir(imagesDirectory)):
+        with Image.open(os.path.join(imagesDirectory, name)) as image:
+            originals.append(image.convert("RGB"))
+    listFileName = os.path.join(directory, "images.txt")
+    with open(listFileName, "w") as imageList:
+        for index in range(count):
+            image = originals[index % len(originals)]
+            if size is not None:
+                image = image.resize(size)
+            change = randomness.randrange(4)
+            if change == 0:
+                image = ImageEnhance.Brightness(image).enhance(
+                    randomness.uniform(0.8, 1.2))
+            elif change == 1:
+                width, height = image.size
+                scale = randomness.uniform(0.7, 1.3)
+                image = image.resize((int(width * scale), int(height * scale)))
+            elif change == 2:
+                image = image.filter(ImageFilter.GaussianBlur(
+                    randomness.uniform(0.5, 1.5)))
+            else:
+                image = image.rotate(randomness.uniform(-3, 3))
+            fileName = os.path.join(directory, "variant%05d.%s" % (
+                index, randomness.choice(["png", "jpg"])))
+            image.save(fileName)
+            imageList.write(fileName + "\n")
+    return listFileName
@@ -0,0 +1,109 @@
+# Benchmark of DuplicateImages.py, which keys images on a 64 bit perceptual
+# hash and finds near duplicates with multi-index hashing, against the job it
+# replaced, which keyed images on the string of their whole pixel list.
+#
+#     python benchmarks/duplicates.py [count [distance]]
+#
+#     count   : Number of synthetic variants of datasets/images, 2000 by
+#               default.
+#     distance: Maximum Hamming distance of near duplicates, 6 by default.
+#
+# Needs Pillow and NumPy. The duplicate groups found by the job before and by
+# DuplicateImages.py are counted, variants that look the same but were
+# re-encoded, blurred or resized only fall into the same group with the hash.
+# The near duplicates found by DuplicateImages.py are checked against a
+# comparison of all the pairs of fingerprints. The wall time and peak memory
+# of every run are printed.
+import os
+import ast
+
+import common
+import mapreduce
+
+mr = mapreduce.MapReduce()
+
+# The job before: the key is the string of the pixel list.
+def pixelStringMapper(record):
+    mr.emit_intermediate(str(record[1]), record[0])
+
+def reducer(key, list_of_values):
+    mr.emit(",".join(list_of_values) + ",")
+
+def pixelString(listFileName, outputPath):
+    mapreduce.readers.registerReader("PIXELLIST", common.pixelListReader)
+    with open(listFileName) as imageList:
+        fileNames = [line.strip() for line in imageList]
+    mr.execute(fileNames, pixelStringMapper, reducer, "PIXELLIST",
+               outputPath=outputPath)
+
+# The near duplicates without an index: the fingerprint of every image, as
+# DuplicateImages.py computes it, is compared with all the others. Prints the
+# pairs found.
+def allPairs(listFileName, distance):
+    distance = int(distance)
+    hashes = []
+    with open(listFileName) as imageList:
+        for line in imageList:
+            record = mapreduce.readers.ImageRecord(line.strip())
+            levels = record.decode((64, 64), "L")
+            height, width = levels.shape
+            hashes.append((record[0], mapreduce.imagehash.differenceHash(
+                levels, (width, height), "L")))
+    for i in range(len(hashes)):
+        for j in range(i + 1, len(hashes)):
+            pairDistance = mapreduce.imagehash.hammingDistance(hashes[i][1],
+                                                               hashes[j][1])
+            if pairDistance <= distance:
+                print((hashes[i][0], hashes[j][0], pairDistance))
+
+# Returns the pairs of images of an output of near duplicates, in any order.
+def pairs(fileName):
+    with open(fileName) as lines:
+        return set((frozenset(pair[:2]), pair[2])
+                   for pair in map(ast.literal_eval, lines))
+
+def countLines(fileName):
+    with open(fileName) as lines:
+        return sum(1 for line in lines)
+
+def benchmark(count="2000", distance="6"):
+    directory = common.workDirectory("duplicates")
+    outputPath = os.path.join(directory, "output.txt")
+    try:
+        listFileName = common.writeImageVariants(directory, int(count))
+        cacheFileName = listFileName + ".fingerprints"
+        label = "%s images" % count
+
+        seconds, peak = common.runPath(__file__, "pixelString", listFileName,
+                                       outputPath)
+        common.report(label + ", pixel string key", seconds, peak,
+                      "%d groups" % countLines(outputPath))
+
+        seconds, peak = common.runLab("mapred-lab2/DuplicateImages.py",
+                                      listFileName, outputPath=outputPath)
+        common.report(label + ", hash key", seconds, peak,
+                      "%d groups" % countLines(outputPath))
+        os.remove(cacheFileName)
+
+        seconds, peak = common.runPath(__file__, "allPairs", listFileName,
+                                       distance, outputPath=outputPath)
+        expected = pairs(outputPath)
+        common.report(label + ", all pairs, d %s" % distance, seconds, peak,
+                      "%d pairs, %d comparisons" % (
+                          len(expected),
+                          int(count) * (int(count) - 1) // 2))
+
+        seconds, peak = common.runLab("mapred-lab2/DuplicateImages.py",
+                                      listFileName, distance,
+                                      outputPath=outputPath)
+        found = pairs(outputPath)
+        common.report(label + ", multi-index hashing, d %s" % distance,
+                      seconds, peak, "%d pairs" % len(found))
+        if found != expected:
+            print("the near duplicates differ")
+    finally:
+        common.removeWorkDirectory(directory)
+
+if __name__ == '__main__':
+    common.main(benchmark, {"pixelString": pixelString,
+                            "allPairs": allPairs})
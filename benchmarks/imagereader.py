@@ -0,0 +1,74 @@
+# Benchmark of the IMAGE reader, which gives mappers lazily decoded NumPy
+# pixels (see ImageRecord), against the reader before, which gave them the
+# list of all the pixels of the image.
+#
+#     python benchmarks/imagereader.py [count [size [workers]]]
+#
+#     count  : Number of synthetic variants of datasets/images, 500 by
+#              default.
+#     size   : Width and height of the variants, 512 by default.
+#     workers: Comma separated numbers of workers, 1,4 by default.
+#
+# Needs Pillow and NumPy. The job gives every image to a mapper that uses
+# its pixels: the pixel list of the reader before, the array of the IMAGE
+# reader, or a 64x64 copy decoded at a reduced scale with
+# ImageRecord.decode. The images per second of each job, its wall time and
+# peak memory are printed.
+import os
+import time
+
+import common
+import mapreduce
+
+mr = mapreduce.MapReduce()
+
+def pixelListMapper(record):
+    mr.emit_intermediate(len(record[1]) > 0, 1)
+
+def arrayMapper(record):
+    mr.emit_intermediate(record[1].size > 0, 1)
+
+def scaledMapper(record):
+    mr.emit_intermediate(record.decode((64, 64)).size > 0, 1)
+
+def reducer(key, list_of_values):
+    mr.emit((key, len(list_of_values)))
+
+MAPPERS = {"pixelList": (pixelListMapper, "PIXELLIST"),
+           "array": (arrayMapper, "IMAGE"),
+           "scaled": (scaledMapper, "IMAGE")}
+
+# The measured path: the job with the mapper of a reader, see MAPPERS.
+# Prints the images per second of the job.
+def read(listFileName, mapperName, numWorkers):
+    mapreduce.readers.registerReader("PIXELLIST", common.pixelListReader)
+    with open(listFileName) as imageList:
+        fileNames = [line.strip() for line in imageList]
+    mapper, fileFormat = MAPPERS[mapperName]
+    start = time.perf_counter()
+    mr.execute(fileNames, mapper, reducer, fileFormat,
+               numWorkers=int(numWorkers), outputPath=os.devnull)
+    print("%.0f images/s" % (len(fileNames) / (time.perf_counter() - start)))
+
+def benchmark(count="500", size="512", workers="1,4"):
+    directory = common.workDirectory("imagereader")
+    outputPath = os.path.join(directory, "output.txt")
+    try:
+        listFileName = common.writeImageVariants(directory, int(count),
+                                                 (int(size), int(size)))
+        for numWorkers in workers.split(","):
+            for label, mapperName in (("pixel list", "pixelList"),
+                                      ("array", "array"),
+                                      ("64x64 decode", "scaled")):
+                seconds, peak = common.runPath(__file__, "read", listFileName,
+                                               mapperName, numWorkers,
+                                               outputPath=outputPath)
+                with open(outputPath) as output:
+                    common.report("%s images, %s workers, %s" % (
+                                      count, numWorkers, label),
+                                  seconds, peak, output.read().strip())
+    finally:
+        common.removeWorkDirectory(directory)
+
+if __name__ == '__main__':
+    common.main(benchmark, {"read": read})
@@ -0,0 +1,45 @@
+# Benchmark of the join strategies of SQLJoin.py: the reduce-side join it
+# always ran before, the semijoin and the broadcast join.
+#
+#     python benchmarks/join.py [users [postsPerUser]]
+#
+#     users       : Comma separated numbers of users, 10000,100000 by default.
+#     postsPerUser: Number of posts per user, 10 by default.
+#
+# The Users and Posts tables are written in the CSV format of
+# datasets/cstheory_sample (see common.writeTables). The wall time, peak
+# memory and shuffleBytes (the data the shuffle moves, see the job report)
+# of every strategy are printed, and their results compared.
+import os
+
+import common
+
+STRATEGIES = ["reduce", "semijoin", "broadcast"]
+
+def benchmark(users="10000,100000", postsPerUser="10"):
+    directory = common.workDirectory("join")
+    outputPath = os.path.join(directory, "output.txt")
+    errorPath = os.path.join(directory, "report.txt")
+    try:
+        for count in [int(userCount) for userCount in users.split(",")]:
+            usersFileName, postsFileName = common.writeTables(
+                directory, count, int(postsPerUser))
+            label = "%d users, %d posts" % (count, count * int(postsPerUser))
+            results = []
+            for strategy in STRATEGIES:
+                seconds, peak = common.runLab("mapred-lab2/SQLJoin.py",
+                                              usersFileName, postsFileName,
+                                              strategy, 0.01, "report",
+                                              outputPath=outputPath,
+                                              errorPath=errorPath)
+                common.report("%s, %s" % (label, strategy), seconds, peak,
+                              "%d shuffleBytes" % common.reportCounter(
+                                  errorPath, "shuffleBytes"))
+                results.append(common.sortedLines(outputPath))
+            if any(result != results[0] for result in results):
+                print("the results differ")
+    finally:
+        common.removeWorkDirectory(directory)
+
+if __name__ == '__main__':
+    common.main(benchmark, {})
@@ -0,0 +1,108 @@
+# Benchmark of the block multiplication of MatrixMultiply.py against the
+# multiplication it replaced, which sent every cell of A to every cell of
+# its row of the result and every cell of B to every cell of its column.
+#
+#     python benchmarks/matrix.py [sizes [density]]
+#
+#     sizes  : Comma separated sizes n of the n x n matrices A and B,
+#              50,100,200 by default.
+#     density: Share of the cells that are not 0 and are therefore in the
+#              input, 0.2 by default.
+#
+# The wall time, peak memory and shuffleBytes (the data the shuffle moves,
+# see the job report) of both are printed, and their results compared.
+import os
+import ast
+import random
+
+import common
+import mapreduce
+
+def writeMatrices(fileName, size, density):
+    randomness = random.Random(size)
+    with open(fileName, "w") as cells:
+        for matrix in "AB":
+            for row in range(size):
+                for column in range(size):
+                    if randomness.random() < density:
+                        cells.write("%s,%d,%d,%d\n" % (
+                            matrix, row, column, randomness.randint(1, 9)))
+
+mr = mapreduce.MapReduce()
+
+# Number of rows and columns of the matrices.
+dimension = 0
+
+# The multiplication before: one reducer per cell of the result, given the
+# row of A and the column of B it needs.
+def fanOutMapper(record):
+    if record[0] == "A":
+        for column in range(dimension):
+            mr.emit_intermediate((record[1], str(column)), record)
+    else:
+        for row in range(dimension):
+            mr.emit_intermediate((str(row), record[2]), record)
+
+def fanOutReducer(key, list_of_values):
+    total = 0
+    cellsOfA = [cell for cell in list_of_values if cell[0] == "A"]
+    cellsOfB = [cell for cell in list_of_values if cell[0] == "B"]
+    for cellA in cellsOfA:
+        for cellB in cellsOfB:
+            if cellA[2] == cellB[1]:
+                total = total + int(cellA[3]) * int(cellB[3])
+    mr.emit((key[0], key[1], total))
+
+# The measured path of the multiplication before. Prints its shuffleBytes.
+def fanOut(fileName, matrixSize, outputPath, reportPath):
+    global dimension
+    dimension = int(matrixSize)
+    mr.execute(fileName, fanOutMapper, fanOutReducer, "CSV",
+               outputPath=outputPath, report=reportPath)
+    print("%d shuffleBytes" % mr.counters.counts["shuffleBytes"])
+
+# Returns the non-zero cells of a result, as printed by both.
+def resultCells(fileName):
+    cells = set()
+    with open(fileName) as lines:
+        for line in lines:
+            row, column, value = ast.literal_eval(line)
+            if value:
+                cells.add((int(row), int(column), value))
+    return cells
+
+def benchmark(sizes="50,100,200", density="0.2"):
+    directory = common.workDirectory("matrix")
+    outputPath = os.path.join(directory, "output.txt")
+    errorPath = os.path.join(directory, "errors.txt")
+    statsPath = os.path.join(directory, "stats.txt")
+    try:
+        for matrixSize in [int(size) for size in sizes.split(",")]:
+            fileName = os.path.join(directory, "matrix%d.csv" % matrixSize)
+            writeMatrices(fileName, matrixSize, float(density))
+            label = "%dx%d, density %s" % (matrixSize, matrixSize, density)
+
+            seconds, peak = common.runPath(
+                __file__, "fanOut", fileName, matrixSize, outputPath,
+                os.path.join(directory, "report.json"), outputPath=statsPath)
+            with open(statsPath) as stats:
+                shuffle = stats.read().strip()
+            common.report(label + ", cell fan-out", seconds, peak, shuffle)
+            expected = resultCells(outputPath)
+
+            seconds, peak = common.runLab("mapred-lab1/MatrixMultiply.py",
+                                          fileName, 256, "block", "report",
+                                          outputPath=outputPath,
+                                          errorPath=errorPath)
+            with open(errorPath) as errors:
+                shuffle = errors.read().strip().splitlines()[-1]
+            common.report(label + ", blocks", seconds, peak,
+                          shuffle.split(": ")[-1])
+            if resultCells(outputPath) != expected:
+                print("the results differ")
+            os.remove(fileName)
+    finally:
+        common.removeWorkDirectory(directory)
+
+if __name__ == '__main__':
+    common.main(benchmark, {"fanOut": fanOut})
@@ -0,0 +1,25 @@
+# Runs a command and writes its wall time in seconds and its peak resident
+# memory in KB to a file, see common.runCommand:
+#
+#     python measure.py <result file> <command...>
+#
+# The peak memory of a process starts at that of the process it was forked
+# from, even after it executes another program. The command is therefore
+# started from this small process rather than from the benchmark, whose
+# memory grows with the results it holds. Only the standard library is
+# imported, to keep this process small.
+import os
+import sys
+import time
+import subprocess
+
+if __name__ == '__main__':
+    start = time.perf_counter()
+    process = subprocess.Popen(sys.argv[2:])
+    pid, status, usage = os.wait4(process.pid, 0)
+    seconds = time.perf_counter() - start
+    with open(sys.argv[1], "w") as result:
+        result.write("%f %d\n" % (seconds, usage.ru_maxrss))
+    if os.WIFEXITED(status):
+        sys.exit(os.WEXITSTATUS(status))
+    sys.exit(128 + os.WTERMSIG(status))
@@ -0,0 +1,152 @@
+# Benchmark of the friend-of-a-friend book recommendations of
+# recommedBooks.py and BookIndex.py against the job recommedBooks.py ran
+# before, which keyed its reducer on pairs of books and compared their
+# lists in nested loops.
+#
+#     python benchmarks/recommend.py [small [large [degree]]]
+#
+#     small : Number of books of the graph all three run on, 3000 by
+#             default. The job before is too slow for more.
+#     large : Number of books of the graph only recommedBooks.py and
+#             BookIndex.py run on, 200000 by default.
+#     degree: Average number of books borrowed with a book, 20 by default.
+#
+# The circulation graphs are written in the csv format of
+# datasets/library_sample/extractBookBuddiesToCSV.py, a few popular books
+# being borrowed with many others. On the small graph, without weights, the
+# books recommended for every book by the job before and by
+# recommedBooks.py are compared. On both, the top 10 of recommedBooks.py
+# and BookIndex.py are compared. The wall time and peak memory of every run
+# are printed.
+import os
+import ast
+import random
+
+import common
+import mapreduce
+
+# Number of recommendations per book of recommedBooks.py, large enough for
+# all of them when they are compared with the job before.
+ALL = 1000000
+
+# Writes a graph of count books, each borrowed with about degree others.
+# Popular books have small numbers. With weighted set, every book of a list
+# is followed by :weight, the number of times both were borrowed together.
+def writeCirculation(fileName, count, degree, weighted):
+    randomness = random.Random(count)
+    buddies = [dict() for book in range(count)]
+    for book in range(count):
+        for edge in range(degree // 2):
+            buddy = int(count * randomness.random() ** 2)
+            if buddy != book:
+                weight = randomness.randint(1, 30)
+                buddies[book][buddy] = weight
+                buddies[buddy][book] = weight
+    edges = 0
+    with open(fileName, "w") as circulation:
+        for book in range(count):
+            if not buddies[book]:
+                continue
+            edges += len(buddies[book])
+            if weighted:
+                fields = ["B%07d:%d" % item for item in buddies[book].items()]
+            else:
+                fields = ["B%07d" % buddy for buddy in buddies[book]]
+            circulation.write(",".join(["B%07d" % book] + fields) + "\n")
+    return edges
+
+mr = mapreduce.MapReduce()
+
+# The job before: the reducer of the pair (A, B) gets the lists of A and B.
+def pairMapper(record):
+    mainBook = record[0]
+    for reco in record[1:]:
+        if mainBook < reco:
+            key = (mainBook, reco)
+        else:
+            key = (reco, mainBook)
+        mr.emit_intermediate(key, record)
+
+def pairReducer(key, list_of_values):
+    bookA = key[0]
+    bookB = key[1]
+    firstLevelRecosForA = []
+    firstLevelRecosForB = []
+    for item in list_of_values:
+        if item[0] == bookA:
+            firstLevelRecosForA = item
+        else:
+            firstLevelRecosForB = item
+    newRecosForA = [bookA]
+    newRecosForB = [bookB]
+    for itemB in firstLevelRecosForB:
+        for itemA in firstLevelRecosForA:
+            if (itemB != itemA) and (itemB not in firstLevelRecosForA) and (itemB not in newRecosForA):
+                newRecosForA.append(itemB)
+    if len(newRecosForA) > 1:
+        mr.emit(newRecosForA)
+    for itemA in firstLevelRecosForA:
+        for itemB in firstLevelRecosForB:
+            if (itemA != itemB) and (itemA not in firstLevelRecosForB) and (itemA not in newRecosForB):
+                newRecosForB.append(itemA)
+    if len(newRecosForB) > 1:
+        mr.emit(newRecosForB)
+
+def pairs(fileName):
+    mr.execute(fileName, pairMapper, pairReducer, "CSV")
+
+# Returns book -> set of the books recommended for it, from the output of
+# the job before or of recommedBooks.py.
+def recommendedBooks(fileName):
+    books = {}
+    with open(fileName) as lines:
+        for line in lines:
+            value = ast.literal_eval(line)
+            if isinstance(value, tuple):
+                books.setdefault(value[0], set()).update(
+                    isbn for isbn, score in value[1])
+            else:
+                books.setdefault(value[0], set()).update(value[1:])
+    return books
+
+def benchmark(small="3000", large="200000", degree="20"):
+    directory = common.workDirectory("recommend")
+    outputPath = os.path.join(directory, "output.txt")
+    try:
+        for count, weighted in ((int(small), False), (int(large), True)):
+            fileName = os.path.join(directory, "circulation%d.csv" % count)
+            edges = writeCirculation(fileName, count, int(degree), weighted)
+            print("%d books, %d edges" % (count, edges))
+
+            if not weighted:
+                seconds, peak = common.runPath(__file__, "pairs", fileName,
+                                               outputPath=outputPath)
+                common.report("  pairs, all", seconds, peak)
+                expected = recommendedBooks(outputPath)
+                seconds, peak = common.runLab("mapred-lab3/recommedBooks.py",
+                                              fileName, ALL,
+                                              outputPath=outputPath)
+                common.report("  recommedBooks.py, all", seconds, peak)
+                if recommendedBooks(outputPath) != expected:
+                    print("the recommended books differ")
+
+            seconds, peak = common.runLab("mapred-lab3/recommedBooks.py",
+                                          fileName, outputPath=outputPath)
+            common.report("  recommedBooks.py, top 10", seconds, peak)
+            expected = common.sortedLines(outputPath)
+
+            seconds, peak = common.runLab("mapred-lab3/BookIndex.py",
+                                          fileName, "B0000000",
+                                          errorPath=os.devnull)
+            common.report("  BookIndex.py, index", seconds, peak)
+            seconds, peak = common.runLab("mapred-lab3/BookIndex.py",
+                                          fileName, "all",
+                                          outputPath=outputPath)
+            common.report("  BookIndex.py, top 10", seconds, peak)
+            if common.sortedLines(outputPath) != expected:
+                print("the top 10 differ")
+    finally:
+        common.removeWorkDirectory(directory)
+
+if __name__ == '__main__':
+    common.main(benchmark, {"pairs": pairs})
@@ -0,0 +1,102 @@
+# Benchmark of the salting of hot keys in the reduce-side join of
+# SQLJoin.py, on a Posts table whose owners follow a Zipf distribution,
+# against the same join without salting, as it ran before.
+#
+#     python benchmarks/skew.py [users [postsPerUser [workers]]]
+#
+#     users       : Number of users, 50000 by default.
+#     postsPerUser: Average number of posts per user, 20 by default.
+#     workers     : Number of workers, 4 by default.
+#
+# The values given to the reducer of SQLJoin.py and the time spent in it are
+# added up per reduce partition. The partition of a worker that gets a hot
+# key is much larger than the others and sets the time of the reduce phase
+# when the workers run on separate cores. The values and reduce time of
+# every partition, their max / mean, the most values of a key and the wall
+# time of each join are printed, and their results compared.
+import os
+import sys
+import json
+import time
+
+import common
+import mapreduce
+
+sys.path.insert(0, os.path.join(common.ROOT, "mapred-lab2"))
+import SQLJoin
+
+# Returns column name -> position of the header of a CSV file.
+def columns(fileName):
+    with open(fileName) as table:
+        return dict((name, position) for position, name
+                    in enumerate(table.readline().rstrip("\n").split(",")))
+
+numWorkers = 1
+
+def timedReducer(key, list_of_values):
+    start = time.perf_counter()
+    SQLJoin.reducer(key, list_of_values)
+    partition = mapreduce.engine.partitionFor(key, numWorkers)
+    SQLJoin.mr.increment("reduceSeconds%d" % partition,
+                         time.perf_counter() - start)
+    SQLJoin.mr.increment("reduceValues%d" % partition, len(list_of_values))
+
+# The measured path: the reduce-side join, salted or not ("salted",
+# "unsalted"). Prints the values and reduce time of every partition and the
+# most values of a key.
+def join(usersFileName, postsFileName, salting, workers, outputPath,
+         reportPath):
+    global numWorkers
+    numWorkers = int(workers)
+    SQLJoin.usersTblColumns.update(columns(usersFileName))
+    SQLJoin.postsTblColumns.update(columns(postsFileName))
+    if salting == "salted":
+        SQLJoin.findHotKeys(postsFileName)
+    SQLJoin.mr.execute([usersFileName, postsFileName], SQLJoin.mapper,
+                       timedReducer, "CSV-SkipFirstLine",
+                       numWorkers=numWorkers, outputPath=outputPath,
+                       report=reportPath)
+    with open(reportPath) as report:
+        report = json.load(report)
+    counters = report["applicationCounters"]
+    seconds = [counters.get("reduceSeconds%d" % partition, 0.0)
+               for partition in range(numWorkers)]
+    values = [counters.get("reduceValues%d" % partition, 0)
+              for partition in range(numWorkers)]
+    print("%d hot keys, heaviest key %d values" % (
+        len(SQLJoin.saltsOfHotKey), report["heaviestKeys"][0][1]))
+    print("reduce values %s, max / mean %.2f" % (
+        " ".join("%d" % partitionValues for partitionValues in values),
+        max(values) / (sum(values) / len(values))))
+    print("reduce time %s s, max / mean %.2f" % (
+        " ".join("%.2f" % partitionSeconds for partitionSeconds in seconds),
+        max(seconds) / (sum(seconds) / len(seconds))))
+
+def benchmark(users="50000", postsPerUser="20", workers="4"):
+    directory = common.workDirectory("skew")
+    outputPath = os.path.join(directory, "output.txt")
+    statsPath = os.path.join(directory, "stats.txt")
+    reportPath = os.path.join(directory, "report.json")
+    try:
+        usersFileName, postsFileName = common.writeTables(
+            directory, int(users), int(postsPerUser), skewed=True)
+        results = []
+        for salting in ("unsalted", "salted"):
+            seconds, peak = common.runPath(__file__, "join", usersFileName,
+                                           postsFileName, salting, workers,
+                                           outputPath, reportPath,
+                                           outputPath=statsPath)
+            with open(statsPath) as stats:
+                common.report("%s users, %s workers, %s" % (users, workers,
+                                                            salting),
+                              seconds, peak)
+                for line in stats:
+                    print("  " + line.rstrip("\n"))
+            results.append(common.sortedLines(outputPath))
+        if results[0] != results[1]:
+            print("the results differ")
+    finally:
+        common.removeWorkDirectory(directory)
+
+if __name__ == '__main__':
+    common.main(benchmark, {"join": join})
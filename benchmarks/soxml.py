@@ -0,0 +1,81 @@
+# Benchmark of the SOXML reader, which parses StackExchange dumps
+# incrementally, against parsing the whole tree first as the reader did
+# before.
+#
+#     python benchmarks/soxml.py [megabytes]
+#
+#     megabytes: Size in MB of every scaled up dump, 50 by default.
+#
+# The Posts, Comments, Votes and PostHistory files of
+# datasets/cstheory_sample are scaled up by repeating their rows, and every
+# file is read with both readers. The rows per second, MB per second and
+# peak memory of each run are printed.
+import os
+import time
+import xml.etree.ElementTree as ET
+
+import common
+import mapreduce
+
+SAMPLES = ["Posts", "Comments", "Votes", "PostHistory"]
+
+# Writes the rows of a sample dump again and again, up to about megabytes.
+def scaleUp(sampleFileName, fileName, megabytes):
+    with open(sampleFileName, encoding="utf-8-sig") as sample:
+        lines = sample.readlines()
+    rows = [line for line in lines if line.lstrip().startswith("<row ")]
+    head = lines[:lines.index(rows[0])]
+    tail = lines[lines.index(rows[-1]) + 1:]
+    rowBytes = sum(len(row.encode("utf-8")) for row in rows)
+    with open(fileName, "w", encoding="utf-8") as dump:
+        dump.writelines(head)
+        for repeat in range(max(1, megabytes * 1024 * 1024 // rowBytes)):
+            dump.writelines(rows)
+        dump.writelines(tail)
+
+# The reader before: the whole tree is parsed, then its rows are read.
+def treeRows(fileName):
+    for element in ET.parse(fileName).getroot():
+        if element.tag == "row":
+            yield element.attrib
+
+# The measured paths: count the rows read, and print how fast.
+def countRows(rows, fileName):
+    start = time.perf_counter()
+    count = 0
+    for row in rows:
+        count += 1
+    seconds = time.perf_counter() - start
+    print("%d rows, %.0f rows/s, %.1f MB/s" % (
+        count, count / seconds,
+        os.path.getsize(fileName) / seconds / 1024 / 1024))
+
+def readTree(fileName):
+    countRows(treeRows(fileName), fileName)
+
+def readIncrementally(fileName):
+    countRows(mapreduce.readers.readRecords(fileName, "SOXML"), fileName)
+
+def benchmark(megabytes="50"):
+    directory = common.workDirectory("soxml")
+    try:
+        for name in SAMPLES:
+            fileName = os.path.join(directory, name + ".xml")
+            scaleUp(os.path.join(common.DATASETS, "cstheory_sample",
+                                 name + "_Sample.xml"),
+                    fileName, int(megabytes))
+            for label, path in (("whole tree", "readTree"),
+                                ("incremental", "readIncrementally")):
+                outputPath = os.path.join(directory, "output.txt")
+                seconds, peak = common.runPath(__file__, path, fileName,
+                                               outputPath=outputPath)
+                with open(outputPath) as output:
+                    common.report("%s, %s" % (name, label), seconds, peak,
+                                  output.read().strip())
+            os.remove(fileName)
+    finally:
+        common.removeWorkDirectory(directory)
+
+if __name__ == '__main__':
+    common.main(benchmark, {"readTree": readTree,
+                            "readIncrementally": readIncrementally})
@@ -0,0 +1,72 @@
+# Benchmark of spilling intermediate data to sorted runs on disk under a
+# memory budget (memoryBudget in MapReduce.execute).
+#
+#     python benchmarks/spill.py [sizes [budget]]
+#
+#     sizes : Comma separated sizes of the input in MB, 25,50,100 by default.
+#     budget: Memory budget of the job in MB, 32 by default.
+#
+# The job groups the lines of a synthetic file by key, every value being a
+# whole line, as SQLJoin.py does with its records. It runs with all the
+# intermediate data in memory, as every job did before, and under the
+# memory budget. The peak memory of the first grows with the input, that of
+# the second stays about flat.
+import os
+import random
+
+import common
+import mapreduce
+
+# Number of distinct keys of the input.
+KEY_COUNT = 100000
+
+def writeInput(fileName, megabytes):
+    randomness = random.Random(megabytes)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    payloads = ["".join(randomness.choice(letters) for index in range(80))
+                for payload in range(1000)]
+    size = 0
+    with open(fileName, "w") as lines:
+        while size < megabytes * 1024 * 1024:
+            line = "key%06d,%s\n" % (randomness.randrange(KEY_COUNT),
+                                     randomness.choice(payloads))
+            lines.write(line)
+            size += len(line)
+
+mr = mapreduce.MapReduce()
+
+def mapper(record):
+    mr.emit_intermediate(record[:record.index(",")], record)
+
+def reducer(key, list_of_values):
+    mr.emit((key, len(list_of_values)))
+
+# The measured path: the job, with a budget in MB or "none".
+def group(fileName, budget, outputPath):
+    memoryBudget = None if budget == "none" else int(budget)
+    mr.execute(fileName, mapper, reducer, "TEXT", memoryBudget=memoryBudget,
+               outputPath=outputPath)
+
+def benchmark(sizes="25,50,100", budget="32"):
+    directory = common.workDirectory("spill")
+    try:
+        for megabytes in [int(size) for size in sizes.split(",")]:
+            fileName = os.path.join(directory, "input%d.txt" % megabytes)
+            writeInput(fileName, megabytes)
+            results = []
+            for label, memoryBudget in (("in memory", "none"),
+                                        ("budget %s MB" % budget, budget)):
+                outputPath = os.path.join(directory, "output.txt")
+                seconds, peak = common.runPath(__file__, "group", fileName,
+                                               memoryBudget, outputPath)
+                common.report("%d MB input, %s" % (megabytes, label),
+                              seconds, peak)
+                results.append(common.sortedLines(outputPath))
+            if results[0] != results[1]:
+                print("the results differ")
+            os.remove(fileName)
+    finally:
+        common.removeWorkDirectory(directory)
+
+if __name__ == '__main__':
+    common.main(benchmark, {"group": group})
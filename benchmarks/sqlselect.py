@@ -0,0 +1,85 @@
+# Benchmark of SQLSelect.py, a map-only job whose reader checks the WHERE
+# clause before splitting the rest of the line, against the job it replaced,
+# which shuffled every post with an AnswerCount and kept the key '0' in the
+# reducer.
+#
+#     python benchmarks/sqlselect.py [posts [workers]]
+#
+#     posts  : Number of rows of the Posts table, 1000000 by default.
+#     workers: Number of workers of SQLSelect.py, 1 by default.
+#
+# The Posts table is written in the CSV format of datasets/cstheory_sample
+# (see common.writeTables). Between the two, a map-only job with the filter
+# in the mapper shows what skipping the shuffle gains alone. The wall time
+# and peak memory of each are printed, and their results compared.
+import os
+
+import common
+import mapreduce
+
+mr = mapreduce.MapReduce()
+
+columnNames = {}
+
+def readColumnNames(fileName):
+    with open(fileName) as table:
+        for position, name in enumerate(
+                table.readline().rstrip("\n").split(",")):
+            columnNames[name] = position
+
+def selectedColumns(record):
+    return (record[columnNames['Title']], record[columnNames['Score']],
+            record[columnNames['ViewCount']],
+            record[columnNames['CommentsCount']])
+
+# The job before: every post with an AnswerCount is shuffled.
+def shuffleMapper(record):
+    key = record[columnNames['AnswerCount']]
+    if key != "":
+        mr.emit_intermediate(key, selectedColumns(record))
+
+def shuffleReducer(key, list_of_values):
+    if key == '0':
+        for val in list_of_values:
+            mr.emit((key, val))
+
+# Map-only, the WHERE clause checked by the mapper on the whole record.
+def mapOnlyMapper(record):
+    if record[columnNames['AnswerCount']] == '0':
+        mr.emit(('0', selectedColumns(record)))
+
+def shuffle(fileName):
+    readColumnNames(fileName)
+    mr.execute(fileName, shuffleMapper, shuffleReducer, "CSV-SkipFirstLine")
+
+def mapOnly(fileName):
+    readColumnNames(fileName)
+    mr.execute(fileName, mapOnlyMapper, None, "CSV-SkipFirstLine")
+
+def benchmark(posts="1000000", workers="1"):
+    directory = common.workDirectory("select")
+    outputPath = os.path.join(directory, "output.txt")
+    try:
+        usersFileName, postsFileName = common.writeTables(
+            directory, max(1, int(posts) // 10))
+        label = "%s posts" % posts
+        results = []
+        for path in ("shuffle", "mapOnly"):
+            seconds, peak = common.runPath(__file__, path, postsFileName,
+                                           outputPath=outputPath)
+            results.append(common.sortedLines(outputPath))
+            common.report("%s, %s" % (label, path), seconds, peak,
+                          "%d rows" % len(results[-1]))
+        seconds, peak = common.runLab("mapred-lab2/SQLSelect.py",
+                                      postsFileName, workers,
+                                      outputPath=outputPath)
+        results.append(common.sortedLines(outputPath))
+        common.report("%s, SQLSelect.py" % label, seconds, peak,
+                      "%d rows" % len(results[-1]))
+        if any(result != results[0] for result in results):
+            print("the results differ")
+    finally:
+        common.removeWorkDirectory(directory)
+
+if __name__ == '__main__':
+    common.main(benchmark, {"shuffle": shuffle, "mapOnly": mapOnly})
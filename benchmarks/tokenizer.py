@@ -0,0 +1,122 @@
+# Benchmark of the word count of WordCount.py with mapreduce.Tokenizer
+# against its mapper before, which split lines on white space and looked
+# every word up in a list of stop words.
+#
+#     python benchmarks/tokenizer.py [megabytes]
+#
+#     megabytes: Size in MB of the scaled up text, 10 by default.
+#
+# The files of datasets/Swami_discourse are repeated up to the size, and the
+# words are counted with the mapper before and the tokenizer, with and
+# without stemming. Each runs with the stop words of commonWords.txt and
+# with a longer list of English stop words, where the list lookup of the
+# mapper before costs the most. The tokens per second of each job, its wall
+# time and peak memory are printed.
+import os
+import time
+
+import common
+import mapreduce
+
+SWAMI = os.path.join(common.DATASETS, "Swami_discourse")
+TEXTS = ["DD_Nov_21_2000.txt", "DD_Nov_23_2000.txt"]
+
+ENGLISH_STOP_WORDS = """
+a about above after again against all am an and any are as at be because
+been before being below between both but by can did do does doing down
+during each few for from further had has have having he her here hers
+herself him himself his how i if in into is it its itself just me more
+most my myself no nor not now of off on once only or other our ours
+ourselves out over own same she should so some such than that the their
+theirs them themselves then there these they this those through to too
+under until up very was we were what when where which while who whom why
+will with you your yours yourself yourselves
+""".split()
+
+# Writes the Swami_discourse texts again and again, up to about megabytes.
+def scaleUp(fileName, megabytes):
+    text = b""
+    for name in TEXTS:
+        with open(os.path.join(SWAMI, name), "rb") as sample:
+            text += sample.read()
+    with open(fileName, "wb") as scaled:
+        for repeat in range(max(1, megabytes * 1024 * 1024 // len(text))):
+            scaled.write(text)
+
+def readStopWords(stopWords):
+    if stopWords == "english":
+        return list(ENGLISH_STOP_WORDS)
+    words = []
+    with open(os.path.join(SWAMI, "commonWords.txt")) as commonWords:
+        for line in commonWords:
+            words.extend(line.split())
+    return words
+
+mr = mapreduce.MapReduce()
+
+commonWords = []
+tokenizer = None
+tokenCount = 0
+
+# The mapper before.
+def splitMapper(record):
+    global tokenCount
+    wordsInLine = []
+    for word in record.split():
+        if word not in commonWords:
+            wordsInLine.append(word)
+    tokenCount += len(wordsInLine)
+    for word in wordsInLine:
+        mr.emit_intermediate(word, 1)
+
+def tokenizerMapper(record):
+    global tokenCount
+    words = tokenizer.tokens(record)
+    tokenCount += len(words)
+    for word in words:
+        mr.emit_intermediate(word, 1)
+
+def combiner(key, list_of_values):
+    return sum(list_of_values)
+
+def reducer(key, list_of_values):
+    mr.emit((key, sum(list_of_values)))
+
+# The measured path: the word count with the mapper "split", "tokenizer" or
+# "stem". Prints the tokens per second of the job.
+def count(fileName, mapperName, stopWords):
+    global tokenizer
+    commonWords.extend(readStopWords(stopWords))
+    if mapperName == "split":
+        mapper = splitMapper
+    else:
+        stemmer = mapreduce.stem if mapperName == "stem" else None
+        tokenizer = mapreduce.Tokenizer(commonWords, stemmer=stemmer)
+        mapper = tokenizerMapper
+    start = time.perf_counter()
+    mr.execute(fileName, mapper, reducer, "TEXT", combiner=combiner,
+               encoding="cp1252", outputPath=os.devnull)
+    seconds = time.perf_counter() - start
+    print("%d tokens, %.0fk tokens/s" % (tokenCount,
+                                         tokenCount / seconds / 1000))
+
+def benchmark(megabytes="10"):
+    directory = common.workDirectory("tokenizer")
+    try:
+        fileName = os.path.join(directory, "discourse.txt")
+        scaleUp(fileName, int(megabytes))
+        outputPath = os.path.join(directory, "output.txt")
+        for stopWords in ("shipped", "english"):
+            for mapperName in ("split", "tokenizer", "stem"):
+                seconds, peak = common.runPath(__file__, "count", fileName,
+                                               mapperName, stopWords,
+                                               outputPath=outputPath)
+                with open(outputPath) as output:
+                    common.report("%s stop words, %s" % (stopWords,
+                                                         mapperName),
+                                  seconds, peak, output.read().strip())
+    finally:
+        common.removeWorkDirectory(directory)
+
+if __name__ == '__main__':
+    common.main(benchmark, {"count": count})
@@ -20,11 +20,16 @@ been issued at least once. The Item element has the following tags:
 The output of the script is a csv file. The element of each line is the
 ISBN of a book followed by a list of books that are suggestions based
 on circulation data. These books have a direct connection (not friend
-of a friend type) between them. 
+of a friend type) between them. Each suggestion is followed by :common,
+the number of times both books were borrowed, such as
+    0131103628,0201633612:12,0596007973:7
+unless the optional second argument is "unweighted".
 
+Usage: python extractBookBuddiesToCSV.py suggestion_data.xml [unweighted]
   
 """
 fileName = sys.argv[1]
+weighted = not (len(sys.argv) > 2 and sys.argv[2] == "unweighted")
 xmlTree = ET.parse(fileName)
 treeRoot = xmlTree.getroot()
 comma = ","
@@ -38,13 +43,14 @@ for items in treeRoot:
                         isbn1 = field.text
                         str = isbn1+comma
                 for suggestions in item:
-                    if (field.tag == "suggestions"):
+                    if (suggestions.tag == "suggestions"):
                         for isbns in suggestions:
                             if (isbns.tag == "isbn"):
                                 isbn2 = isbns.text
-                                #confidence = isbns.attrib["common"]
+                                if weighted and "common" in isbns.attrib:
+                                    isbn2 += ":" + isbns.attrib["common"]
                                 str += isbn2+comma
-                print str[0:len(str)-1]
+                print(str[0:len(str)-1])
                 str = ""
             
     
\ No newline at end of file
@@ -50,9 +50,8 @@ for items in treeRoot:
                         titleLen = len(field.text)
                         title = field.text[0:titleLen-2]
                         title = title.replace(","," ")
-                        title = title.encode('utf-8')
                         
-                print isbn + "," + title    
+                print(isbn + "," + title)
                 
             
     
\ No newline at end of file
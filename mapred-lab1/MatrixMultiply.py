@@ -1,5 +1,9 @@
 import MapReduce
+import os
 import sys
+import csv
+import tempfile
+import numpy
 
 """
 Matrix Multiplication Example in the Simple Python MapReduce Framework
@@ -10,102 +14,318 @@ mr = MapReduce.MapReduce()
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 # Application Usage :
 #
-#   python MatrixMultiply.py arg-1
+#   python MatrixMultiply.py arg-1 [arg-2 [arg-3 [arg-4]]]
 #
 #   arg-1 : File containg data for both the matrices in csv format.
-#           Each row of the file represents one element of the matrix. 
+#           Each row of the file represents one element of the matrix.
 #           Row Format:
 #               matrix-name,row-number,column-number,cell-value
-#               For ex: If A[1][4] = 9, 
+#               For ex: If A[1][4] = 9,
 #               the cell would be represented as: A,1,4,9
+#           The matrices may be sparse: cells that are not in the file are 0.
+#   arg-2 : Optional number of rows and columns of a block (default 256).
+#   arg-3 : Optional strategy, "block", "join" or "auto" (default). See
+#           below.
+#   arg-4 : Optional. "report" prints the report of every job on stderr,
+#           followed by the shuffleBytes of the strategy, summed over its
+#           jobs.
+#
+#   The result is printed as one (row, column, value) tuple per non-zero
+#   cell of A x B.
+#
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+#
+# Two strategies are implemented. The block strategy replicates the cells of
+# A and B to every result block they contribute to and multiplies in a single
+# job. The join strategy runs two jobs, joining the cells of A and B on the
+# inner index and then adding up the products, and only ever moves the cells
+# once plus one pair per non-zero product. It wins when the matrices are
+# sparse enough that there are few such products.
+#
+# With "auto", the strategy that moves fewer pairs is chosen from the cells
+# counted while reading the dimensions:
+#   block: cells of A * NUM_BLOCK_COLS_IN_B + cells of B * NUM_BLOCK_ROWS_IN_A
+#   join : cells of A + cells of B + the number of products, which is the sum
+#          over j of (cells in column j of A) * (cells in row j of B).
+# Run both strategies with "report" to compare their shuffleBytes on a given
+# input, for example
+#
+#   python MatrixMultiply.py matrices.csv 256 block report
+#   python MatrixMultiply.py matrices.csv 256 join report
 #
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 #
-# Algorithm :
+# Block Algorithm :
+#
+# Key Idea 1: The matrices are divided into square blocks of BLOCK_SIZE rows
+#             and columns. Block (I,J) of a matrix holds the cells [i,j] with
+#             i // BLOCK_SIZE == I and j // BLOCK_SIZE == J.
+#             Result block (I,K) = sum over J of A block (I,J) x B block (J,K).
 #
-# Key Idea 1: One reducer for each cell of the output matrix.
-#             If dimensions of A and B are M x N and N x P respectively, there 
-#             will be M*P reducers.
+# Key Idea 2: One reducer for each block of the output matrix.
+#             If dimensions of A and B are M x N and N x P respectively, there
+#             will be ceil(M/BLOCK_SIZE) * ceil(P/BLOCK_SIZE) reducers.
+#             Each cell of A is sent to the ceil(P/BLOCK_SIZE) reducers of its
+#             block row instead of to the P reducers of its row, and each
+#             cell of B to ceil(M/BLOCK_SIZE) reducers instead of M.
 #
-# Key Idea 2: Each element of the input matrices will be sent to multiple 
-#             reducers (multiple keys will be generated).
+# Initial Setup:
+#   Read the input file once to find the dimensions of the matrices, the
+#   largest row and column numbers present in it, and count the cells of A
+#   in every column and of B in every row. This should be done before
+#   calling the execute method of MapReduce.
 #
 # Mapper :
-#   Each row of A should be sent to every column of the result.
-#   => Element A[i,j] should be sent to every element in Result[i,k] 
-#      where k = 0..P-1 where P is the number of columns of B.
-#   Each column of B should be sent to every row of the result. 
-#   => Element B[i,j] should be sent to every element in Result[k,j] 
-#      where k = 0..M-1. M is the number of rows of A.
+#   Element A[i,j] should be sent to every result block (I,K) where
+#   I = i // BLOCK_SIZE and K = 0..NUM_BLOCK_COLS_IN_B-1.
+#   Element B[j,k] should be sent to every result block (I,K) where
+#   K = k // BLOCK_SIZE and I = 0..NUM_BLOCK_ROWS_IN_A-1.
+#   The value is the matrix, the inner block number J and the position of
+#   the cell within its block, so the reducer never sees global indices.
 #
 # Reducer:
-#   Each reducer computes sum(A[i,j]*B[j,k]).
+#   The cells are grouped by J. For every J that has cells of both A and B
+#   the two blocks are filled into NumPy arrays and multiplied, and the
+#   products are added up into the result block. A value of J with no cells
+#   in A or in B contributes nothing and is skipped, which is what makes
+#   sparse input cheap. The non-zero cells of the result block are emitted.
+#
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+#
+# Join Algorithm :
+#
+# Stage 1 (join):
+#   Mapper : Element A[i,j] is sent to key j as ('A', i, value) and element
+#            B[j,k] to key j as ('B', k, value).
+#   Reducer: Every cell of A in column j is multiplied with every cell of B
+#            in row j. Each product A[i,j]*B[j,k] is written out as a
+#            (i, k, product) row to a temporary CSV file.
+#
+# Stage 2 (aggregate):
+#   Mapper  : Each (i, k, product) row is emitted with key (i,k).
+#   Combiner: Sums the products of a key on the map side.
+#   Reducer : Emits the sum of the products of a key if it is not zero.
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 """
   Questions:
-  1. How would you handle sparse matrices? For a sparse matrix, you will not 
+  1. How would you handle sparse matrices? For a sparse matrix, you will not
      have an entry in the input file for matrix elements that do not exist.
-  
+  2. How does the number of intermediate pairs change with BLOCK_SIZE? What
+     limits how large a block can be?
+
   Extensions:
-  
+
 """
+BLOCK_SIZE = 256
+
+# Dimensions of the matrices, set by readDimensions.
+NUM_ROWS_IN_A = 0
+NUM_INNER = 0
+NUM_COLS_IN_B = 0
+
+# Number of cells of A in every column j and of B in every row j, set by
+# readDimensions.
+cellsInColumnOfA = {}
+cellsInRowOfB = {}
+
+# Returns the number of blocks needed to cover size rows or columns.
+def numBlocks(size):
+    return (size + BLOCK_SIZE - 1) // BLOCK_SIZE
+
+# Returns the number of rows or columns in block number block of a dimension
+# of the given size. Only the last block can be smaller than BLOCK_SIZE.
+def blockLength(block, size):
+    return min(BLOCK_SIZE, size - block * BLOCK_SIZE)
+
+def parseValue(value):
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+def readDimensions(fileName):
+    global NUM_ROWS_IN_A, NUM_INNER, NUM_COLS_IN_B
+    with open(fileName) as data:
+        for record in csv.reader(data):
+            i = int(record[1])
+            j = int(record[2])
+            if record[0] == 'A':
+                NUM_ROWS_IN_A = max(NUM_ROWS_IN_A, i + 1)
+                NUM_INNER = max(NUM_INNER, j + 1)
+                cellsInColumnOfA[j] = cellsInColumnOfA.get(j, 0) + 1
+            else:
+                NUM_INNER = max(NUM_INNER, i + 1)
+                NUM_COLS_IN_B = max(NUM_COLS_IN_B, j + 1)
+                cellsInRowOfB[i] = cellsInRowOfB.get(i, 0) + 1
+
+# Returns "block" or "join", whichever emits fewer intermediate pairs.
+def chooseStrategy():
+    cellsOfA = sum(cellsInColumnOfA.values())
+    cellsOfB = sum(cellsInRowOfB.values())
+    blockPairs = (cellsOfA * numBlocks(NUM_COLS_IN_B) +
+                  cellsOfB * numBlocks(NUM_ROWS_IN_A))
+    products = 0
+    for j in cellsInColumnOfA:
+        products += cellsInColumnOfA[j] * cellsInRowOfB.get(j, 0)
+    joinPairs = cellsOfA + cellsOfB + products
+    if joinPairs < blockPairs:
+        return "join"
+    return "block"
+
+# Returns a blockRows x blockCols NumPy array with the given (row, col, value)
+# cells filled in and zeros elsewhere.
+def fillBlock(cells, blockRows, blockCols):
+    rows, cols, values = zip(*cells)
+    values = numpy.array(values)
+    block = numpy.zeros((blockRows, blockCols), dtype=values.dtype)
+    block[list(rows), list(cols)] = values
+    return block
+
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 def mapper(record):
-    # Record Format : [matrix, i, j, value] where matrix is a string 
+    # Record Format : [matrix, i, j, value] where matrix is a string
     # identifying the matrix ('A' or 'B' in this case).
-    # i, j are the row and column identifier of matrix cell. 
+    # i, j are the row and column identifier of matrix cell.
     # value is the value of cell [i][j]
-    # keys: 
-    #    For matrix A, set of all (i,k) where k in 0..NUM_COLS_IN_B-1
-    #    For matrix B, set of all (k,j) where j  in 0..NUM_ROWS_IN_A-1
-    # Value: Full record as received.
-    NUM_COLS_IN_B = 3
-    NUM_ROWS_IN_A = 9
+    # keys:
+    #    For matrix A, set of all (I,K) where K in 0..NUM_BLOCK_COLS_IN_B-1
+    #    For matrix B, set of all (I,K) where I in 0..NUM_BLOCK_ROWS_IN_A-1
+    # Value: (matrix, J, row within the block, column within the block, value)
     matrixName = record[0]
+    i = int(record[1])
+    j = int(record[2])
+    value = parseValue(record[3])
     if (matrixName == 'A'):
-        i = record[1]
-        for j in range(0,NUM_COLS_IN_B):
-            key = (i,str(j))
-            mr.emit_intermediate(key,record)
+        I = i // BLOCK_SIZE
+        J = j // BLOCK_SIZE
+        cell = ('A', J, i % BLOCK_SIZE, j % BLOCK_SIZE, value)
+        for K in range(numBlocks(NUM_COLS_IN_B)):
+            mr.emit_intermediate((I,K), cell)
     else:
         # Matrix B
-        j = record[2]
-        for i in range(0,NUM_ROWS_IN_A):
-            key = (str(i),j)
-            mr.emit_intermediate(key,record)        
-        
-
+        J = i // BLOCK_SIZE
+        K = j // BLOCK_SIZE
+        cell = ('B', J, i % BLOCK_SIZE, j % BLOCK_SIZE, value)
+        for I in range(numBlocks(NUM_ROWS_IN_A)):
+            mr.emit_intermediate((I,K), cell)
 
 def reducer(key, list_of_values):
-    # key: Index of element in result matrix.
-    # value: An element of matrix A or B in the following format:
-    #        [matrix, i, j, value]
-    
-    total = 0
-    # Extract records of 'A'
-    matA = []
-    for cell in list_of_values:
-        if (cell[0] == "A"):
-            matA.append(cell)
-            
-    # Extract records of 'B'
-    matB = []
+    # key: (I,K), the index of a block of the result matrix.
+    # value: A cell of matrix A or B in the following format:
+    #        (matrix, J, row within the block, column within the block, value)
+    I, K = key
+
+    # Group the cells of A and of B by the inner block number J.
+    cellsA = {}
+    cellsB = {}
+    for matrixName, J, row, col, value in list_of_values:
+        if (matrixName == 'A'):
+            cellsA.setdefault(J, []).append((row, col, value))
+        else:
+            cellsB.setdefault(J, []).append((row, col, value))
+
+    blockRows = blockLength(I, NUM_ROWS_IN_A)
+    blockCols = blockLength(K, NUM_COLS_IN_B)
+    total = None
+    for J in cellsA:
+        if J not in cellsB:
+            continue
+        innerLength = blockLength(J, NUM_INNER)
+        product = numpy.dot(fillBlock(cellsA[J], blockRows, innerLength),
+                            fillBlock(cellsB[J], innerLength, blockCols))
+        if total is None:
+            total = product
+        else:
+            total = total + product
+    if total is None:
+        return
+
+    for row, col in zip(*numpy.nonzero(total)):
+        mr.emit((str(I * BLOCK_SIZE + row), str(K * BLOCK_SIZE + col),
+                 total[row, col].item()))
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# Join strategy, stage 1.
+def joinMapper(record):
+    # Record Format : [matrix, i, j, value]
+    # key: The inner index, j for A[i,j] and also j for B[j,k].
+    # value: (matrix, row of A or column of B, value)
+    value = parseValue(record[3])
+    if (record[0] == 'A'):
+        mr.emit_intermediate(int(record[2]), ('A', record[1], value))
+    else:
+        mr.emit_intermediate(int(record[1]), ('B', record[2], value))
+
+def joinReducer(key, list_of_values):
+    # key: Inner index j.
+    # value: (matrix, row of A or column of B, value)
+    cellsA = []
+    cellsB = []
     for cell in list_of_values:
-        if (cell[0] == "B"):
-            matB.append(cell)
-            
-    # For each element from A, find all elements from B such that
-    # the column number of A matches with the row number of B. (A[i,j]*B[j,k])
-    # For each such pair, multiply the values of the cell and add 
-    # it to a running total.
-    for cellA in matA:
-        for cellB in matB:
-            if (cellA[2] == cellB[1]):
-                total = total + int(cellA[3])*int(cellB[3])
-    mr.emit((key[0],key[1], total))
+        if (cell[0] == 'A'):
+            cellsA.append(cell)
+        else:
+            cellsB.append(cell)
+    for matrixName, i, valueA in cellsA:
+        for matrixName, k, valueB in cellsB:
+            mr.emit((i, k, valueA * valueB))
+
+# Join strategy, stage 2.
+def sumMapper(record):
+    # Record Format : [i, k, product]
+    mr.emit_intermediate((record[0], record[1]), parseValue(record[2]))
+
+def sumCombiner(key, list_of_values):
+    return sum(list_of_values)
+
+def sumReducer(key, list_of_values):
+    total = sum(list_of_values)
+    if total != 0:
+        mr.emit((key[0], key[1], total))
+
+# Runs the two jobs of the join strategy. The products are handed from the
+# first to the second through a temporary CSV file. With a report, returns
+# the shuffleBytes of the two jobs.
+def joinMultiply(fileName, report=None):
+    fd, productsPath = tempfile.mkstemp(suffix='.csv')
+    os.close(fd)
+    shuffleBytes = 0
+    try:
+        mr.execute(fileName, joinMapper, joinReducer, "CSV",
+                   outputPath=productsPath, outputFormat="CSV",
+                   report=report)
+        if report is not None:
+            shuffleBytes += mr.counters.counts["shuffleBytes"]
+        mr.execute(productsPath, sumMapper, sumReducer, "CSV",
+                   combiner=sumCombiner, report=report)
+        if report is not None:
+            shuffleBytes += mr.counters.counts["shuffleBytes"]
+    finally:
+        os.remove(productsPath)
+    return shuffleBytes
 
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 if __name__ == '__main__':
-  
+
+  if len(sys.argv) > 2:
+    BLOCK_SIZE = int(sys.argv[2])
+  strategy = "auto"
+  if len(sys.argv) > 3:
+    strategy = sys.argv[3]
+  report = None
+  if len(sys.argv) > 4 and sys.argv[4] == "report":
+    report = "stderr"
+  readDimensions(sys.argv[1])
+  if strategy == "auto":
+    strategy = chooseStrategy()
+
   # Invoke the Map Reduce algorithm
-  mr.execute(sys.argv[1], mapper, reducer,"CSV")
\ No newline at end of file
+  if strategy == "join":
+    shuffleBytes = joinMultiply(sys.argv[1], report)
+  else:
+    mr.execute(sys.argv[1], mapper, reducer,"CSV", report=report)
+    if report is not None:
+      shuffleBytes = mr.counters.counts["shuffleBytes"]
+  if report is not None:
+    sys.stderr.write("%s strategy: %d shuffleBytes\n"
+                     % (strategy, shuffleBytes))
@@ -1,5 +1,6 @@
 import MapReduce
 import sys
+import codecs
 
 """
 This application is a map reduce implementation to count the number
@@ -12,10 +13,17 @@ mr = MapReduce.MapReduce()
 #
 # Application Usage
 #
-#   python WordCount.py arg-1 arg-2
+#   python WordCount.py arg-1 arg-2 [arg-3 ...]
 #
 #   arg-1 : File on which word count is to be performed.
 #   arg-2 : File containing list of common words.
+#   arg-3 : Optional, in any order:
+#           "stem" counts the words by their stem, so "teaching" and
+#           "teachings" are counted together.
+#           The name of the encoding of arg-1, utf-8 by default. The
+#           Swami_discourse files are in cp1252:
+#
+#     python WordCount.py ../datasets/Swami_discourse/DD_Nov_21_2000.txt ../datasets/Swami_discourse/commonWords.txt cp1252
 #
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 #
@@ -24,20 +32,24 @@ mr = MapReduce.MapReduce()
 #   Key Idea: Send all occurences of the same word to the same reducer.
 #
 #   Initial Setup:
-#     Store the list of words to be eliminated from the count in a global
-#     list named commonWordsList. 
+#     Read the list of words to be eliminated from the count and build a
+#     global MapReduce.Tokenizer named tokenizer with them as its stop words.
 #
 #   Mapper:
-#     Each invocation of the mapper will be provided one line from the  
-#     input file. The mapper should break the line into words and store 
-#     them in a list called wordsInLine. It should add a word to the list
-#     only if it is not in the common words list. Once the list is
-#     created, each item of the list will be emitted as a key with a
-#     value of 1.
+#     Each invocation of the mapper will be provided one line from the
+#     input file. The tokenizer breaks the line into words, without the
+#     punctuation characters and in lower case, and leaves out the common
+#     words. Each word is emitted as a key with a value of 1.
+#
+#  Combiner:
+#     Runs on the map side over the values collected so far for a word and
+#     replaces them by their sum. This keeps one partial count per word in
+#     memory instead of one "1" per occurence.
 #
 #  Reducer:
-#     The number of elements in the list of values will be equal to the number
-#     of occurences of the word. Emit the key and the length of the list
+#     The values are counts (1 from the mapper or partial counts from the
+#     combiner). Their sum is the number of occurences of the word. Emit the
+#     key and the sum.
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 """
    Questions:
@@ -58,34 +70,30 @@ mr = MapReduce.MapReduce()
 # Initialize commonWordList
 commonWords = []
 
+# Built from commonWords before calling execute.
+tokenizer = None
+
 def mapper(record):
     # Record Format : A line from the input file.
-    global commonWordsList
-    
-    # Split the words in the line using the split() method on a string.
-    allWordsInLine = record.split()
-    
-    # Initialize the wordsInLine list
-    wordsInLine = []
-    
-    # Iterate over the allWordsInLine list and add the word to the wordsInLine
-    # list only if it is not a common word. (not in commonWords)
-    for word in allWordsInLine:
-        if word not in commonWords:
-            wordsInLine.append(word)
-    
-    # For each word in wordsInLine emit key -> word, value -> 1
-    for word in wordsInLine:
+
+    # For each word in the line that is not a common word emit
+    # key -> word, value -> 1
+    for word in tokenizer.tokens(record):
         mr.emit_intermediate(word,1)
        
 
+def combiner(key, list_of_values):
+    # list_of_values holds the counts collected so far for the word. Return
+    # their sum as a single partial count.
+    return sum(list_of_values)
+
 def reducer(key, list_of_values):
-    # list_of_values will be a list with one entry for each value emitted by 
-    # the mapper. In this case each of these values will be "1". The number
-    # of occurences of the key is hence the length of the list
-    # Emit key and the length of the list of values.
+    # list_of_values will be a list of counts for the key. Each value is
+    # either a "1" emitted by the mapper or a partial count returned by the
+    # combiner. The number of occurences of the key is hence their sum.
+    # Emit key and the sum of the list of values.
      
-    numOccurences = len(list_of_values)
+    numOccurences = sum(list_of_values)
     mr.emit((key,numOccurences))
     
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
@@ -97,10 +105,27 @@ if __name__ == '__main__':
     words = line.split()
     for word in words:
         commonWords.append(word)
-        
+
+  stemmer = None
+  encoding = None
+  for option in sys.argv[3:]:
+    if option == "stem":
+      stemmer = MapReduce.stem
+    else:
+      encoding = option
+  if encoding is not None:
+    try:
+      codecs.lookup(encoding)
+    except LookupError:
+      sys.exit("Unknown encoding: %s" % encoding)
+  tokenizer = MapReduce.Tokenizer(commonWords, stemmer=stemmer)
+
   # Invoke the Map Reduce algorithm. The execute method expects 4 parameters
   # 1. File containing the data
   # 2. Name of the map routine
   # 3. Name of the reduce routine
   # 4. Type of file. Values can be TEXT, JSON, SOXML, CSV.
-  mr.execute(sys.argv[1], mapper, reducer,"TEXT")
\ No newline at end of file
+  # The combiner and the encoding of the file are passed as optional
+  # parameters.
+  mr.execute(sys.argv[1], mapper, reducer,"TEXT", combiner=combiner,
+             encoding=encoding)
\ No newline at end of file
@@ -0,0 +1,44 @@
+import MapReduce
+import sys
+import os
+
+"""
+This is a helper application to convert tables in csv format into the
+typed, column oriented files that SQLQuery.py reads faster.
+"""
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+#
+#  Application Usage:
+#
+#      python CsvToColumns.py arg-1 [arg-2 ...]
+#
+#      arg-n : File name of a table in csv format. The first row of the file
+#              should contain the column names.
+#
+#  Each file is converted into a file of the same name with the extension
+#  .columns, next to it, unless that file was already converted from the
+#  file as it is now. A <Table/> tag of SQLQuery.py can then name the
+#  .columns file instead of the csv file, for example
+#
+#      python CsvToColumns.py ../datasets/cstheory_sample/Posts_Sample.csv
+#
+#  Numeric columns are stored as arrays of numbers and the other columns
+#  as codes into a dictionary of their distinct strings (see
+#  mapreduce/columnar.py). A query then reads only the columns it uses and
+#  parses no text.
+#
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+if __name__ == '__main__':
+
+  for csvFileName in sys.argv[1:]:
+    columnsFileName = os.path.splitext(csvFileName)[0] + ".columns"
+    if MapReduce.columnar.isUpToDate(columnsFileName, csvFileName):
+      print("%s is up to date" % columnsFileName)
+      continue
+    MapReduce.columnar.convert(csvFileName, columnsFileName)
+    print("%s: %d bytes, from %d bytes of csv"
+          % (columnsFileName, os.path.getsize(columnsFileName),
+             os.path.getsize(csvFileName)))
@@ -12,46 +12,112 @@ mr = MapReduce.MapReduce()
 # 
 #  Application Usage:
 #
-#      python DuplicateImages.py arg-1 
+#      python DuplicateImages.py arg-1 [arg-2 [arg-3]]
 #
 #      arg-1 : File containing list of images to be processed. Each line of the 
 #              file should contain one image file name (including path)
+#      arg-2 : Optional maximum Hamming distance between the fingerprints of
+#              two near duplicates. Without it, or with "exact", only
+#              duplicates, images with the same fingerprint, are found.
+#      arg-3 : Optional number of worker processes. Every image is then
+#              decoded and fingerprinted by the map worker it is given to.
+#
+#      The fingerprints are cached in the file arg-1.fingerprints (see
+#      Fingerprint cache below), so a rescan only decodes the images that are
+#      new or were modified since the last one.
 #
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 #  
 #  Algorithm Design:
 #  
-#  Key Idea: Use the pixel array representation of the full image as a key. Send all
-#            images with the same pixel array representation to the same reducer.
+#  Key Idea: Use a 64 bit perceptual hash of the image, its fingerprint, as a
+#            key. Images that look the same have the same fingerprint, even
+#            when their pixels are not byte for byte identical, and images
+#            that look alike have fingerprints that differ in few bits.
+#            The fingerprint is the difference hash of MapReduce.imagehash.
 #
+#  Duplicates:
 #  Mapper:
-#  1. Input:  One line from the file. This will be a list containing the
-#             values of each column of a record.
-#  2. Key   : AnswerCount
-#     value : (Title, Score, ViewCount, CommentsCount)
-#     Do not emit anything if the AnswerCount field is NULL. 
+#  1. Input:  Record with the file name of an image, its pixels, its size and
+#             its mode.
+#  2. Key   : Fingerprint of the image
+#     value : File name
 #  Reducer:
-#     Emit an output only if the key is zero.     
+#     Emit the file names of the images with the fingerprint.
+#
+#  Near duplicates (multi-index hashing):
+#     If two fingerprints differ in at most d bits and are cut into d+1
+#     chunks, at least one of the chunks is the same in both. So images are
+#     only compared with the images they share a chunk with, instead of
+#     with every other image.
+#  Mapper:
+#  1. Input:  As above.
+#  2. Key   : (chunk number, chunk value) for each of the d+1 chunks of the
+#             fingerprint
+#     value : (File name, fingerprint)
+#  Reducer:
+#     Compare every pair of distinct fingerprints in the list. Emit
+#     (file name, file name, distance) for the pairs of images whose
+#     fingerprints are at most d bits apart. A pair that shares several
+#     chunks is seen by several reducers, only the one of its first shared
+#     chunk emits it.
+#
+#  Fingerprint cache:
+#     The mappers look the fingerprint of an image up in a MapReduce.FileCache
+#     keyed on the path, size and modification time of the file. Only
+#     images that are not in it, or changed since they were, are decoded,
+#     and their fingerprints are added to it. After the job the cache is
+#     compacted, and the entries of images that were removed, changed or
+#     are not in arg-1 any more are evicted.
 #
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++       
 
 """
   Questions:
-  1. 
+  1. Why can two different images have the same fingerprint? 
+  2. What happens to the number of comparisons when d grows?
      
   Extensions:
   1. Extend the application to use a more efficient metric to compare two images. 
 """
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 
+# Maximum Hamming distance of near duplicates, None to find duplicates only.
+MAX_DISTANCE = None
+
+# Images are decoded to gray levels and scaled down to fit in this size. The
+# fingerprint is computed from an 8x9 gray thumbnail, so decoding the full
+# image would be wasted work.
+DECODE_SIZE = (64, 64)
+
+# Cache of the fingerprints, None to always decode the images. Its version
+# changes with the way fingerprints are computed, which invalidates it.
+cache = None
+CACHE_VERSION = "differenceHash %dx%d" % DECODE_SIZE
+
+def fingerprint(record):
+    fileName = record[0]
+    if cache is not None:
+        imageHash = cache.get(fileName)
+        if imageHash is not None:
+            return imageHash
+    imageData = record.decode(DECODE_SIZE, "L")
+    height, width = imageData.shape
+    imageHash = MapReduce.imagehash.differenceHash(imageData,
+                                                   (width, height), "L")
+    if cache is not None:
+        cache.put(fileName, imageHash)
+    return imageHash
+
 def mapper(record):
-  # record : List with two elements. File name and image data as a list. 
-  fileName = record[0]  
-  imageData = record[1]
-  
-  # key -> string representation of imageData, value -> fileName
-  
-  mr.emit_intermediate(str(imageData),fileName)
+    # record : Record of an image (see ImageRecord), which behaves like a
+    # list with four elements. File name, image data as an array,
+    # (width, height) and mode of the image.
+    fileName = record[0]
+
+    # key -> fingerprint of the image, value -> fileName
+
+    mr.emit_intermediate(fingerprint(record),fileName)
 
 def reducer(key, list_of_values):
     str = ""
@@ -59,6 +125,45 @@ def reducer(key, list_of_values):
         str += name + ","
     mr.emit(str)
 
+def nearMapper(record):
+    fileName = record[0]
+    imageHash = fingerprint(record)
+    for chunk in MapReduce.imagehash.hashChunks(imageHash, MAX_DISTANCE + 1):
+        mr.emit_intermediate(chunk, (fileName, imageHash))
+
+def nearReducer(key, list_of_values):
+    chunkIndex = key[0]
+    # Images with the same fingerprint are compared once, as a group.
+    filesOfHash = {}
+    for fileName, imageHash in list_of_values:
+        filesOfHash.setdefault(imageHash, []).append(fileName)
+    hashes = list(filesOfHash)
+    chunks = [MapReduce.imagehash.hashChunks(imageHash, MAX_DISTANCE + 1)
+              for imageHash in hashes]
+
+    for i in range(len(hashes)):
+        # Identical fingerprints share every chunk, the first one included.
+        files = filesOfHash[hashes[i]]
+        if chunkIndex == 0:
+            for a in range(len(files)):
+                for b in range(a + 1, len(files)):
+                    mr.emit((files[a], files[b], 0))
+
+        for j in range(i + 1, len(hashes)):
+            distance = MapReduce.imagehash.hammingDistance(hashes[i], hashes[j])
+            if distance > MAX_DISTANCE:
+                continue
+            # Emit the pairs only from the reducer of the first chunk the two
+            # fingerprints share.
+            firstShared = 0
+            while chunks[i][firstShared] != chunks[j][firstShared]:
+                firstShared += 1
+            if firstShared != chunkIndex:
+                continue
+            for fileName1 in files:
+                for fileName2 in filesOfHash[hashes[j]]:
+                    mr.emit((fileName1, fileName2, distance))
+
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 if __name__ == '__main__':
 
@@ -67,5 +172,19 @@ if __name__ == '__main__':
   inputFiles = open(sys.argv[1])
   for line in inputFiles:
     fileNameList.append(line.strip())
-    
-  mr.execute(fileNameList, mapper, reducer,"IMAGE")
+
+  numWorkers = 1
+  if len(sys.argv) > 3:
+    numWorkers = int(sys.argv[3])
+
+  # The cache is created before the job so that the map workers share it.
+  cache = MapReduce.FileCache(sys.argv[1] + ".fingerprints", CACHE_VERSION)
+
+  if len(sys.argv) > 2 and sys.argv[2] != "exact":
+    MAX_DISTANCE = int(sys.argv[2])
+    mr.execute(fileNameList, nearMapper, nearReducer,"IMAGE",
+               numWorkers=numWorkers)
+  else:
+    mr.execute(fileNameList, mapper, reducer,"IMAGE", numWorkers=numWorkers)
+
+  cache.save(fileNameList)
@@ -62,9 +62,14 @@ mr = MapReduce.MapReduce()
 #     Do not emit anything if the Title field is NULL. 
 #     Process the record only if PostTypeId is "1"
 #
+#  Combiner:
+#     Replace the values collected so far for a key on the map side by their
+#     sum.
+#
 #  Reducer:
-#     Emit key along with the number of elements in the list of values passed
-#     to the reducer.     
+#     Emit key along with the sum of the list of values passed to the reducer.
+#     Each value is either a 1 from the mapper or a partial count from the
+#     combiner.
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++       
 
 """
@@ -105,10 +110,15 @@ def mapper(record):
     # Emit: Key -> lenTitle, value -> 1
     mr.emit_intermediate(titleRange,1)
 
+def combiner(key, list_of_values):
+
+    # Return the partial count of the records seen so far for the key.
+    return sum(list_of_values)
+
 def reducer(key, list_of_values):
      
-    # Emit: key,length of list_of_values
-    emitStr = key + "->" + str(len(list_of_values))
+    # Emit: key,sum of list_of_values
+    emitStr = key + "->" + str(sum(list_of_values))
     mr.emit(emitStr)
 
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
@@ -130,4 +140,5 @@ if __name__ == '__main__':
   inputdata = open(sys.argv[1])
   fileNameList = []
   fileNameList.append(sys.argv[1])
-  mr.execute(fileNameList, mapper, reducer,"CSV-SkipFirstLine")
+  mr.execute(fileNameList, mapper, reducer,"CSV-SkipFirstLine",
+             combiner=combiner)
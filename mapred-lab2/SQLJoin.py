@@ -1,5 +1,8 @@
 import MapReduce
 import sys
+import os
+import csv
+import math
 
 """
 This application is a map reduce implementation to implement a SQL Join.
@@ -11,12 +14,19 @@ mr = MapReduce.MapReduce()
 # 
 #  Application Usage:
 #
-#      python SQLJoin.py arg-1 arg-2
+#      python SQLJoin.py arg-1 arg-2 [arg-3 [arg-4 [arg-5 [arg-6]]]]
 #
 #      arg-1:  File name containing table data for Users table in csv format. 
 #              The first row of the file should contain the column names. 
 #              The first column of each row should identify the table name. 
 #      arg-2:  Same as the arg-1 containing data for the Posts table.
+#      arg-3:  Optional join strategy, "reduce", "semijoin", "broadcast" or
+#              "auto" (default). See Join Strategies below.
+#      arg-4:  Optional false positive rate of the Bloom filter of the
+#              semijoin (default 0.01).
+#      arg-5:  Optional. "report" prints the job report on stderr, with
+#              the number of records the semijoin pruned, "-" does not.
+#      arg-6:  Optional number of worker processes (default 1).
 #  
 #  The application is hard-coded to implement a SQL statement that answers
 #  the following question on the 'Posts" and 'Users' data of stack overflow:
@@ -67,6 +77,73 @@ mr = MapReduce.MapReduce()
 #     Do not emit anything is the userReputation is less than 500
 #       
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+#
+#  Join Strategies:
+#
+#  The algorithm above is a reduce-side join: both tables go through the
+#  shuffle, although the Users table is much smaller than the Posts table and
+#  most users are filtered out by the reducer.
+#
+#  Broadcast (replicated) join:
+#  Key Idea: Hold the small side of the join in memory in every mapper and
+#            join the large side while mapping it.
+#  Initial Setup:
+#     Read the Users table, keep the users with a reputation of 500 or more
+#     and build a hash table from their Id to their DisplayName and
+#     Reputation. Map workers are forked from the process that built it, so
+#     it is loaded once and shared with all of them.
+#  Mapper:
+#     Input: One line of the Posts table. Look the OwnerUserId of every
+#     question up in the hash table and emit the output record directly.
+#  There is no reducer: the job is map-only, so nothing is shuffled and the
+#  Users table is never mapped. Output records come in the order of the
+#  Posts table instead of being grouped by user.
+#
+#  Semijoin (reduce-side join with a Bloom filter):
+#  Key Idea: Drop the records that cannot join before the shuffle.
+#  Initial Setup:
+#     Read the Users table and add the Id of every user with a reputation of
+#     500 or more to a Bloom filter. It takes about 10 bits per user for a
+#     false positive rate of 1%, so it stays small even when the hash table
+#     of the broadcast join would not fit in memory.
+#  Mapper:
+#     As the mapper of the reduce-side join, except that records whose key
+#     is not in the filter are not emitted. This drops the questions of
+#     users with a low reputation as well as those users. A few of them get
+#     through (false positives) and are dropped by the reducer as before.
+#     The number of records dropped and their size in bytes as UTF-8 CSV
+#     text are added to the counters semijoinPrunedRecords and
+#     semijoinPrunedBytes of the job report, printed with "report".
+#  Reducer:
+#     Same as the reduce-side join.
+#
+#  Hot keys (reduce and semijoin, with more than one worker):
+#  Key Idea: A user with a large share of the questions makes one reducer key
+#            much larger than the others. In parallel mode the worker that
+#            gets it finishes long after the others and sets the time of the
+#            job. Such a hot key is split into several keys (salting).
+#            A serial job reduces every key in the same process, so it
+#            gains nothing from salting and does not salt.
+#  Initial Setup:
+#     Sample SAMPLE_SIZE records of the Posts table. An owner of at least
+#     HOT_KEY_SHARE of the sampled questions is a hot key and is split into
+#     ceil(share / HOT_KEY_SHARE) salts, so every salted key holds about
+#     HOT_KEY_SHARE of the questions.
+#  Mapper:
+#     The questions of a hot user are given the keys (Id, 0), (Id, 1), ...
+#     in turn and the record of the user is emitted once for each of them.
+#     Other keys are emitted as before.
+#  Reducer:
+#     Unchanged, each salted key joins the user with a part of the
+#     questions. The output has the same records as without salting, the
+#     records of a hot user coming salt by salt.
+#
+#  With "auto", the broadcast join is used when the Users file is smaller
+#  than the Posts file and than BROADCAST_LIMIT bytes, and the semijoin
+#  otherwise. The file size is an upper bound on the size of the hash table,
+#  which holds only the filtered users and two of their columns.
+#
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 
 """
   Questions:
@@ -84,6 +161,37 @@ mr = MapReduce.MapReduce()
 usersTblColumns = {}
 postsTblColumns = {}
 
+# Users with a lower reputation are left out of the result.
+MIN_REPUTATION = 500
+
+# Largest Users file that "auto" broadcasts, in bytes.
+BROADCAST_LIMIT = 64 * 1024 * 1024
+
+# Hash table of the broadcast join: user Id -> (DisplayName, Reputation) of
+# the users with a reputation of MIN_REPUTATION or more.
+reputableUsers = {}
+
+# Number of sampled Posts records, and share of the sampled questions that
+# makes their owner a hot key.
+SAMPLE_SIZE = 10000
+HOT_KEY_SHARE = 0.01
+
+# Hot user Id -> number of salts, and -> salt of the next question.
+saltsOfHotKey = {}
+nextSalt = {}
+
+# Bloom filter of the Ids of those users in a semijoin, None otherwise.
+reputableUserIds = None
+FALSE_POSITIVE_RATE = 0.01
+
+# Returns the output record of the join of a user and one of their posts.
+def joinedRecord(userId, userName, userReputation, post):
+    outStr = userId + ',' + userName + ',' + userReputation + ","
+    outStr += post[postsTblColumns['Title']] + ','
+    outStr += post[postsTblColumns['AnswerCount']] + ','
+    outStr += post[postsTblColumns['CommentCount']]
+    return outStr
+
 # Record Format : A line from the input file.
 def mapper(record):
         
@@ -110,11 +218,30 @@ def mapper(record):
         #set isQuestion to "1" for all records from users table.
         isQuestion = 1
         
-    if (key <> "" and isQuestion == 1):
-        mr.emit_intermediate(key,record)
+    if (key != "" and isQuestion == 1):
+        if reputableUserIds is not None and key not in reputableUserIds:
+            mr.increment("semijoinPrunedRecords")
+            mr.increment("semijoinPrunedBytes",
+                         sum(len(field.encode("utf-8")) + 1
+                             for field in record))
+            return
+        salts = saltsOfHotKey.get(key)
+        if salts is None:
+            mr.emit_intermediate(key,record)
+        elif record[0] == "USERS":
+            for salt in range(salts):
+                mr.emit_intermediate((key, salt), record)
+        else:
+            salt = nextSalt.get(key, 0)
+            nextSalt[key] = (salt + 1) % salts
+            mr.emit_intermediate((key, salt), record)
     
 def reducer(key, list_of_values):
     
+    # Salted keys of hot users are (Id, salt).
+    if isinstance(key, tuple):
+        key = key[0]
+    
     # Get the record from the users table from the list of values. 
     userName = ""
     userReputation = "0"
@@ -134,25 +261,80 @@ def reducer(key, list_of_values):
                 postsTblRecPresent = 1
                 
         # Return if we do not find matching recods from both tables 
-        if (usersTblRecPresent + postsTblRecPresent <> 2) :
+        if (usersTblRecPresent + postsTblRecPresent != 2) :
             return
         # Return if user reputation is less than 500
-        if (int(userReputation) < 500):
+        if (int(userReputation) < MIN_REPUTATION):
             return
             
         # Emit an output record only for users with reputation         
         # Iterate over all the values and return one record for each 
         # record from posts table
-        outStr = ""
         for item in list_of_values:
             if (item[0] == "POSTS"):
-                outStr = key + ',' + userName + ',' + userReputation + ","
-                outStr += item[postsTblColumns['Title']] + ','
-                outStr += item[postsTblColumns['AnswerCount']] + ','
-                outStr += item[postsTblColumns['CommentCount']]
-                mr.emit(outStr)
-                outStr = ""
-            
+                mr.emit(joinedRecord(key, userName, userReputation, item))
+
+# Generator of the records of the users with a reputation of MIN_REPUTATION
+# or more. The file is decoded as the CSV reader of MapReduce decodes it.
+def readReputableUsers(fileName):
+    usersTblData = open(fileName, encoding="utf-8", errors="replace",
+                        newline='')
+    rows = csv.reader(usersTblData)
+    next(rows, None)
+    for record in rows:
+        if record[0] != "USERS" or record[usersTblColumns['Id']] == "":
+            continue
+        if int(record[usersTblColumns['Reputation']]) >= MIN_REPUTATION:
+            yield record
+    usersTblData.close()
+
+# Builds the hash table of the broadcast join from the Users table.
+def loadReputableUsers(fileName):
+    for record in readReputableUsers(fileName):
+        reputableUsers[record[usersTblColumns['Id']]] = (
+            record[usersTblColumns['DisplayName']],
+            record[usersTblColumns['Reputation']])
+
+# Builds the Bloom filter of the semijoin from the Users table.
+def loadReputableUserIds(fileName, falsePositiveRate):
+    userIds = [record[usersTblColumns['Id']]
+               for record in readReputableUsers(fileName)]
+    userIdFilter = MapReduce.BloomFilter(len(userIds), falsePositiveRate)
+    for userId in userIds:
+        userIdFilter.add(userId)
+    return userIdFilter
+
+# Record Format : A line of the Posts table.
+def broadcastMapper(record):
+    if (record[0] != "POSTS" or record[postsTblColumns["PostTypeId"]] != "1"):
+        return
+    userId = record[postsTblColumns['OwnerUserId']]
+    user = reputableUsers.get(userId)
+    if user is not None:
+        mr.emit(joinedRecord(userId, user[0], user[1], record))
+
+# Finds the hot keys of the Posts table from a sample of it.
+def findHotKeys(fileName):
+    questionsOfUser = {}
+    numQuestions = 0
+    for record in MapReduce.sampleRecords(fileName, "CSV-SkipFirstLine",
+                                          SAMPLE_SIZE):
+        if (record[0] != "POSTS" or record[postsTblColumns["PostTypeId"]] != "1"):
+            continue
+        numQuestions += 1
+        userId = record[postsTblColumns['OwnerUserId']]
+        if userId != "":
+            questionsOfUser[userId] = questionsOfUser.get(userId, 0) + 1
+    for userId in questionsOfUser:
+        share = questionsOfUser[userId] / numQuestions
+        if share >= HOT_KEY_SHARE:
+            saltsOfHotKey[userId] = int(math.ceil(share / HOT_KEY_SHARE))
+
+def chooseStrategy(usersFileName, postsFileName):
+    usersSize = os.path.getsize(usersFileName)
+    if usersSize < BROADCAST_LIMIT and usersSize < os.path.getsize(postsFileName):
+        return "broadcast"
+    return "semijoin"
 
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 if __name__ == '__main__':
@@ -185,8 +367,32 @@ if __name__ == '__main__':
     count += 1
   
   
-  fileNameList = []
-  fileNameList.append(sys.argv[1])
-  fileNameList.append(sys.argv[2])
-  mr.execute(fileNameList, mapper, reducer,"CSV-SkipFirstLine")
+  strategy = "auto"
+  if len(sys.argv) > 3:
+    strategy = sys.argv[3]
+  if len(sys.argv) > 4:
+    FALSE_POSITIVE_RATE = float(sys.argv[4])
+  report = None
+  if len(sys.argv) > 5 and sys.argv[5] == "report":
+    report = "stderr"
+  numWorkers = 1
+  if len(sys.argv) > 6:
+    numWorkers = int(sys.argv[6])
+  if strategy == "auto":
+    strategy = chooseStrategy(sys.argv[1], sys.argv[2])
+
+  if strategy == "broadcast":
+    loadReputableUsers(sys.argv[1])
+    mr.execute(sys.argv[2], broadcastMapper, None, "CSV-SkipFirstLine",
+               numWorkers=numWorkers, report=report)
+  else:
+    if strategy == "semijoin":
+      reputableUserIds = loadReputableUserIds(sys.argv[1], FALSE_POSITIVE_RATE)
+    if numWorkers > 1:
+      findHotKeys(sys.argv[2])
+    fileNameList = []
+    fileNameList.append(sys.argv[1])
+    fileNameList.append(sys.argv[2])
+    mr.execute(fileNameList, mapper, reducer,"CSV-SkipFirstLine",
+               numWorkers=numWorkers, report=report)
   
\ No newline at end of file
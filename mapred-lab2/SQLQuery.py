@@ -0,0 +1,114 @@
+import MapReduce
+import sys
+import os
+import re
+
+"""
+This application runs SQL statements given in a file, by compiling them into
+map reduce jobs
+"""
+
+mr = MapReduce.MapReduce()
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+#
+#  Application Usage:
+#
+#      python SQLQuery.py arg-1 [arg-2]
+#
+#      arg-1 : File name containing the SQL statement. The tables it uses
+#              are given by <Table/> tags before the statement:
+#              <SQL>
+#              <Table name="Posts" file="Posts_Sample.csv" path="../datasets/cstheory_sample"/>
+#              SELECT Title, Score, ViewCount, CommentsCount
+#              FROM Posts
+#              WHERE AnswerCount = 0
+#              </SQL>
+#              path is relative to the directory of the SQL file. Files
+#              ending in .csv are read as CSV with the column names on the
+#              first line, .xml files as StackExchange dumps, .json files
+#              as one JSON object per line and .columns files as tables
+#              converted by CsvToColumns.py. A format attribute, such as
+#              format="CSV-SkipFirstLine", overrides this.
+#      arg-2 : Optional number of worker processes, or "explain" to print
+#              the map reduce jobs of the statement instead of running it.
+#
+#  The results are printed as CSV rows, one per line.
+#
+#  The queries directory has the statements of SQLSelect.py, SQLGroupBy.py
+#  and SQLJoin.py, for example
+#
+#      python SQLQuery.py queries/select.sql
+#
+#  queries/aadhar_rollup.sql adds up the Aadhaar enrolments by state,
+#  district and gender with ROLLUP, which gives the subtotals of every
+#  district and state in the same scan of the data.
+#
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+#
+#  Algorithm Design:
+#
+#  Key Idea: Plan the statement as the map reduce jobs written by hand in the
+#            other programs of this lab, and let the planner apply their
+#            optimizations to every statement.
+#
+#  Planning (see mapreduce/sql.py):
+#  1. The conditions of the WHERE clause on a single table are checked by
+#     the mapper of that table (predicate pushdown), and mappers emit only
+#     the columns used after them (projection pushdown).
+#  2. A statement on one table with no GROUP BY, aggregate or DISTINCT has
+#     nothing to shuffle and runs as a map-only job.
+#  3. GROUP BY emits partial aggregates that a combiner merges, so a group
+#     moves one value per split instead of one per row. With ROLLUP, CUBE
+#     or GROUPING SETS, each row is emitted once per grouping set.
+#  4. Joins load the smaller table into a hash table shared by the mappers
+#     of the other one when it is small enough (broadcast join), and
+#     otherwise shuffle both tables on the join key.
+#
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+# Attributes of a <Table .../> tag, with or without commas between them.
+TABLE_PATTERN = re.compile(r"<Table\b([^>]*?)/?>", re.IGNORECASE)
+ATTRIBUTE_PATTERN = re.compile(r"(\w+)\s*=\s*\"([^\"]*)\"")
+
+# Returns the SQL statement of a query file and its tables, as a dictionary
+# from table name to mapreduce.sql.Table.
+def readQueryFile(fileName):
+    with open(fileName, encoding="utf-8") as queryFile:
+        text = queryFile.read()
+
+    baseDir = os.path.dirname(os.path.abspath(fileName))
+    tables = {}
+    for match in TABLE_PATTERN.finditer(text):
+        attributes = dict((name.lower(), value) for name, value
+                          in ATTRIBUTE_PATTERN.findall(match.group(1)))
+        if "name" not in attributes or "file" not in attributes:
+            sys.exit("A <Table/> tag needs a name and a file: "
+                     + match.group(0))
+        # Paths may be written with Windows separators.
+        path = attributes.get("path", "").replace("\\", "/")
+        tableFile = os.path.join(baseDir, path, attributes["file"])
+        tableFile = os.path.normpath(tableFile)
+        tables[attributes["name"]] = MapReduce.sql.Table(
+            attributes["name"], tableFile, attributes.get("format"))
+
+    statement = TABLE_PATTERN.sub("", text)
+    statement = re.sub(r"</?SQL>", "", statement, flags=re.IGNORECASE)
+    return statement, tables
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+if __name__ == '__main__':
+
+  statement, tables = readQueryFile(sys.argv[1])
+  try:
+    query = MapReduce.sql.Query(statement, tables)
+  except MapReduce.sql.SQLError as error:
+    sys.exit("Invalid SQL statement: %s" % error)
+
+  if len(sys.argv) > 2 and sys.argv[2] == "explain":
+    print(query.explain())
+  else:
+    numWorkers = 1
+    if len(sys.argv) > 2:
+      numWorkers = int(sys.argv[2])
+    query.run(mr, numWorkers=numWorkers)
@@ -1,5 +1,6 @@
 import MapReduce
 import sys
+import csv
 
 """
 This application is a map reduce implementation to implement
@@ -12,11 +13,12 @@ mr = MapReduce.MapReduce()
 # 
 #  Application Usage:
 #
-#      python SQLSelect.py arg-1 
+#      python SQLSelect.py arg-1 [arg-2]
 #
 #      arg-1 : File name containing table data in csv format. 
 #              The first row of the file should contain the column names. 
 #              The first column of each row should identify the table name. 
+#      arg-2 : Optional number of worker processes.
 #  The application is hard-coded to implement a SQL statement that answers
 #  the following question on the 'Posts" data of stack overflow:
 #
@@ -32,27 +34,33 @@ mr = MapReduce.MapReduce()
 #  
 #  Algorithm Design:
 #  
-#  Key Idea: Send all records that match the predicate in the WHERE clause
-#            to the same reducer.
+#  Key Idea: Nothing needs to be grouped, so the records that match the
+#            predicate in the WHERE clause are written out by the mapper
+#            (map-only job), and the predicate is checked while the input
+#            is parsed, before the rest of the record is.
 #
 #  Initial Setup:
 #  1. Read the first line of the input file and store the column names 
 #     as a dictionary. The key will be the column name and the value will
 #     be it's position in the row.
 #     This should be done before calling the execute method of MapReduce
-#     The MapReduce module is designed to skip the first line of a CSV file.
-# 
+#  2. Register the reader of the job (see unansweredReader).
+#
+#  Reader:
+#  1. Input:  One line from the file. The header line is skipped.
+#  2. Only the fields up to AnswerCount are split off the line. Lines whose
+#     AnswerCount is not zero are dropped there, without splitting the
+#     rest of the line. A NULL (empty) AnswerCount is not zero.
+#  3. Output: (Title, Score, ViewCount, CommentsCount) of the other lines.
+#     Lines with quoted fields are parsed as CSV before they are checked,
+#     since their commas do not all separate fields.
+#
 #  Mapper:
-#  1. Input:  One line from the file. This will be a list containing the
-#             values of each column of a record.
-#  2. Key   : AnswerCount
-#     value : (Title, Score, ViewCount, CommentsCount)
-#     Do not emit anything if the AnswerCount field is NULL. 
-#  Reducer:
-#     Emit an output only if the key is zero.     
+#     Emit ('0', (Title, Score, ViewCount, CommentsCount)) as the output.
+#  There is no reducer: nothing is shuffled and the output records come in
+#  the order of the input file.
 #
-# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++       
-
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 """
   Questions:
   1. How would you extend the algorithm to include questions that have answers 
@@ -74,36 +82,36 @@ mr = MapReduce.MapReduce()
 # Global list to hold column names
 columnNames = {}
 
-# Record Format : A line from the input file.
-def mapper(record):
-        
-    global columnNames
-    
-    # Get the column index for column AnswerCount from the columnNames dict.
+# The columns of the SELECT clause, in order.
+selectColumns = ['Title', 'Score', 'ViewCount', 'CommentsCount']
+
+# Reader of the Posts table that yields the selected columns of the records
+# whose AnswerCount is zero, as a tuple. It is given the byte range of a split
+# like the CSV reader.
+def unansweredReader(fileName, start, end):
     answerCountIdx = columnNames['AnswerCount']
-    
-    # Extract the value of AnswerCount from the record.
-    key = record[answerCountIdx]
-    
-    # Get the column index for Title, Score, ViewCount and CommentsCount
-    titleIdx = columnNames['Title']
-    scoreIdx = columnNames['Score']
-    viewCountIdx = columnNames['ViewCount']
-    commentsCountIdx = columnNames['CommentsCount']
-    
-    # Setup the value as a tuple "val = (a,b,c) "
-    value = (record[titleIdx],record[scoreIdx],record[viewCountIdx],record[commentsCountIdx])
-    
-    # Emit only if key is not NULL
-    if key <> "":
-        mr.emit_intermediate(key,value)
+    selectIdx = [columnNames[column] for column in selectColumns]
+    lines = MapReduce.decodeLines(MapReduce.readLines(fileName, start, end))
+    if start == 0:
+        # Skip the header line.
+        next(lines, None)
+    for line in lines:
+        if '"' in line:
+            fields = next(csv.reader([line]))
+        else:
+            # Split off the fields up to AnswerCount only.
+            fields = line.split(',', answerCountIdx + 1)
+        if len(fields) <= answerCountIdx or fields[answerCountIdx] != '0':
+            continue
+        if '"' not in line:
+            fields = line.rstrip('\r\n').split(',')
+        yield tuple(fields[index] if index < len(fields) else ''
+                    for index in selectIdx)
 
-def reducer(key, list_of_values):
-     
-    # Emit output only if key is zero. The key will be a string
-    if (key == '0'):
-        for val in list_of_values:
-            mr.emit((key,val))
+# Record Format : (Title, Score, ViewCount, CommentsCount) of a question
+#                 with no answer.
+def mapper(record):
+    mr.emit(('0', record))
 
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 if __name__ == '__main__':
@@ -120,8 +128,15 @@ if __name__ == '__main__':
   for columnName in columnNamesList:
     columnNames[columnName] = count
     count += 1
-  
-  inputdata = open(sys.argv[1])
+
+  MapReduce.registerReader("CSV-Unanswered", unansweredReader,
+                           splittable=True)
+
+  numWorkers = 1
+  if len(sys.argv) > 2:
+    numWorkers = int(sys.argv[2])
+
   fileNameList = []
   fileNameList.append(sys.argv[1])
-  mr.execute(fileNameList, mapper, reducer,"CSV-SkipFirstLine")
+  mr.execute(fileNameList, mapper, None, "CSV-Unanswered",
+             numWorkers=numWorkers)
@@ -13,7 +13,7 @@ def extractPostsXML(treeRoot):
     for xmlAtt in xmlAttributes:
         hdrStr += xmlAtt + ","
     hdrStr += "Title"
-    print hdrStr
+    print(hdrStr)
     
     # Iterate over each node and print the values    
     for child in treeRoot:
@@ -31,7 +31,7 @@ def extractPostsXML(treeRoot):
             titleStr = attrib['Title']
             csvStr += titleStr.replace(',',' ')
         
-        print csvStr
+        print(csvStr)
 
 def extractUsersXML(treeRoot):
     # We extract only some of the attributes from the XML record.
@@ -41,11 +41,11 @@ def extractUsersXML(treeRoot):
     hdrStr = "TableName,"
     for xmlAtt in xmlAttributes:
         # There should be no comma after the last attribute
-        if xmlAtt <> "DownVotes":
+        if xmlAtt != "DownVotes":
             hdrStr += xmlAtt + ","
         else:
             hdrStr += xmlAtt
-    print hdrStr
+    print(hdrStr)
     
     # Iterate over each node and print the values
     for child in treeRoot:
@@ -55,12 +55,12 @@ def extractUsersXML(treeRoot):
         for xmlAtt in xmlAttributes:
             if xmlAtt in attrib:
                 # No comma after the last attribute
-                if xmlAtt <> 'DownVotes':
+                if xmlAtt != 'DownVotes':
                     csvStr += attrib[xmlAtt]
                     csvStr += ","
                 else:
                     csvStr += attrib[xmlAtt]
-        print csvStr
+        print(csvStr)
 
 if __name__ == '__main__':
     fileName = sys.argv[1]
@@ -0,0 +1,18 @@
+<SQL>
+<Table name="Aadhar" file="aadhar_sample.csv" path="../../datasets/aadhar_sample"/>
+-- Aadhaar numbers generated and enrolments rejected by state, district and
+-- gender, with the subtotals of every district and state and the grand
+-- total, computed in a single scan. Subtotal rows have NULL (an empty
+-- field) in the columns they add up, which the GROUPING columns tell from
+-- missing values.
+SELECT State, District, Gender,
+       COUNT(*) AS Enrolments,
+       SUM("Aadhaar generated") AS Generated,
+       SUM("Enrolment Rejected") AS Rejected,
+       AVG(Age) AS AverageAge,
+       GROUPING(District) AS AllDistricts,
+       GROUPING(Gender) AS AllGenders
+FROM Aadhar
+GROUP BY ROLLUP(State, District, Gender)
+HAVING COUNT(*) >= 5
+</SQL>
@@ -0,0 +1,13 @@
+<SQL>
+<Table name="Posts" file="Posts_Sample.csv" path="../../datasets/cstheory_sample"/>
+-- Number of posts by length of their title, as in SQLGroupBy.py. Posts with
+-- no title fall into the last range, as they do there.
+SELECT CASE WHEN LENGTH(Title) BETWEEN 1 AND 10 THEN '1_10'
+            WHEN LENGTH(Title) BETWEEN 11 AND 20 THEN '11_20'
+            WHEN LENGTH(Title) BETWEEN 21 AND 30 THEN '21_30'
+            ELSE '30+'
+       END AS TitleRange,
+       COUNT(*)
+FROM Posts
+GROUP BY TitleRange
+</SQL>
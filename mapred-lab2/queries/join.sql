@@ -0,0 +1,10 @@
+<SQL>
+<Table name="Users" file="Users_Sample.csv" path="../../datasets/cstheory_sample"/>
+<Table name="Posts" file="Posts_Sample.csv" path="../../datasets/cstheory_sample"/>
+-- Questions asked by users with a reputation of at least 500, as in
+-- SQLJoin.py.
+SELECT Users.Id, Users.DisplayName, Users.Reputation,
+       Posts.Title, Posts.AnswerCount, Posts.CommentCount
+FROM Users JOIN Posts ON Users.Id = Posts.OwnerUserId
+WHERE Users.Reputation >= 500 AND Posts.PostTypeId = 1
+</SQL>
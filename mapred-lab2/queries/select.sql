@@ -0,0 +1,7 @@
+<SQL>
+<Table name="Posts" file="Posts_Sample.csv" path="../../datasets/cstheory_sample"/>
+-- Questions that have no answer yet, as in SQLSelect.py.
+SELECT Title, Score, ViewCount, CommentsCount
+FROM Posts
+WHERE AnswerCount = 0
+</SQL>
@@ -0,0 +1,68 @@
+import MapReduce
+import sys
+import os
+
+"""
+This application answers the friend-of-a-friend recommendations of
+recommedBooks.py from an index of the book relationships, without running a
+job.
+"""
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+#
+#  Application Usage:
+#
+#      python BookIndex.py arg-1 [arg-2 [arg-3]]
+#
+#      arg-1:  File in csv format containing existing relationships between
+#              books, as read by recommedBooks.py.
+#      arg-2:  Optional ISBN of the book to recommend books for, or "all"
+#              to print the recommendations of every book as
+#              recommedBooks.py does.
+#      arg-3:  Optional number of recommendations per book, TOP_K by
+#              default.
+#
+#  The relationships are indexed into a file of the same name with the
+#  extension .graph, next to the csv file, unless that file was already
+#  built from the csv file as it is now. The index is memory mapped, so
+#  later runs only read the part of it they use, for example
+#
+#      python BookIndex.py ../datasets/library_sample/book_buddies.csv 0131103628
+#
+#  The index numbers the books in the order of their ISBNs and keeps, for
+#  every book, the books it recommends and the books recommending it, with
+#  their weights, in compressed sparse row arrays (see mapreduce/graph.py).
+#  The second level recommendations of a book are then gathered and scored
+#  with NumPy, from the rows of the books recommending it. "all" scores
+#  many books at a time, in batches of about two million paths.
+#
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+# Number of recommendations printed for each book, unless given as arg-3.
+TOP_K = 10
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+if __name__ == '__main__':
+
+  csvFileName = sys.argv[1]
+  graphFileName = os.path.splitext(csvFileName)[0] + ".graph"
+  if not MapReduce.graph.isUpToDate(graphFileName, csvFileName):
+    MapReduce.graph.build(csvFileName, graphFileName)
+    index = MapReduce.graph.openGraphIndex(graphFileName)
+    print("%s: %d books, %d relationships, %d bytes"
+          % (graphFileName, index.bookCount, index.edgeCount,
+             os.path.getsize(graphFileName)), file=sys.stderr)
+  index = MapReduce.graph.openGraphIndex(graphFileName)
+
+  topK = TOP_K
+  if len(sys.argv) > 3:
+    topK = int(sys.argv[3])
+
+  if len(sys.argv) > 2 and sys.argv[2] == "all":
+    for record in index.recommendAll(topK):
+      print(record)
+  elif len(sys.argv) > 2:
+    if index.bookId(sys.argv[2]) is None:
+      sys.exit("%s is not in %s" % (sys.argv[2], csvFileName))
+    for isbn, score in index.recommend(sys.argv[2], topK):
+      print("%s,%d" % (isbn, score))
@@ -1,5 +1,6 @@
 import MapReduce
 import sys
+import heapq
 
 """
 This application is a map reduce implementation to implement a SQL Join.
@@ -11,12 +12,16 @@ mr = MapReduce.MapReduce()
 # 
 #  Application Usage:
 #
-#      python recommendBook.py arg-1 
+#      python recommedBooks.py arg-1 [arg-2]
 #
 #      arg-1:  File in csv format containing existing relationships between
 #              books. Each line will contain the IBN of a book followed by a 
 #              list (variable size for each book) of books that have been
-#              issued along withe the book. 
+#              issued along withe the book. Each book of the list can be
+#              followed by :weight, the number of times both books were
+#              issued to the same person (see extractBookBuddiesToCSV.py).
+#      arg-2:  Optional number of recommendations per book, TOP_K by
+#              default.
 #  
 #  DataSet : Use the book_buddies.csv file within datasets/library_sample 
 #  
@@ -27,50 +32,63 @@ mr = MapReduce.MapReduce()
 #  
 #  Algorithm Design:
 #
-#  Key Idea: 1. Each reducer will focus on a pair of books. (Key will be a pair)
-#            2. The o/p of the reducer will be a set of recommendations for 
-#               both elements of the pair.
-#            3. Given a pair of books (A,B), get all the first level 
-#               recommendations(this is your dataset) for both A and B into the
-#               same reducer. 
+#  Key Idea: 1. Each reducer will focus on one book A. (Key will be a book)
+#            2. The o/p of the reducer will be the K best second level
+#               recommendations for A, ranked by score.
+#            3. A book C is a second level recommendation for A when some
+#               book B recommends both, A -> B -> C. Each such path adds
+#               weight(A,B) * weight(B,C) to the score of C, the weight of a
+#               pair being the number of times both books were borrowed
+#               together (the "common" attribute of the suggestions). Books
+#               without weights count 1, so the score is then the number of
+#               books recommending both.
+#            4. Get the first level recommendations of every book B that
+#               recommends A, with their weights, into the reducer of A.
 #               Example: Given A->BCE &
 #                              B->AD
 #                              C->A
 #                              D->B
 #                              E->A
-#                        Reducer (AB) will get ((BCE), (AD))
-#                        Reducer (AC) will get ((BCE), (A))
-#                        Reducer (AE) will get ((BCE), (A))
-#                        Reducer (BD) will get ((AD), (B))
-#                        Keys (AB) and (BA) will both have to sent to reducer
-#                        processing (AB). How will you do this? 
+#                        Reducer (A) will get the lists of B, C and E and
+#                        scores D through B.
+#                        Reducer (D) will get the list of B and scores A
+#                        through B.
 #  Initial Setup:
-#  
+#     None.
+#
 #  Mapper:
 #  1. Input:  One line from the file. This will be a comma separated list of
 #             book ISBNs. The first entry is the book and the rest are 
-#             first level recommendations for the book.
-#  2. Key   : Given a row of the form B,A,C,D emit the following keys with 
-#             the corresponding values:
-#             The row represents the relationship B->ACD, implying that
-#             books A,C and D are first-level connections of B
-#             ---------------------------------
-#             |    KEY   |       Value        |
-#             ---------------------------------
-#             |    AB    |   (B,['A','C','D'])| *note that BA is flipped to AB 
-#             |    BC    |   (B,['A','C','D'])|
-#             |    BD    |   (B,['A','C','D'])|
-#             ---------------------------------
-#     
+#             first level recommendations for the book, each optionally
+#             followed by :weight, such as B,A:3,C:1,D:5.
+#  2. Key   : Given a row of the form B,A:3,C:1,D:5 emit the following keys
+#             with the corresponding values:
+#             ---------------------------------------------
+#             |    KEY   |             Value              |
+#             ---------------------------------------------
+#             |    B     |   (None, 0, ((A,3),(C,1),(D,5))) |
+#             |    A     |   (B, 3, ((A,3),(C,1),(D,5)))   |
+#             |    C     |   (B, 1, ((A,3),(C,1),(D,5)))   |
+#             |    D     |   (B, 5, ((A,3),(C,1),(D,5)))   |
+#             ---------------------------------------------
+#     The first pair gives B its own first level recommendations. All the
+#     values share the same tuple of recommendations.
+#
 #  Reducer:
-#     Each reducer will have two items in its list of values. Given the key AB,
-#     one value will be the list of first-level recommedations for A and the 
-#     other value will be the list of first-level recommendations for B. 
-#     To deduce the second level recommendations for A, we need to extract the 
-#     elements from the first level recommendations for B that are not present
-#     in A already. In a sense this will be equivalent to the set operation:
-#     2nd level recommendations for A =   
-#      [first level recommendations for B] - [first level recommendations for A]
+#     Given the key A, the books already connected to A are A itself, its
+#     first level recommendations and the books B that recommend it. For
+#     each value (B, weight(B,A), recommendations of B) add
+#     weight(B,A) * weight(B,C) to the score of every recommendation C of B,
+#     using a dictionary from book to score, and remove the books already
+#     connected to A from it. Scores of the same book found through several
+#     books B add up.
+#     Emit (A, [(C, score), ...]) with the K books of highest score, ties
+#     going to the smallest ISBN, if there is at least one.
+#     Looking books up in sets and dictionaries makes the reducer linear in
+#     the size of its values, where comparing lists was cubic.
+#
+#  BookIndex.py answers the same recommendations from an index of the file,
+#  for one book at a time or all of them, without running a job.
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 
 """
@@ -78,87 +96,84 @@ mr = MapReduce.MapReduce()
   1. 
      
   Extensions:
-  1. Extend the algorithm to support recommendations based on the weight of the 
-     relationships. In this case, given a relationship A->B, the weight will be
-     the number of times A and B have been issued by the same person.
+  1. The scores use the weight of the relationships, the number of times A
+     and B have been issued by the same person. Extend the algorithm to
+     normalize them by the total number of times each book was issued (the
+     "total" attribute of the suggestions), so popular books do not crowd
+     out the others.
      
 """
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 # Global declarations
 
+# Number of recommendations emitted for each book, unless given as arg-2.
+TOP_K = 10
+topK = TOP_K
+
+# Returns the (ISBN, weight) of an entry of a line, ISBN or ISBN:weight.
+def parseRecommendation(entry):
+    isbn, separator, weight = entry.partition(":")
+    if separator:
+        return isbn, int(weight)
+    return isbn, 1
+
 # Record Format : A line from the input file.
 def mapper(record):
     
-    # Split the record to extract all the books 
-    booksInRecord = record
-    
     # Extract the first element from the row. This is the book for which
     # the row contains a list of recommendations.
-    mainBook = booksInRecord[0]
-    
-    # Extract the recommendations for the book from the record
-    recommendations = booksInRecord[1:]
+    mainBook = record[0]
     
-    # Iterate over elements 1..n of the record and emit a key,value of the form
-    # ((K1,K2) , booksInRecord), where K1 < K2.
-    for reco in recommendations:
-        if (mainBook < reco):
-            key = (mainBook,reco)
-        else:
-            key = (reco,mainBook)
-    
-        mr.emit_intermediate(key,booksInRecord)
+    # Extract the recommendations for the book from the record, with their
+    # weights.
+    recommendations = tuple(parseRecommendation(entry)
+                            for entry in record[1:] if entry)
     
+    # The book gets its own recommendations, and every book it recommends
+    # gets them along with their weight.
+    mr.emit_intermediate(mainBook, (None, 0, recommendations))
+    for reco, weight in recommendations:
+        mr.emit_intermediate(reco, (mainBook, weight, recommendations))
     
 def reducer(key, list_of_values):
-    # There should be two elements in the list of values. Each of these 
-    # elements are lists in themselves. The first element of the list
-    # identifies where main book for which the list contains recommendations.
-    
-    # Split the key info bookA and bookB
-    bookA = key[0]
-    bookB = key[1]
-    
-    # Find the recos for first-level recos for bookA and bookB
-    firstLevelRecosForA = []
-    firstLevelRecosForB = []
     
-    for item in list_of_values:
-        if (item[0] == bookA):
-            firstLevelRecosForA = item
+    # Find the books already connected to the book, and the paths through
+    # the books that recommend it.
+    connected = set([key])
+    paths = []
+    for via, weight, recommendations in list_of_values:
+        if via is None:
+            connected.update(reco for reco, recoWeight in recommendations)
         else:
-            firstLevelRecosForB = item
-    
-    # For bookA find the elements in firstLevelReosForB that are not in 
-    # firstLevelRecosForA and vice versa and emit the values as a single
-    # string
-    newRecosForA = [bookA]
-    newRecosForB = [bookB]
-    commaStr = ","
-    
-    for itemB in firstLevelRecosForB:
-        for itemA in firstLevelRecosForA:
-            if (itemB <> itemA) and (itemB not in firstLevelRecosForA) and (itemB not in newRecosForA):
-                newRecosForA.append(itemB)
-    # Emit a record only if the list has atleast 2 items
-    if (len(newRecosForA) > 1 ):            
-        mr.emit(newRecosForA)
-
-    for itemA in firstLevelRecosForA:
-        for itemB in firstLevelRecosForB:
-            if (itemA <> itemB) and (itemA not in firstLevelRecosForB) and (itemA not in newRecosForB):
-                newRecosForB.append(itemA)
-                
-    # Emit a record only if the list has atleast 2 items
-    if (len(newRecosForB) > 1 ):            
-        mr.emit(newRecosForB)
+            connected.add(via)
+            paths.append((weight, recommendations))
     
+    # Add up the scores of the books reached through each path, then drop
+    # the books already connected.
+    scores = {}
+    get = scores.get
+    for weight, recommendations in paths:
+        for reco, recoWeight in recommendations:
+            scores[reco] = get(reco, 0) + weight * recoWeight
+    for book in connected:
+        scores.pop(book, None)
     
+    # Emit a record only if there is at least one recommendation. Only the
+    # books scoring at least the K-th best score are sorted.
+    if scores:
+        candidates = scores.items()
+        if len(scores) > topK:
+            kthScore = heapq.nlargest(topK, scores.values())[-1]
+            candidates = [item for item in candidates if item[1] >= kthScore]
+        best = sorted(candidates, key=lambda item: (-item[1], item[0]))
+        mr.emit((key, best[:topK]))
 
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 if __name__ == '__main__':
 
+  if len(sys.argv) > 2:
+    topK = int(sys.argv[2])
+
   fileNameList=[]
   fileNameList.append(sys.argv[1])
   mr.execute(fileNameList, mapper, reducer,"CSV")
-  
\ No newline at end of file
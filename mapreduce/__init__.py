@@ -0,0 +1,66 @@
+# Original Author : Course staff, "Introduction to data science", coursera.org
+# Modified By     : Krishnamoorthy B
+# Modifications   : 1. Added support for the following file formats
+#                          a. Comma Separated Values
+#                          b. XML files containing the StackExchange dump.
+#                          c. Plain text files.
+#                   2. Added a parallel execution mode. Pass numWorkers > 1
+#                      to execute to map and reduce in worker processes.
+#                   3. Added spilling of intermediate data to disk once it
+#                      goes over a memory budget (memoryBudget in execute).
+#                   4. Added support for a combiner that pre-aggregates the
+#                      values of a key on the map side.
+#                   5. SOXML files are parsed incrementally, so memory use
+#                      does not grow with the size of the dump.
+#                   6. TEXT, CSV and JSON files are divided into byte range
+#                      splits that are mapped independently.
+#                   7. Added an optional sort based shuffle that hands the keys
+#                      to the reducers in sorted order.
+#                   8. Reducers can be given their values as a stream instead
+#                      of a list (streamValues in execute).
+#                   9. Results are written out as the reducers emit them, to
+#                      stdout or to a file (outputPath in execute).
+#                  10. Added an optional job report with counters, phase
+#                      timings and the heaviest keys (report in execute).
+#                  11. The engine is a single package shared by all the labs,
+#                      runs on Python 3 and reads its input through pluggable
+#                      readers (registerReader).
+#                  12. Added a Tokenizer for mappers of text: regular expression
+#                      word splitting, case folding, punctuation stripping,
+#                      stop words and optional stemming.
+#                  13. Added perceptual hashes of images (imagehash).
+#                  14. Added a persistent cache of values computed from files,
+#                      keyed on their path, size and modification time
+#                      (FileCache).
+#                  15. Added Bloom filters (BloomFilter) and application
+#                      counters in the job report (increment).
+#                  16. Added SQL queries compiled into MapReduce jobs, with
+#                      predicate and projection pushdown, map-only plans,
+#                      combiners for aggregates and broadcast joins (sql).
+#                  17. Added a typed, memory mapped column store of CSV tables
+#                      (columnar), read by the COLUMNAR format.
+#                  18. Added a memory mapped CSR index of graphs of books with
+#                      two-hop recommendations computed by NumPy (graph).
+#
+# Usage:
+#
+#     import mapreduce
+#     mr = mapreduce.MapReduce()
+#     mr.execute(fileNameList, mapper, reducer, "CSV")
+#
+# The programs of the labs import the MapReduce.py module next to them, which
+# re-exports this package, so they run without installing it.
+from .engine import MapReduce
+from .readers import registerReader, readLines, decodeLines, sampleRecords
+from .shuffle import ValueStream
+from .text import Tokenizer, stem
+from .filecache import FileCache
+from .bloom import BloomFilter
+from . import imagehash
+from . import columnar
+from . import graph
+from . import sql
+
+__all__ = ["MapReduce", "registerReader", "readLines", "decodeLines",
+           "sampleRecords", "ValueStream", "Tokenizer", "stem", "FileCache",
+           "BloomFilter", "imagehash", "columnar", "graph", "sql"]
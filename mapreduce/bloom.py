@@ -0,0 +1,65 @@
+# Bloom filter: a compact set that answers "possibly in the set" or "certainly
+# not in the set".
+#
+# A mapper can use one to drop, before they are emitted, the records whose
+# key cannot find a match on the other side of a join (a semijoin):
+#
+#     users = mapreduce.BloomFilter(len(userIds), 0.01)
+#     for userId in userIds:
+#         users.add(userId)
+#
+#     def mapper(record):
+#         if record[ownerColumn] in users:
+#             mr.emit_intermediate(record[ownerColumn], record)
+#
+# A key that was added is always found. A key that was not is found with
+# probability falsePositiveRate, so the reducer must still check the matches.
+# The filter takes about 1.44 * log2(1 / falsePositiveRate) bits per key, 10
+# bits for a rate of 1%, whatever the size of the keys.
+#
+# Positions are computed from hash(), which is randomized for strings in
+# every interpreter run. A filter is therefore only valid in the process that
+# built it and in the workers forked from it, which is how parallel jobs
+# share it.
+import math
+
+class BloomFilter(object):
+    # capacity          - Number of keys the filter is sized for. Adding more
+    #                     keys raises the false positive rate.
+    # falsePositiveRate - Probability that a key that was not added is found.
+    def __init__(self, capacity, falsePositiveRate=0.01):
+        if not 0 < falsePositiveRate < 1:
+            raise ValueError("falsePositiveRate must be between 0 and 1, "
+                             "not %r" % falsePositiveRate)
+        capacity = max(capacity, 1)
+        self.numBits = max(int(math.ceil(-capacity * math.log(falsePositiveRate)
+                                         / math.log(2) ** 2)), 8)
+        self.numHashes = max(int(round(self.numBits / capacity * math.log(2))),
+                             1)
+        self.bits = bytearray((self.numBits + 7) // 8)
+        self.count = 0
+
+    # Returns the bit positions of a key. They are derived from two 32 bit
+    # halves of a single hash (double hashing), which is as good as
+    # numHashes independent hash functions.
+    def positions(self, key):
+        keyHash = hash((key, 0x9e3779b9)) & 0xFFFFFFFFFFFFFFFF
+        step = (keyHash >> 32) | 1
+        position = keyHash & 0xFFFFFFFF
+        numBits = self.numBits
+        for i in range(self.numHashes):
+            yield position % numBits
+            position += step
+
+    def add(self, key):
+        bits = self.bits
+        for position in self.positions(key):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        bits = self.bits
+        for position in self.positions(key):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
@@ -0,0 +1,313 @@
+# Column store of CSV tables, for tables that are queried again and again.
+#
+# convert reads a CSV file whose first line holds the column names once and
+# writes its columns, typed, to a single file:
+#
+#     mapreduce.columnar.convert("Posts.csv", "Posts.columns")
+#
+# A column whose values all read back as the same text when they are
+# written as Python ints or floats is stored as a NumPy array of int64 or
+# float64, ints in the smallest of int8, int16, int32 and int64 that holds
+# them. Other columns are dictionary encoded: the distinct strings are kept
+# once, sorted, and the rows hold the int32 code of their string. An
+# empty field is NULL, which numeric columns record in a separate mask and
+# string columns as the code -1.
+#
+# Files in the COLUMNAR format are memory mapped and read a block of rows at
+# a time. Their records are ColumnBlock objects, not rows: a mapper reads
+# the columns it needs from the block, as NumPy arrays or as lists of
+# Python values, and the columns it does not use are never read. For
+# example
+#
+#     def mapper(block):
+#         for postId, score in block.rows(["Id", "Score"]):
+#             ...
+#
+#     mr.execute(["Posts.columns"], mapper, reducer, "COLUMNAR")
+#
+# Splits of a COLUMNAR file are ranges of rows in proportion to the byte
+# ranges the engine gives them. NumPy is imported the first time a file is
+# converted or read.
+#
+# File layout: a data file (see mapreduce.datafile) starting with MAGIC. Its
+# header holds the number of rows, the size and modification time of the CSV
+# file and, for every column, its name, its type, the NumPy dtype of its
+# values and the offsets in the data of its values, NULL mask and
+# dictionary. Dictionaries are stored as JSON lists of strings.
+import os
+import array
+import bisect
+import itertools
+
+from .readers import registerReader, readRecords
+from . import datafile
+
+MAGIC = b"MAPREDUCE COLUMNS 1\n"
+
+# Largest number of rows of a block.
+BLOCK_ROWS = 65536
+
+# Types of the columns: type -> NumPy dtype of the values, and typecode of
+# the array they are collected in by convert.
+DTYPES = {"int": "<i8", "float": "<f8", "string": "<i4"}
+TYPECODES = {"int": "q", "float": "d", "string": "i"}
+
+# The dtypes int columns are stored as, from the smallest.
+INT_DTYPES = ("<i1", "<i2", "<i4", "<i8")
+
+INT64_RANGE = (-2 ** 63, 2 ** 63)
+
+# Returns True if the text of a CSV field is written back unchanged as an
+# int, such as "42" but not "042" or "+42".
+def isIntText(text):
+    try:
+        value = int(text)
+    except ValueError:
+        return False
+    return (str(value) == text and
+            INT64_RANGE[0] <= value < INT64_RANGE[1])
+
+def isFloatText(text):
+    try:
+        value = float(text)
+    except ValueError:
+        return False
+    return repr(value) == text and value - value == 0
+
+# Converts a CSV file whose first line holds the column names into a
+# COLUMNAR file, by default the CSV file name with the extension .columns.
+# Rows with fewer fields than columns get NULL for the missing ones and
+# extra fields are dropped. Returns the name of the COLUMNAR file.
+def convert(csvFileName, columnsFileName=None):
+    import numpy
+    if columnsFileName is None:
+        columnsFileName = os.path.splitext(csvFileName)[0] + ".columns"
+    stamp = datafile.sourceStamp(csvFileName)
+
+    # The first pass finds the type of every column.
+    rows = readRecords(csvFileName, "CSV")
+    names = next(rows, None)
+    if names is None:
+        raise ValueError("%s has no line of column names" % csvFileName)
+    ints = [True] * len(names)
+    floats = [True] * len(names)
+    for row in rows:
+        for index, text in enumerate(row[:len(names)]):
+            if text:
+                if ints[index] and not isIntText(text):
+                    ints[index] = False
+                if floats[index] and not isFloatText(text):
+                    floats[index] = False
+    types = ["int" if ints[index] else "float" if floats[index]
+             else "string" for index in range(len(names))]
+
+    # The second pass collects the values.
+    values = [array.array(TYPECODES[columnType]) for columnType in types]
+    nulls = [bytearray() for name in names]
+    codes = [{} for name in names]
+    rowCount = 0
+    for row in readRecords(csvFileName, "CSV-SkipFirstLine"):
+        rowCount += 1
+        for index in range(len(names)):
+            text = row[index] if index < len(row) else ""
+            if types[index] == "string":
+                if text:
+                    code = codes[index].setdefault(text, len(codes[index]))
+                else:
+                    code = -1
+                values[index].append(code)
+            else:
+                nulls[index].append(not text)
+                if not text:
+                    values[index].append(0)
+                elif types[index] == "int":
+                    values[index].append(int(text))
+                else:
+                    values[index].append(float(text))
+
+    # Columns are laid out one after the other. Dictionary codes are
+    # renumbered in the order of the strings.
+    writer = datafile.DataFileWriter()
+    columns = []
+    for index, name in enumerate(names):
+        column = {"name": name, "type": types[index], "nulls": None,
+                  "dictionary": None}
+        columnValues = numpy.frombuffer(values[index],
+                                        dtype=DTYPES[types[index]])
+        if types[index] == "string":
+            strings = sorted(codes[index])
+            newCodes = numpy.empty(len(strings) + 1, dtype=DTYPES["string"])
+            newCodes[-1] = -1
+            for newCode, string in enumerate(strings):
+                newCodes[codes[index][string]] = newCode
+            columnValues = newCodes[columnValues]
+            column["dictionary"] = writer.addJsonPart(strings)
+        elif any(nulls[index]):
+            column["nulls"] = writer.addPart(bytes(nulls[index]))
+        if types[index] == "int" and len(columnValues):
+            low, high = int(columnValues.min()), int(columnValues.max())
+            for dtype in INT_DTYPES:
+                limits = numpy.iinfo(dtype)
+                if limits.min <= low and high <= limits.max:
+                    columnValues = columnValues.astype(dtype)
+                    break
+        column["dtype"] = columnValues.dtype.str
+        column["values"] = writer.addPart(columnValues.tobytes())
+        columns.append(column)
+        values[index] = nulls[index] = codes[index] = None
+
+    writer.write(columnsFileName, MAGIC,
+                 {"rows": rowCount, "source": stamp, "columns": columns})
+    return columnsFileName
+
+# Returns True if the COLUMNAR file exists and was converted from the CSV
+# file as it is now.
+def isUpToDate(columnsFileName, csvFileName):
+    return datafile.isUpToDate(columnsFileName, MAGIC, csvFileName)
+
+# The columns of a COLUMNAR file, memory mapped.
+class ColumnFile(datafile.DataFile):
+    def __init__(self, fileName):
+        datafile.DataFile.__init__(self, fileName, MAGIC, "a COLUMNAR file")
+        self.rowCount = self.header["rows"]
+        self.columns = dict((column["name"], column)
+                            for column in self.header["columns"])
+        self.columnNames = [column["name"]
+                            for column in self.header["columns"]]
+        # name -> list of the strings of the column, followed by None so
+        # that the code -1 of NULL gives None.
+        self.dictionaries = {}
+
+    def columnType(self, name):
+        return self.columns[name]["type"]
+
+    # Returns the values, or codes, of a column as a read-only NumPy array.
+    def array(self, name):
+        column = self.columns[name]
+        return self.part(column["values"], column["dtype"],
+                         self.rowCount)
+
+    # Returns the NULL mask of a numeric column, None if it has no NULL.
+    def nullMask(self, name):
+        column = self.columns[name]
+        if column["nulls"] is None:
+            return None
+        return self.part(column["nulls"], "?", self.rowCount)
+
+    # Returns the decoded dictionary of a string column, read once.
+    def dictionary(self, name):
+        strings = self.dictionaries.get(name)
+        if strings is None:
+            strings = self.jsonPart(self.columns[name]["dictionary"])
+            strings.append(None)
+            self.dictionaries[name] = strings
+        return strings
+
+    # Returns the first code of the strings of a column that are at least
+    # low, or greater than low if inclusive is False. Codes follow the order
+    # of the strings.
+    def firstCodeAbove(self, name, low, inclusive=True):
+        strings = self.dictionary(name)
+        if inclusive:
+            return bisect.bisect_left(strings, low, 0, len(strings) - 1)
+        return bisect.bisect_right(strings, low, 0, len(strings) - 1)
+
+    # Returns the code of a string in a column, None if no row has it.
+    def code(self, name, string):
+        code = self.firstCodeAbove(name, string)
+        strings = self.dictionary(name)
+        if code < len(strings) - 1 and strings[code] == string:
+            return code
+        return None
+
+# fileName -> (size, modification time, ColumnFile). Map workers forked
+# after a file was opened share it.
+openFiles = {}
+
+def openColumnFile(fileName):
+    stat = os.stat(fileName)
+    entry = openFiles.get(fileName)
+    if entry is None or entry[:2] != (stat.st_size, stat.st_mtime_ns):
+        entry = (stat.st_size, stat.st_mtime_ns, ColumnFile(fileName))
+        openFiles[fileName] = entry
+    return entry[2]
+
+# The record of a block of consecutive rows of a COLUMNAR file, from row
+# start (included) to row end (excluded). Columns are read when they are
+# asked for. A selection is a NumPy array of booleans with one element per
+# row of the block, which restricts values and rows to the rows set in it.
+class ColumnBlock(object):
+    def __init__(self, columnFile, start, end):
+        self.columnFile = columnFile
+        self.start = start
+        self.end = end
+
+    @property
+    def fileName(self):
+        return self.columnFile.fileName
+
+    @property
+    def columns(self):
+        return self.columnFile.columnNames
+
+    def __len__(self):
+        return self.end - self.start
+
+    def columnType(self, name):
+        return self.columnFile.columnType(name)
+
+    # Returns the values of a numeric column, or the codes of a string
+    # column, as a NumPy array. The values of NULL numeric fields are 0.
+    def array(self, name):
+        return self.columnFile.array(name)[self.start:self.end]
+
+    # Returns the NumPy array of booleans telling which rows are NULL in a
+    # column, or None if none are.
+    def nulls(self, name):
+        if self.columnType(name) == "string":
+            return self.array(name) < 0
+        mask = self.columnFile.nullMask(name)
+        if mask is None:
+            return None
+        return mask[self.start:self.end]
+
+    # Returns the list of the values of a column as Python ints, floats or
+    # strings, with None for NULL.
+    def values(self, name, selection=None):
+        array = self.array(name)
+        if selection is not None:
+            array = array[selection]
+        if self.columnType(name) == "string":
+            strings = self.columnFile.dictionary(name)
+            return [strings[code] for code in array.tolist()]
+        values = array.tolist()
+        nulls = self.nulls(name)
+        if nulls is not None:
+            if selection is not None:
+                nulls = nulls[selection]
+            for index in nulls.nonzero()[0].tolist():
+                values[index] = None
+        return values
+
+    # Returns an iterator of the rows of the block as tuples of the values
+    # of the named columns.
+    def rows(self, names, selection=None):
+        if not names:
+            count = len(self) if selection is None else int(selection.sum())
+            return itertools.repeat((), count)
+        return zip(*[self.values(name, selection) for name in names])
+
+# Reads the blocks of the rows in proportion to the split of the file, so
+# consecutive splits read every row exactly once.
+def columnsReader(fileName, start, end):
+    columnFile = openColumnFile(fileName)
+    fileSize = os.path.getsize(fileName)
+    if end is None:
+        end = fileSize
+    firstRow = columnFile.rowCount * start // fileSize if fileSize else 0
+    endRow = columnFile.rowCount * end // fileSize if fileSize else 0
+    for blockStart in range(firstRow, endRow, BLOCK_ROWS):
+        yield ColumnBlock(columnFile, blockStart,
+                          min(blockStart + BLOCK_ROWS, endRow))
+
+registerReader("COLUMNAR", columnsReader, splittable=True)
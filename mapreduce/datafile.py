@@ -0,0 +1,111 @@
+# Files of NumPy arrays built once from a CSV file and memory mapped by every
+# later run, the layout of COLUMNAR files (see mapreduce.columnar) and of
+# graph indexes (see mapreduce.graph).
+#
+# File layout: a line telling the kind of the file, its magic, the length of
+# the header as an 8 byte little endian number, the header in JSON and, from
+# the next multiple of 8 bytes, the data. The data is made of parts laid out
+# one after the other, each aligned on 8 bytes, so that every part can be
+# viewed as a NumPy array in place. The header holds "source", the size and
+# modification time of the file the data file was built from, and whatever
+# else the kind of file needs, such as the offsets of its parts in the data.
+#
+#     writer = DataFileWriter()
+#     header = {"source": sourceStamp("Posts.csv"),
+#               "ids": writer.addPart(ids.tobytes())}
+#     writer.write("Posts.ids", MAGIC, header)
+#
+# NumPy is imported the first time a data file is opened.
+import os
+import json
+
+from .readers import ENCODING
+
+# Returns the size and modification time of a file, which a data file built
+# from it keeps to tell whether it is up to date. It is taken before the
+# file is read, so a file changed while it is read gives a stale data file.
+def sourceStamp(fileName):
+    stat = os.stat(fileName)
+    return [stat.st_size, stat.st_mtime_ns]
+
+# The parts of a data file being built.
+class DataFileWriter(object):
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+
+    # Adds a part, bytes, and returns its offset in the data.
+    def addPart(self, data):
+        offset = self.size
+        self.parts.append(data)
+        self.size += len(data) + (-len(data)) % 8
+        return offset
+
+    # Adds a value as a part holding its JSON text, such as the list of the
+    # strings of a dictionary, and returns the [offset, size] of the part,
+    # which DataFile.jsonPart reads back.
+    def addJsonPart(self, value):
+        data = json.dumps(value, ensure_ascii=False).encode(ENCODING)
+        return [self.addPart(data), len(data)]
+
+    # Writes the file, starting with the line magic and the header, a
+    # dictionary.
+    def write(self, fileName, magic, header):
+        header = json.dumps(header).encode("utf-8")
+        prefix = magic + len(header).to_bytes(8, "little") + header
+        prefix += b"\0" * ((-len(prefix)) % 8)
+        with open(fileName, "wb") as dataFile:
+            dataFile.write(prefix)
+            for data in self.parts:
+                dataFile.write(data)
+                dataFile.write(b"\0" * ((-len(data)) % 8))
+
+# Returns the header of a data file and the offset of its data. Raises
+# ValueError if the file does not start with magic, with a message naming
+# the file as description, such as "a COLUMNAR file".
+def readHeader(fileName, magic, description):
+    with open(fileName, "rb") as dataFile:
+        if dataFile.readline() != magic:
+            raise ValueError("%s is not %s" % (fileName, description))
+        length = int.from_bytes(dataFile.read(8), "little")
+        header = json.loads(dataFile.read(length).decode("utf-8"))
+    dataStart = len(magic) + 8 + length
+    return header, dataStart + (-dataStart) % 8
+
+# Returns True if the data file exists, starts with magic and was built
+# from the source file as it is now.
+def isUpToDate(fileName, magic, sourceFileName):
+    try:
+        header = readHeader(fileName, magic, "a data file")[0]
+    except (OSError, ValueError):
+        return False
+    return header.get("source") == sourceStamp(sourceFileName)
+
+# A data file, memory mapped. Its header is in self.header.
+class DataFile(object):
+    def __init__(self, fileName, magic, description):
+        import numpy
+        self.fileName = fileName
+        self.header, self.dataStart = readHeader(fileName, magic, description)
+        # A plain array over the memory map, whose slices are cheaper than
+        # those of a memmap.
+        if os.path.getsize(fileName) > self.dataStart:
+            self.data = numpy.asarray(numpy.memmap(fileName, dtype=numpy.uint8,
+                                                   mode="r"))
+        else:
+            self.data = numpy.zeros(self.dataStart, dtype=numpy.uint8)
+
+    # Returns the part at an offset of the data as a read-only NumPy array
+    # of count values of a dtype.
+    def part(self, offset, dtype, count):
+        import numpy
+        start = self.dataStart + offset
+        size = count * numpy.dtype(dtype).itemsize
+        return self.data[start:start + size].view(dtype)
+
+    # Returns the value of a part added with DataFileWriter.addJsonPart,
+    # given its [offset, size].
+    def jsonPart(self, location):
+        offset, size = location
+        return json.loads(self.part(offset, "u1", size).tobytes()
+                          .decode(ENCODING))
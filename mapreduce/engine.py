@@ -0,0 +1,572 @@
+# The MapReduce job.
+import os
+import sys
+import heapq
+import pickle
+import shutil
+import tempfile
+import multiprocessing
+
+from .readers import readRecords, isSplittable, setInputEncoding
+from .output import OutputWriter, PartWriter
+from .report import JobCounters, timer
+from .shuffle import (CountedValues, ValueStream, objectSize, sortedPairs,
+                      writeRun, readRun, mergeRuns, tagPairs)
+
+# Number of input records mapped between two runs of the combiner.
+CHUNK_SIZE = 10000
+
+# Size in bytes of the splits that files in a splittable format (TEXT, CSV
+# and JSON) are divided into. A split is the unit of work handed to a map
+# worker.
+SPLIT_SIZE = 32 * 1024 * 1024
+
+# Number of emitted pairs between two estimates of the intermediate data size
+# when running with a memory budget.
+SPILL_CHECK_INTERVAL = 1000
+
+# The job being executed in parallel mode. Worker processes are forked from
+# the process that called execute, so they inherit this reference together
+# with the application's module-global mr, mapper and reducer. In a worker,
+# _activeJob and the application's mr are the same object.
+_activeJob = None
+
+class MapReduce:
+    def __init__(self):
+        self.intermediate = {}
+        self.result = []
+        self.pairCount = 0
+        self.flushedPairs = 0
+        self.nextMemoryCheck = None
+        self.combiner = None
+        self.combinableKeys = []
+        self.defaultKeys = ()
+        self.writer = None
+        self.counters = None
+
+    # With a combiner, the keys that got a second value since the last run
+    # of the combiner are listed in self.combinableKeys, so that it only
+    # combines those.
+    def emit_intermediate(self, key, value):
+        values = self.intermediate.get(key)
+        if values is None:
+            self.intermediate[key] = [value]
+        else:
+            values.append(value)
+            if len(values) == 2 and self.combiner is not None:
+                self.combinableKeys.append(key)
+        self.pairCount += 1
+        if self.pairCount == self.nextMemoryCheck:
+            self.checkMemory(key, value)
+
+    # Outside of execute the value is kept in self.result.
+    def emit(self, value):
+        if self.writer is None:
+            self.result.append(value)
+        else:
+            self.writer.write(value)
+
+    # Adds amount to an application counter of the job report, for example
+    # the number of records a mapper skipped. It does nothing when the job
+    # runs without a report.
+    def increment(self, counter, amount=1):
+        if self.counters is not None:
+            self.counters.increment(counter, amount)
+
+    # Returns the list of splits of the input files. A split is a tuple
+    # (fileName, start, end). Files in a splittable format are divided into
+    # ranges of splitSize bytes, other files form a single split.
+    def getSplits(self, fileNameList, fileFormat, splitSize):
+        splits = []
+        for fileName in fileNameList:
+            if isSplittable(fileFormat):
+                fileSize = os.path.getsize(fileName)
+                for start in range(0, fileSize, splitSize):
+                    splits.append((fileName, start, min(start + splitSize, fileSize)))
+            else:
+                splits.append((fileName, 0, None))
+        return splits
+
+    # Maps the records of a split, running the combiner after every
+    # CHUNK_SIZE records and at the end of the split.
+    def mapSplit(self, split, fileFormat):
+        fileName, start, end = split
+        records = readRecords(fileName, fileFormat, start, end)
+        if self.counters is not None:
+            records = self.counters.countRecords(records, split)
+            splitStart = timer()
+            readTime = self.counters.times["read"]
+            pairCount = self.pairCount
+
+        recordCount = 0
+        for record in records:
+            self.mapper(record)
+            recordCount += 1
+            if recordCount % CHUNK_SIZE == 0 and self.combiner is not None:
+                self.combine()
+        if self.combiner is not None:
+            self.combine()
+
+        if self.counters is not None:
+            readTime = self.counters.times["read"] - readTime
+            self.counters.addTime("map", timer() - splitStart - readTime)
+            self.counters.add("mapOutputPairs", self.pairCount - pairCount)
+
+    # Calls the reducer for one key. With a job report, the time spent in the
+    # reducer and the number and size of the values of the key are recorded.
+    def reduceKey(self, key, values):
+        if self.counters is None:
+            self.reducer(key, self.reducerInput(values))
+            return
+
+        if not isinstance(values, list):
+            values = CountedValues(values)
+        start = timer()
+        self.reducer(key, self.reducerInput(values))
+        self.counters.addTime("reduce", timer() - start)
+        if isinstance(values, list):
+            self.counters.addKey(key, len(values),
+                                 len(pickle.dumps((key, values),
+                                                  pickle.HIGHEST_PROTOCOL)))
+        else:
+            self.counters.addKey(key, values.count,
+                                 len(pickle.dumps(key, pickle.HIGHEST_PROTOCOL))
+                                 + values.bytes)
+
+    def reportProgress(self, splitsDone, numSplits):
+        if self.progress:
+            sys.stderr.write("map: %d/%d splits done\n" % (splitsDone, numSplits))
+
+    # fileNameList - Name of the input file, or list of the names of the
+    #                input files.
+    # reducer      - None for a map-only job: there is no shuffle and no
+    #                reduce phase, and the results the mapper emits with
+    #                mr.emit are written out in input order. The combiner,
+    #                memory budget and key sorting do not apply.
+    # fileFormat   - Name of a registered input reader, see readers.py. The
+    #                built-in formats are TEXT, JSON, CSV, CSV-SkipFirstLine,
+    #                SOXML and IMAGE.
+    # numWorkers   - Number of worker processes used for the map and the
+    #                reduce phases. With the default of 1 the job runs in this
+    #                process.
+    # memoryBudget - Megabytes of intermediate data held in memory. Once the
+    #                estimated size of self.intermediate goes over the budget,
+    #                it is written to disk as a sorted run and the reducers are
+    #                fed from a merge of the runs. This implies sortKeys. By
+    #                default all intermediate data is kept in memory.
+    # sortKeys     - Set to True to have the keys reach the reducers, and so
+    #                the output, in sorted order instead of the order the keys
+    #                were first emitted in. Keys must then be comparable.
+    # sortKey      - Optional function of a key that gives the value keys are
+    #                sorted by, as in sorted(keys, key=sortKey). Different keys
+    #                must give different values. Implies sortKeys.
+    # streamValues - Set to True to pass the values of a key to the reducer as
+    #                a ValueStream instead of a list. With a memory budget the
+    #                values are then read from the spilled runs while the
+    #                reducer iterates over them, so a key with a very large
+    #                number of values is never held in memory as a whole.
+    # combiner     - Optional function called as combiner(key, list_of_values)
+    #                on the map side. It must return a single value that stands
+    #                for all the values in the list, so the reducer gets a mix
+    #                of emitted and combined values. It runs after every chunk
+    #                of CHUNK_SIZE input records and before intermediate data
+    #                is spilled. For example, a word count combiner returns
+    #                sum(list_of_values) and its reducer sums the values
+    #                instead of counting them.
+    # splitSize    - Size in bytes of the splits of files in a splittable
+    #                format.
+    # progress     - Set to True to report on stderr every split mapped.
+    # outputPath   - File the results are written to. By default they are
+    #                printed on stdout. Either way every result is written as
+    #                soon as it is emitted (in parallel mode, once the reduce
+    #                workers are done) and no results are held in memory.
+    # outputFormat - "PLAIN" prints every result as print() would, "JSON"
+    #                writes one JSON document per line and "CSV" writes each
+    #                result, a list or tuple of fields, as a CSV row. The
+    #                default is "JSON" for JSON input and "PLAIN" otherwise.
+    # report       - Set to "stderr" to print a job report on stderr after
+    #                the run, or to a file name to write it there as JSON. The
+    #                report has the records and bytes read from every input
+    #                file, the number of pairs emitted by the mappers, of keys
+    #                and values reduced and of results written, the pickled
+    #                size of the reducer input (the data the shuffle moves),
+    #                the time spent in each phase, the application counters
+    #                (see increment) and the topKeys keys with the most values.
+    #                It is also left in self.counters. Nothing is measured
+    #                when report is None.
+    # encoding     - Encoding of TEXT, CSV and JSON input files, and of the
+    #                lines of readers built on decodeLines, such as "cp1252".
+    #                The default is utf-8. Lines are split on the newline
+    #                byte, so the encoding must be a superset of ASCII. Bytes
+    #                that are not valid in the encoding are read as U+FFFD.
+    # defaultKeys  - Keys that are reduced even when no value was emitted for
+    #                them, the reducer then getting no values, for example
+    #                the single key of an aggregate over all the input, which
+    #                has a result for an empty input too.
+    def execute(self, fileNameList, mapper, reducer,fileFormat, numWorkers=1,
+                memoryBudget=None, combiner=None, splitSize=SPLIT_SIZE,
+                progress=False, sortKeys=False, sortKey=None,
+                streamValues=False, outputPath=None, outputFormat=None,
+                report=None, topKeys=10, encoding=None, defaultKeys=()):
+        jobStart = timer()
+        # A MapReduce object can run several jobs one after the other, for
+        # example the stages of a pipeline, each starting with no pairs.
+        self.intermediate = {}
+        self.combinableKeys = []
+        self.pairCount = 0
+        self.flushedPairs = 0
+        self.nextMemoryCheck = None
+        if isinstance(fileNameList, str):
+            fileNameList = [fileNameList]
+        self.mapper = mapper
+        self.reducer = reducer
+        self.combiner = combiner
+        self.defaultKeys = defaultKeys
+        self.progress = progress
+        self.sortKey = sortKey
+        self.streamValues = streamValues
+        self.sortKeys = (sortKeys or sortKey is not None or
+                         memoryBudget is not None)
+        splits = self.getSplits(fileNameList, fileFormat, splitSize)
+        if numWorkers < 2 or not canFork():
+            numWorkers = 1
+        self.numPartitions = numWorkers
+        self.runs = [[] for p in range(numWorkers)]
+
+        if outputFormat is None:
+            if fileFormat == "JSON":
+                outputFormat = "JSON"
+            else:
+                outputFormat = "PLAIN"
+
+        self.counters = None
+        if report is not None:
+            self.counters = JobCounters(topKeys)
+
+        # An unknown encoding fails the job here, before anything is created.
+        previousEncoding = setInputEncoding(encoding)
+        # Spilled runs and the part files of parallel workers are written to
+        # the work directory of the job, which is removed when it ends, even
+        # when a worker fails.
+        self.workDir = None
+        self.spillDir = None
+        if numWorkers > 1 or memoryBudget is not None:
+            self.workDir = tempfile.mkdtemp(prefix='mapreduce-')
+        if memoryBudget is not None:
+            self.startSpilling(memoryBudget * 1024 * 1024 / numWorkers)
+        self.writer = OutputWriter(outputPath, outputFormat)
+        try:
+            if numWorkers > 1 and reducer is None:
+                self.executeMapOnly(splits, numWorkers, fileFormat)
+            elif numWorkers > 1:
+                self.executeParallel(splits, numWorkers, fileFormat)
+            else:
+                self.executeSerial(splits, fileFormat)
+        finally:
+            setInputEncoding(previousEncoding)
+            self.writer.close()
+            if self.workDir is not None:
+                shutil.rmtree(self.workDir, True)
+
+        if self.counters is not None:
+            self.counters.add("outputRecords", self.writer.count)
+            self.counters.addTime("total", timer() - jobStart)
+            self.counters.writeReport(report)
+        self.writer = None
+
+    def executeSerial(self, splits, fileFormat):
+        for splitIndex in range(len(splits)):
+            self.mapSplit(splits[splitIndex], fileFormat)
+            self.reportProgress(splitIndex + 1, len(splits))
+        if self.reducer is None:
+            return
+
+        reduceStart = timer()
+        self.addDefaultKeys()
+        if not self.sortKeys:
+            for key in self.intermediate:
+                self.reduceKey(key, self.intermediate[key])
+        else:
+            for key, values in self.sortedShuffle(0, self.intermediate):
+                self.reduceKey(key, values)
+        if self.counters is not None:
+            self.counters.addShuffleTime(timer() - reduceStart)
+
+    # Adds the default keys no value was emitted for to self.intermediate,
+    # with no values. Keys with values in spilled runs get them in the merge.
+    def addDefaultKeys(self):
+        for key in self.defaultKeys:
+            self.intermediate.setdefault(key, [])
+
+    # Returns the values of a key in the form the reducer expects them.
+    def reducerInput(self, values):
+        if self.streamValues:
+            return ValueStream(values)
+        if isinstance(values, list):
+            return values
+        return list(values)
+
+    # Generator of the (key, values) pairs of a partition in sorted key order.
+    # The pairs are merged from the runs spilled for the partition and the
+    # given keys of self.intermediate.
+    def sortedShuffle(self, partition, keys):
+        memoryPairs = sortedPairs(keys, self.intermediate, self.sortKey)
+        return mergeRuns(self.runs[partition], memoryPairs, self.spillDir,
+                         self.sortKey)
+
+    # Parallel mode:
+    #   Map   : Each split is read and mapped by a worker which sends back the
+    #           (key, values) pairs it collected in the order the keys were
+    #           first emitted.
+    #   Merge : The pairs of all splits are added to self.intermediate in
+    #           split order, so it ends up exactly as it would in a serial run.
+    #   Reduce: Keys are hash partitioned across numWorkers reduce workers.
+    #           Each worker writes the results of its keys to a part file.
+    #           The part files are then read back with the results of every
+    #           key in self.intermediate order, which makes the final result
+    #           identical to the serial one.
+    # With a memory budget the workers write every split to sorted runs, one
+    # per partition, instead of sending the pairs back. Each reduce worker
+    # merges the runs of its partition. When keys are sorted, the outputs of
+    # the partitions are merged by key, which again gives the same result as
+    # a serial run.
+    def executeParallel(self, splits, numWorkers, fileFormat):
+        global _activeJob
+        _activeJob = self
+        self.fileFormat = fileFormat
+
+        pool = newPool(numWorkers)
+        try:
+            splitsDone = 0
+            for splitOutput, splitCounters in pool.imap(mapTask, splits):
+                mergeStart = timer()
+                if self.spillDir is None:
+                    for key, values in splitOutput:
+                        self.intermediate.setdefault(key, [])
+                        self.intermediate[key].extend(values)
+                else:
+                    for partition in range(numWorkers):
+                        self.runs[partition].extend(splitOutput[partition])
+                if self.counters is not None:
+                    self.counters.merge(splitCounters)
+                    self.counters.addTime("shuffle", timer() - mergeStart)
+                splitsDone += 1
+                self.reportProgress(splitsDone, len(splits))
+        finally:
+            pool.close()
+            pool.join()
+
+        partitionStart = timer()
+        self.addDefaultKeys()
+        self.partitions = [[] for p in range(numWorkers)]
+        for key in self.intermediate:
+            self.partitions[partitionFor(key, numWorkers)].append(key)
+        if self.counters is not None:
+            self.counters.addTime("shuffle", timer() - partitionStart)
+
+        # The reduce workers are forked after the map phase so that they see
+        # the merged self.intermediate without it being sent to them.
+        partPaths = []
+        pool = newPool(numWorkers)
+        try:
+            for partPath, partCounters in pool.map(reducePartition,
+                                                   range(numWorkers),
+                                                   chunksize=1):
+                partPaths.append(partPath)
+                if self.counters is not None:
+                    self.counters.merge(partCounters)
+        finally:
+            pool.close()
+            pool.join()
+
+        outputStart = timer()
+        try:
+            if not self.sortKeys:
+                results = interleaveParts(self.intermediate, partPaths)
+            else:
+                taggedParts = [tagPairs(readRun(partPaths[partition]),
+                                        partition, self.sortKey)
+                               for partition in range(numWorkers)]
+                results = (tagged[4] for tagged in heapq.merge(*taggedParts))
+            for value in results:
+                self.writer.write(value)
+        finally:
+            for partPath in partPaths:
+                os.remove(partPath)
+        if self.counters is not None:
+            self.counters.addTime("output", timer() - outputStart)
+
+    # Parallel mode of a map-only job: each split is mapped by a worker that
+    # writes the results of the mapper to a part file. The part files are
+    # copied to the output in split order, as the results of a serial run
+    # would be written.
+    def executeMapOnly(self, splits, numWorkers, fileFormat):
+        global _activeJob
+        _activeJob = self
+        self.fileFormat = fileFormat
+
+        pool = newPool(numWorkers)
+        try:
+            splitsDone = 0
+            for partPath, splitCounters in pool.imap(mapOnlyTask, splits):
+                outputStart = timer()
+                try:
+                    for key, value in readRun(partPath):
+                        self.writer.write(value)
+                finally:
+                    os.remove(partPath)
+                if self.counters is not None:
+                    self.counters.merge(splitCounters)
+                    self.counters.addTime("output", timer() - outputStart)
+                splitsDone += 1
+                self.reportProgress(splitsDone, len(splits))
+        finally:
+            pool.close()
+            pool.join()
+
+    # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+    # Spilling intermediate data to disk.
+    #
+    # The size of self.intermediate is estimated from a sample of one pair in
+    # every SPILL_CHECK_INTERVAL. When the estimate goes over the budget the
+    # pairs are sorted by key and written to a run file per partition. Runs
+    # are kept in the order they were written, so merging them gives the
+    # values of a key in the order they were emitted.
+
+    def startSpilling(self, budgetBytes):
+        self.spillDir = self.workDir
+        self.budgetBytes = budgetBytes
+        self.pairCount = 0
+        self.flushedPairs = 0
+        self.sampledPairs = 0
+        self.sampledBytes = 0
+        self.nextMemoryCheck = SPILL_CHECK_INTERVAL
+
+    def checkMemory(self, key, value):
+        self.sampledPairs += 1
+        self.sampledBytes += objectSize(key) + objectSize(value)
+        if self.combiner is not None and self.overBudget():
+            self.combine()
+        if self.overBudget():
+            self.spill()
+        self.nextMemoryCheck = self.pairCount + SPILL_CHECK_INTERVAL
+
+    def overBudget(self):
+        bufferedPairs = self.pairCount - self.flushedPairs
+        return bufferedPairs * self.sampledBytes / self.sampledPairs > self.budgetBytes
+
+    def spill(self):
+        if self.combiner is not None:
+            self.combine()
+        keysOfPartition = [[] for p in range(self.numPartitions)]
+        for key in self.intermediate:
+            keysOfPartition[partitionFor(key, self.numPartitions)].append(key)
+        for partition in range(self.numPartitions):
+            if keysOfPartition[partition]:
+                pairs = sortedPairs(keysOfPartition[partition],
+                                    self.intermediate, self.sortKey)
+                runPath = writeRun(self.spillDir, pairs)
+                self.runs[partition].append(runPath)
+                if self.counters is not None:
+                    self.counters.add("spilledRuns", 1)
+                    self.counters.add("spilledBytes", os.path.getsize(runPath))
+        self.intermediate = {}
+        self.flushedPairs = self.pairCount
+
+    # Replaces the values of every key in self.intermediate by the single
+    # value the combiner makes of them. Only the keys that got more values
+    # since the last call have more than one, so the cost of a call does not
+    # grow with the number of keys buffered.
+    def combine(self):
+        for key in self.combinableKeys:
+            values = self.intermediate[key]
+            self.intermediate[key] = [self.combiner(key, values)]
+        self.combinableKeys = []
+        self.flushedPairs = self.pairCount - len(self.intermediate)
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# Helpers for the parallel mode. They are module level functions so that the
+# multiprocessing pool can hand them to the worker processes.
+
+# Parallel mode relies on fork() to share the application's globals with the
+# workers. Platforms without fork run the job serially.
+def canFork():
+    return not sys.platform.startswith('win')
+
+def newPool(numWorkers):
+    return multiprocessing.get_context('fork').Pool(numWorkers)
+
+def partitionFor(key, numPartitions):
+    return hash(key) % numPartitions
+
+# Runs in a map worker. The mapper emits into the application's mr, which is
+# _activeJob in this process. Returns the pairs of the split, in the order
+# their keys were first emitted, or, with a memory budget, the runs written
+# for each partition.
+def mapTask(split):
+    job = _activeJob
+    job.flushedPairs = job.pairCount
+    if job.counters is not None:
+        job.counters = JobCounters(job.counters.topN)
+    job.intermediate = {}
+    job.combinableKeys = []
+    if job.spillDir is None:
+        job.mapSplit(split, job.fileFormat)
+        return list(job.intermediate.items()), job.counters
+
+    job.runs = [[] for p in range(job.numPartitions)]
+    job.mapSplit(split, job.fileFormat)
+    job.spill()
+    return job.runs, job.counters
+
+# Runs in a map worker of a map-only job. Writes the results the mapper emits
+# for the split to a part file and returns its path along with the counters
+# of the worker.
+def mapOnlyTask(split):
+    job = _activeJob
+    if job.counters is not None:
+        job.counters = JobCounters(job.counters.topN)
+    job.writer = PartWriter(job.workDir)
+    try:
+        job.mapSplit(split, job.fileFormat)
+    finally:
+        job.writer.close()
+    return job.writer.partPath, job.counters
+
+# Runs in a reduce worker. Writes the results emitted for the keys of the
+# partition, in the order the keys are reduced, to a part file and returns its
+# path along with the counters of the worker.
+def reducePartition(partition):
+    job = _activeJob
+    if job.counters is not None:
+        job.counters = JobCounters(job.counters.topN)
+    job.writer = PartWriter(job.workDir)
+    reduceStart = timer()
+    try:
+        if not job.sortKeys:
+            for key in job.partitions[partition]:
+                job.writer.key = key
+                job.reduceKey(key, job.intermediate[key])
+        else:
+            for key, values in job.sortedShuffle(partition,
+                                                 job.partitions[partition]):
+                job.writer.key = key
+                job.reduceKey(key, values)
+    finally:
+        job.writer.close()
+    if job.counters is not None:
+        job.counters.addShuffleTime(timer() - reduceStart)
+    return job.writer.partPath, job.counters
+
+# Generator of the results in the part files of the reduce workers, in the
+# order of the keys. The keys of every partition were reduced in the order
+# they have in keys, so the results of a key are the next ones in the part
+# file of its partition.
+def interleaveParts(keys, partPaths):
+    parts = [readRun(partPath) for partPath in partPaths]
+    heads = [next(part, None) for part in parts]
+    for key in keys:
+        partition = partitionFor(key, len(parts))
+        while heads[partition] is not None and heads[partition][0] == key:
+            yield heads[partition][1]
+            heads[partition] = next(parts[partition], None)
@@ -0,0 +1,140 @@
+# Persistent cache of values computed from files, such as the fingerprints of
+# images.
+#
+# An entry holds the value computed from a file together with the size and
+# modification time the file had. It is used only while the file still has
+# them, so a file that was modified, or replaced by another one of the same
+# name, is computed again. For example
+#
+#     cache = mapreduce.FileCache("images.fingerprints", "differenceHash")
+#
+#     def mapper(record):
+#         value = cache.get(record[0])
+#         if value is None:
+#             value = computeValue(record)
+#             cache.put(record[0], value)
+#         ...
+#
+#     mr.execute(fileNameList, mapper, reducer, "IMAGE", numWorkers=4)
+#     cache.save(fileNameList)
+#
+# The cache file is a log of JSON lines. put appends the new entry to it with
+# a single write, so map workers of a parallel job can add entries to the
+# same cache while the job runs. save then rewrites the file with the latest
+# entry of each file, leaving out the entries of files that were removed or
+# changed since, and, when it is given the files of the run, those of the
+# files that were not part of it. The first line of the file holds the
+# version of the values, and a cache of another version is ignored, so
+# changing how the values are computed is enough to start from an empty
+# cache.
+import json
+import os
+
+class FileCache(object):
+    # cachePath - File the cache is kept in. A missing file, or one of
+    #             another version, is replaced by an empty cache.
+    # version   - JSON value identifying how the values are computed.
+    #
+    # The cache must be created before the job starts, in the process that
+    # calls execute, so that the map workers share its file.
+    def __init__(self, cachePath, version=None):
+        self.cachePath = cachePath
+        self.version = version
+        self.journal = None
+        # fileName -> (size, modification time in ns, value)
+        self.entries = self.load()
+        if self.entries is None:
+            self.entries = {}
+            self.writeEntries(self.entries)
+        # fileName -> (size, modification time) of the files get missed.
+        self.missed = {}
+
+    # Returns the entries of the cache file, or None if it does not exist or
+    # holds another version. Lines that cannot be parsed, such as a line cut
+    # short by a crash, are skipped.
+    def load(self):
+        entries = {}
+        try:
+            cacheFile = open(self.cachePath, encoding="utf-8")
+        except FileNotFoundError:
+            return None
+        with cacheFile:
+            header = cacheFile.readline()
+            try:
+                if json.loads(header) != {"version": self.version}:
+                    return None
+            except ValueError:
+                return None
+            for line in cacheFile:
+                try:
+                    fileName, size, mtime, value = json.loads(line)
+                except ValueError:
+                    continue
+                entries[fileName] = (size, mtime, value)
+        return entries
+
+    # Returns the value cached for the file, or None if there is none or the
+    # file changed since it was computed.
+    def get(self, fileName):
+        stat = os.stat(fileName)
+        size, mtime = stat.st_size, stat.st_mtime_ns
+        entry = self.entries.get(fileName)
+        if entry is not None and entry[0] == size and entry[1] == mtime:
+            return entry[2]
+        self.missed[fileName] = (size, mtime)
+        return None
+
+    # Caches the value computed from the file. The file is stamped with the
+    # size and modification time it had when get missed it, before the value
+    # was computed, so a change made meanwhile invalidates the entry.
+    def put(self, fileName, value):
+        size, mtime = self.missed.pop(fileName, None) or self.stamp(fileName)
+        self.entries[fileName] = (size, mtime, value)
+        # O_APPEND makes every line a single write at the end of the file,
+        # whichever process writes it.
+        if self.journal is None:
+            self.journal = os.open(self.cachePath, os.O_WRONLY | os.O_APPEND)
+        line = json.dumps([fileName, size, mtime, value]) + "\n"
+        os.write(self.journal, line.encode("utf-8"))
+
+    def stamp(self, fileName):
+        stat = os.stat(fileName)
+        return stat.st_size, stat.st_mtime_ns
+
+    # Compacts the cache file: it is rewritten with the latest entry of each
+    # file, including the entries put by map workers, and the entries of
+    # files that no longer exist or changed are evicted. fileNames, if given,
+    # are the files the run looked up, and the entries of all other files are
+    # evicted too. Otherwise the entries of files that still exist are kept
+    # whether they were looked up or not, so a cache that is used for
+    # different lists of files keeps growing. Returns the number of entries
+    # kept.
+    def save(self, fileNames=None):
+        if self.journal is not None:
+            os.close(self.journal)
+            self.journal = None
+        if fileNames is not None:
+            fileNames = set(fileNames)
+        entries = {}
+        for fileName, entry in (self.load() or {}).items():
+            if fileNames is not None and fileName not in fileNames:
+                continue
+            try:
+                if self.stamp(fileName) == (entry[0], entry[1]):
+                    entries[fileName] = entry
+            except OSError:
+                pass
+        self.writeEntries(entries)
+        self.entries = entries
+        return len(entries)
+
+    # Replaces the cache file, through a temporary file so that an
+    # interrupted save leaves the previous cache intact.
+    def writeEntries(self, entries):
+        tempPath = self.cachePath + ".tmp"
+        with open(tempPath, "w", encoding="utf-8") as cacheFile:
+            cacheFile.write(json.dumps({"version": self.version}) + "\n")
+            for fileName, (size, mtime, value) in entries.items():
+                cacheFile.write(json.dumps([fileName, size, mtime, value]))
+                cacheFile.write("\n")
+        os.replace(tempPath, self.cachePath)
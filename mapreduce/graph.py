@@ -0,0 +1,320 @@
+# Adjacency index of a graph of books, for recommendations that are looked
+# up again and again.
+#
+# build reads a CSV file of first level recommendations, such as the output
+# of datasets/library_sample/extractBookBuddiesToCSV.py, once and writes an
+# index of it to a single file:
+#
+#     mapreduce.graph.build("book_buddies.csv", "book_buddies.graph")
+#
+# Each line of the CSV file is an ISBN followed by the ISBNs recommended
+# with it, each optionally followed by :weight, the number of times both
+# books were borrowed (1 if it is not given). The ISBNs are interned: book
+# ids follow the sorted order of the ISBNs. The recommendations are stored
+# in compressed sparse row (CSR) form, the ids of the recommendations of the
+# book id being outBooks[outOffsets[id]:outOffsets[id + 1]] with their
+# weights at the same positions in outWeights, and so are the books
+# recommending each book, the transpose of the graph, in inOffsets, inBooks
+# and inWeights.
+#
+# A GraphIndex memory maps the file and computes the second level
+# recommendations of recommedBooks.py with NumPy instead of a job: the
+# score of C for A adds up weight(B,A) * weight(B,C) over the books B that
+# recommend both, leaving out A, the books it recommends and the books
+# recommending it. For example
+#
+#     index = mapreduce.graph.openGraphIndex("book_buddies.graph")
+#     index.recommend("0131103628", 10)
+#
+# returns the 10 best [(ISBN, score), ...], ties going to the smallest
+# ISBN, and index.recommendAll(10) yields them for every book, computed for
+# many books at a time. NumPy is imported the first time an index is built
+# or read.
+#
+# File layout: a data file (see mapreduce.datafile) starting with MAGIC. Its
+# header holds the number of books and of recommendations, the size and
+# modification time of the CSV file, and for every array its NumPy dtype and
+# its offset in the data. The ISBNs are stored as a JSON list of strings.
+import os
+import array
+import bisect
+
+from .readers import readRecords
+from .columnar import INT_DTYPES
+from . import datafile
+
+MAGIC = b"MAPREDUCE GRAPH 1\n"
+
+# Largest number of two-hop paths recommendAll works on at a time.
+BATCH_PATHS = 1 << 21
+
+# Returns the (ISBN, weight) of an entry of a line, ISBN or ISBN:weight.
+def parseRecommendation(entry):
+    isbn, separator, weight = entry.partition(":")
+    if separator:
+        return isbn, int(weight)
+    return isbn, 1
+
+# Returns the offsets, targets and weights of the CSR form of the edges
+# (sources[i], targets[i], weights[i]), whose sources are below bookCount.
+def compress(bookCount, sources, targets, weights):
+    import numpy
+    order = numpy.argsort(sources, kind="stable")
+    offsets = numpy.zeros(bookCount + 1, dtype="<i8")
+    numpy.cumsum(numpy.bincount(sources, minlength=bookCount),
+                 out=offsets[1:])
+    return offsets, targets[order], weights[order]
+
+# Builds the index of a CSV file of recommendations, by default the CSV
+# file name with the extension .graph. Returns the name of the index.
+def build(csvFileName, graphFileName=None):
+    import numpy
+    if graphFileName is None:
+        graphFileName = os.path.splitext(csvFileName)[0] + ".graph"
+    stamp = datafile.sourceStamp(csvFileName)
+
+    # Books get ids in the order they are met first, renumbered below in
+    # the order of their ISBNs.
+    ids = {}
+    sources = array.array("i")
+    targets = array.array("i")
+    weights = array.array("q")
+    for row in readRecords(csvFileName, "CSV"):
+        if not row or not row[0]:
+            continue
+        source = ids.setdefault(row[0], len(ids))
+        for entry in row[1:]:
+            if entry:
+                isbn, weight = parseRecommendation(entry)
+                sources.append(source)
+                targets.append(ids.setdefault(isbn, len(ids)))
+                weights.append(weight)
+
+    isbns = sorted(ids)
+    newIds = numpy.empty(len(isbns), dtype="<i4")
+    for newId, isbn in enumerate(isbns):
+        newIds[ids[isbn]] = newId
+    ids = None
+    sources = newIds[numpy.frombuffer(sources, dtype="<i4")]
+    targets = newIds[numpy.frombuffer(targets, dtype="<i4")]
+    weights = numpy.frombuffer(weights, dtype="<i8")
+    if len(weights):
+        low, high = int(weights.min()), int(weights.max())
+        for dtype in INT_DTYPES:
+            limits = numpy.iinfo(dtype)
+            if limits.min <= low and high <= limits.max:
+                weights = weights.astype(dtype)
+                break
+
+    # The arrays are laid out one after the other.
+    writer = datafile.DataFileWriter()
+    arrays = {}
+    def addArray(name, values):
+        arrays[name] = [values.dtype.str, writer.addPart(values.tobytes())]
+    for direction, edges in (("out", (sources, targets)),
+                             ("in", (targets, sources))):
+        offsets, neighbors, neighborWeights = compress(len(isbns),
+                                                       edges[0], edges[1],
+                                                       weights)
+        addArray(direction + "Offsets", offsets)
+        addArray(direction + "Books", neighbors)
+        addArray(direction + "Weights", neighborWeights)
+
+    writer.write(graphFileName, MAGIC,
+                 {"books": len(isbns), "edges": len(weights),
+                  "source": stamp, "arrays": arrays,
+                  "isbns": writer.addJsonPart(isbns)})
+    return graphFileName
+
+# Returns True if the index exists and was built from the CSV file as it is
+# now.
+def isUpToDate(graphFileName, csvFileName):
+    return datafile.isUpToDate(graphFileName, MAGIC, csvFileName)
+
+# Returns the positions of the entries of the rows of a CSR array, row after
+# row, and the number of entries of each row.
+def rowPositions(offsets, rows):
+    import numpy
+    starts = offsets[rows]
+    counts = offsets[rows + 1] - starts
+    ends = numpy.cumsum(counts)
+    positions = numpy.arange(ends[-1] if len(ends) else 0, dtype="<i8")
+    positions += numpy.repeat(starts - (ends - counts), counts)
+    return positions, counts
+
+# Returns the distinct keys, sorted, and the sums of the scores of each.
+def sumByKey(keys, scores):
+    import numpy
+    order = numpy.argsort(keys)
+    keys = keys[order]
+    scores = scores[order]
+    if not len(keys):
+        return keys, scores
+    starts = numpy.flatnonzero(numpy.concatenate(([True],
+                                                  keys[1:] != keys[:-1])))
+    return keys[starts], numpy.add.reduceat(scores, starts)
+
+# Returns the keys, sorted, and their scores without the keys in removed.
+def removeKeys(keys, scores, removed):
+    import numpy
+    positions = numpy.searchsorted(keys, removed)
+    found = positions < len(keys)
+    positions = positions[found]
+    positions = positions[keys[positions] == removed[found]]
+    keep = numpy.ones(len(keys), dtype=bool)
+    keep[positions] = False
+    return keys[keep], scores[keep]
+
+# The index of a graph of books, memory mapped.
+class GraphIndex(datafile.DataFile):
+    def __init__(self, fileName):
+        datafile.DataFile.__init__(self, fileName, MAGIC, "a graph index")
+        self.bookCount = self.header["books"]
+        self.edgeCount = self.header["edges"]
+        arrays = self.header["arrays"]
+        for direction in ("out", "in"):
+            for name, count in (("Offsets", self.bookCount + 1),
+                                ("Books", self.edgeCount),
+                                ("Weights", self.edgeCount)):
+                dtype, offset = arrays[direction + name]
+                setattr(self, direction + name,
+                        self.part(offset, dtype, count))
+        self.isbns = self.jsonPart(self.header["isbns"])
+
+    # Returns the id of an ISBN, None if it is not in the graph.
+    def bookId(self, isbn):
+        bookId = bisect.bisect_left(self.isbns, isbn)
+        if bookId < self.bookCount and self.isbns[bookId] == isbn:
+            return bookId
+        return None
+
+    # Returns the first level recommendations of an ISBN as a list of
+    # (ISBN, weight).
+    def neighbors(self, isbn):
+        bookId = self.bookId(isbn)
+        if bookId is None:
+            return []
+        start, end = self.outOffsets[bookId], self.outOffsets[bookId + 1]
+        return [(self.isbns[neighbor], weight) for neighbor, weight
+                in zip(self.outBooks[start:end].tolist(),
+                       self.outWeights[start:end].tolist())]
+
+    # Returns the k best second level recommendations of an ISBN as a list
+    # of (ISBN, score), best first.
+    def recommend(self, isbn, k):
+        import numpy
+        bookId = self.bookId(isbn)
+        if bookId is None:
+            return []
+        start, end = self.inOffsets[bookId], self.inOffsets[bookId + 1]
+        vias = self.inBooks[start:end]
+        viaWeights = self.inWeights[start:end].astype("<i8")
+        positions, counts = rowPositions(self.outOffsets, vias)
+        books, scores = sumByKey(self.outBooks[positions],
+                                 self.outWeights[positions] *
+                                 numpy.repeat(viaWeights, counts))
+
+        outStart, outEnd = self.outOffsets[bookId:bookId + 2]
+        connected = numpy.concatenate((self.outBooks[outStart:outEnd], vias,
+                                       [bookId]))
+        books, scores = removeKeys(books, scores, connected)
+        if len(scores) > k:
+            kthScore = numpy.partition(scores, len(scores) - k)[-k]
+            keep = scores >= kthScore
+            books, scores = books[keep], scores[keep]
+        order = numpy.lexsort((books, -scores))[:k]
+        return [(self.isbns[book], score) for book, score
+                in zip(books[order].tolist(), scores[order].tolist())]
+
+    # Yields (ISBN, [(ISBN, score), ...]) with the k best second level
+    # recommendations of every book that has one, in the order of the
+    # ISBNs, computing them for the books of up to batchPaths two-hop paths
+    # at a time.
+    def recommendAll(self, k, batchPaths=BATCH_PATHS):
+        import numpy
+        bookCount = self.bookCount
+        # pathEnds[id] is the number of paths of the books before id.
+        outDegrees = numpy.diff(self.outOffsets)
+        pathEnds = numpy.zeros(self.edgeCount + 1, dtype="<i8")
+        numpy.cumsum(outDegrees[self.inBooks], out=pathEnds[1:])
+        pathEnds = pathEnds[self.inOffsets]
+
+        first = 0
+        while first < bookCount:
+            last = int(numpy.searchsorted(pathEnds,
+                                          pathEnds[first] + batchPaths,
+                                          side="right")) - 1
+            last = min(max(last, first + 1), bookCount)
+            for result in self.recommendBatch(first, last, k):
+                yield result
+            first = last
+
+    # Yields the recommendations of the book ids from first to last
+    # (excluded). The pair of a book A and a book C is numbered
+    # A * bookCount + C, so pairs sort by A and then C.
+    def recommendBatch(self, first, last, k):
+        import numpy
+        bookCount = self.bookCount
+        books = numpy.arange(first, last, dtype="<i8")
+
+        start, end = self.inOffsets[first], self.inOffsets[last]
+        inDegrees = numpy.diff(self.inOffsets[first:last + 1])
+        vias = self.inBooks[start:end]
+        positions, counts = rowPositions(self.outOffsets, vias)
+        targets = numpy.repeat(numpy.repeat(books, inDegrees), counts)
+        pairs, scores = sumByKey(targets * bookCount +
+                                 self.outBooks[positions],
+                                 self.outWeights[positions] *
+                                 numpy.repeat(self.inWeights[start:end]
+                                              .astype("<i8"), counts))
+
+        outStart, outEnd = self.outOffsets[first], self.outOffsets[last]
+        outDegrees = numpy.diff(self.outOffsets[first:last + 1])
+        connected = numpy.concatenate((
+            numpy.repeat(books, outDegrees) * bookCount +
+            self.outBooks[outStart:outEnd],
+            numpy.repeat(books, inDegrees) * bookCount + vias,
+            books * bookCount + books))
+        pairs, scores = removeKeys(pairs, scores, connected)
+
+        # Rank the recommendations of each book and keep the first k. The
+        # pairs are sorted by book, so a stable sort of the books and their
+        # scores, as a single number when it fits in 63 bits, ranks ties in
+        # the order of the ids.
+        targets, recommended = numpy.divmod(pairs, bookCount)
+        groupStarts = numpy.searchsorted(targets, books)
+        span = int(scores.max()) + 1 if len(scores) else 1
+        if bookCount * span <= 2 ** 63:
+            order = numpy.argsort(targets * span + (span - 1 - scores),
+                                  kind="stable")
+        else:
+            order = numpy.lexsort((recommended, -scores, targets))
+        targets = targets[order]
+        ranks = numpy.arange(len(targets)) - groupStarts[targets - first]
+        keep = ranks < k
+        order = order[keep]
+        targets = targets[keep]
+        recommended = recommended[order].tolist()
+        scores = scores[order].tolist()
+
+        isbns = self.isbns
+        ends = numpy.searchsorted(targets, books, side="right").tolist()
+        start = 0
+        for book, end in zip(books.tolist(), ends):
+            if end > start:
+                yield (isbns[book],
+                       [(isbns[recommendedBook], score)
+                        for recommendedBook, score
+                        in zip(recommended[start:end], scores[start:end])])
+            start = end
+
+# fileName -> (size, modification time, GraphIndex).
+openIndexes = {}
+
+def openGraphIndex(fileName):
+    stat = os.stat(fileName)
+    entry = openIndexes.get(fileName)
+    if entry is None or entry[:2] != (stat.st_size, stat.st_mtime_ns):
+        entry = (stat.st_size, stat.st_mtime_ns, GraphIndex(fileName))
+        openIndexes[fileName] = entry
+    return entry[2]
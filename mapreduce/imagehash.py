@@ -0,0 +1,101 @@
+# Perceptual hashes of images.
+#
+# A perceptual hash is a 64 bit fingerprint of what an image looks like. It
+# is computed from a small grayscale thumbnail, so images that differ only by
+# their encoding, a slight change of brightness or a resize get the same or a
+# close hash. The number of differing bits (hammingDistance) measures how
+# different two images look.
+#
+# The functions take the pixels of an image as the IMAGE reader gives them,
+# with the size and mode of the image. The pixels may have been scaled down
+# (see ImageRecord.decode), which changes few if any bits of the hash. NumPy
+# is imported the first time a hash is computed.
+
+# Number of rows and columns of the thumbnail a hash is computed from. Hashes
+# have HASH_SIZE * HASH_SIZE bits.
+HASH_SIZE = 8
+
+# Weights of the red, green and blue bands in the gray level of a pixel, as in
+# PIL's convert("L").
+LUMA_WEIGHTS = (0.299, 0.587, 0.114)
+
+# Modes of single band images and of images whose first three bands are red,
+# green and blue.
+GRAY_MODES = ("1", "L", "LA", "I", "I;16", "F")
+COLOR_MODES = ("RGB", "RGBA", "RGBX", "RGBa")
+
+# Returns the gray levels of an image as a height x width NumPy array. pixels
+# is either the array of an ImageRecord, height x width pixels with an
+# optional third dimension for the bands, or a flat list of width * height
+# pixel values as given by PIL's getdata.
+def grayLevels(pixels, size, mode):
+    import numpy
+    width, height = size
+    pixels = numpy.asarray(pixels, dtype=numpy.float64)
+    if pixels.ndim == 1 or (pixels.ndim == 2 and pixels.shape[0] == width * height
+                            and pixels.shape[1] <= 4):
+        pixels = pixels.reshape((height, width) + pixels.shape[1:])
+    if pixels.ndim == 2:
+        return pixels
+    if mode in GRAY_MODES:
+        return pixels[:, :, 0]
+    if mode in COLOR_MODES:
+        return numpy.dot(pixels[:, :, :3], LUMA_WEIGHTS)
+    raise ValueError("Cannot compute the gray levels of an image in mode %r"
+                     % mode)
+
+# Shrinks a 2-D array to rows x cols by averaging the cells that fall into
+# each cell of the result. Arrays smaller than that are enlarged by repeating
+# their cells.
+def shrink(levels, rows, cols):
+    import numpy
+    for axis, length in ((0, rows), (1, cols)):
+        size = levels.shape[axis]
+        if size >= length:
+            edges = numpy.arange(length) * size // length
+            counts = numpy.diff(numpy.append(edges, size))
+            levels = numpy.add.reduceat(levels, edges, axis=axis)
+            if axis == 0:
+                levels = levels / counts[:, None]
+            else:
+                levels = levels / counts[None, :]
+        else:
+            levels = numpy.take(levels, numpy.arange(length) * size // length,
+                                axis=axis)
+    return levels
+
+# Packs an array of booleans into an int, first element in the highest bit.
+def toInt(bits):
+    import numpy
+    packed = numpy.packbits(bits.ravel()).tobytes()
+    return int.from_bytes(packed, "big") >> (8 * len(packed) - bits.size)
+
+# Average hash: bit set for every thumbnail pixel brighter than the mean.
+def averageHash(pixels, size, mode):
+    thumbnail = shrink(grayLevels(pixels, size, mode), HASH_SIZE, HASH_SIZE)
+    return toInt(thumbnail > thumbnail.mean())
+
+# Difference hash: bit set for every thumbnail pixel brighter than its left
+# neighbour. It follows gradients rather than absolute brightness and tells
+# similar images apart better than the average hash.
+def differenceHash(pixels, size, mode):
+    thumbnail = shrink(grayLevels(pixels, size, mode), HASH_SIZE, HASH_SIZE + 1)
+    return toInt(thumbnail[:, 1:] > thumbnail[:, :-1])
+
+def hammingDistance(hash1, hash2):
+    return bin(hash1 ^ hash2).count("1")
+
+# Splits a hash into numChunks chunks of consecutive bits, as (chunkIndex,
+# chunkValue) pairs. When two hashes are at most numChunks - 1 bits apart, at
+# least one of their chunks is equal, since every differing bit can only
+# change one chunk. This is the basis of multi-index hashing: hashes only need
+# to be compared with the hashes that share a chunk with them.
+def hashChunks(hashValue, numChunks, hashBits=HASH_SIZE * HASH_SIZE):
+    chunks = []
+    start = 0
+    for chunkIndex in range(numChunks):
+        end = hashBits * (chunkIndex + 1) // numChunks
+        mask = (1 << (end - start)) - 1
+        chunks.append((chunkIndex, (hashValue >> (hashBits - end)) & mask))
+        start = end
+    return chunks
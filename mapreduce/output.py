@@ -0,0 +1,57 @@
+# Writers for the results of a job.
+import os
+import sys
+import csv
+import json
+import pickle
+import tempfile
+
+# Size in bytes of the write buffer of an output file.
+OUTPUT_BUFFER_SIZE = 1024 * 1024
+
+# Buffered writer for the final results, see outputFormat in execute.
+class OutputWriter(object):
+    def __init__(self, outputPath, outputFormat):
+        if outputPath is None:
+            self.file = sys.stdout
+        else:
+            self.file = open(outputPath, 'w', OUTPUT_BUFFER_SIZE, newline='')
+        self.outputPath = outputPath
+        self.outputFormat = outputFormat
+        self.jenc = json.JSONEncoder()
+        self.csvWriter = csv.writer(self.file)
+        self.count = 0
+
+    def write(self, value):
+        self.count += 1
+        if self.outputFormat == "JSON":
+            self.file.write(self.jenc.encode(value) + "\n")
+        elif self.outputFormat == "CSV":
+            if isinstance(value, (list, tuple)):
+                self.csvWriter.writerow(value)
+            else:
+                self.csvWriter.writerow([value])
+        else:
+            self.file.write(str(value) + "\n")
+
+    def close(self):
+        if self.outputPath is None:
+            self.file.flush()
+        else:
+            self.file.close()
+
+# Writer used by a reduce worker, or a map worker of a map-only job, in
+# parallel mode. Every result is pickled together with the key it was emitted
+# for to a part file in workDir, the work directory of the job. The key is set
+# by reducePartition before calling the reducer and stays None in a map worker.
+class PartWriter(object):
+    def __init__(self, workDir):
+        fd, self.partPath = tempfile.mkstemp(dir=workDir, suffix='.part')
+        self.file = os.fdopen(fd, 'wb')
+        self.key = None
+
+    def write(self, value):
+        pickle.dump((self.key, value), self.file, pickle.HIGHEST_PROTOCOL)
+
+    def close(self):
+        self.file.close()
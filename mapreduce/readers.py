@@ -0,0 +1,257 @@
+# Input readers of the MapReduce engine.
+#
+# A reader is a generator function called as reader(fileName, start, end) that
+# yields the mapper input records of one input file. Readers of splittable
+# formats are given the byte range of a split and yield the records whose
+# line starts in it (see readLines). Other readers are always called with
+# start 0 and end None and read the whole file.
+#
+# New formats are added with registerReader. For example
+#
+#     def tsvReader(fileName, start, end):
+#         for line in decodeLines(readLines(fileName, start, end)):
+#             yield line.rstrip("\r\n").split("\t")
+#
+#     mapreduce.registerReader("TSV", tsvReader, splittable=True)
+#
+# Heavy dependencies such as PIL are imported by the reader that needs them,
+# the first time it is called, so jobs that never read images do not pay for
+# the import.
+import os
+import csv
+import json
+import codecs
+import xml.etree.ElementTree as ET
+
+# Encoding of TEXT, CSV and JSON files, unless the job gives another one
+# (encoding in execute). Bytes that are not valid in the encoding are
+# replaced by U+FFFD instead of failing the job.
+ENCODING = "utf-8"
+ENCODING_ERRORS = "replace"
+
+# Encoding of the input files of the job being executed. Map workers are
+# forked from the process that set it.
+inputEncoding = ENCODING
+
+# Smallest distance in bytes between two records sampled by sampleRecords.
+SAMPLE_STEP_MIN = 1024
+
+# fileFormat -> reader
+READERS = {}
+
+# Formats whose files hold one record per line and can therefore be split.
+SPLITTABLE_FORMATS = set()
+
+def registerReader(fileFormat, reader, splittable=False):
+    READERS[fileFormat] = reader
+    if splittable:
+        SPLITTABLE_FORMATS.add(fileFormat)
+    else:
+        SPLITTABLE_FORMATS.discard(fileFormat)
+
+def isSplittable(fileFormat):
+    return fileFormat in SPLITTABLE_FORMATS
+
+# Generator that yields the mapper input records of one input file, or of
+# the split of it that covers bytes start to end.
+def readRecords(fileName, fileFormat, start=0, end=None):
+    if fileFormat not in READERS:
+        raise ValueError("Unknown file format %r. Known formats are %s."
+                         % (fileFormat, ", ".join(sorted(READERS))))
+    return READERS[fileFormat](fileName, start, end)
+
+# Returns a sample of about numSamples records of a file in a splittable
+# format, the first record after each of numSamples evenly spaced offsets, so
+# the rest of the file is not read. Files of less than SAMPLE_STEP_MIN bytes
+# per sample are read whole instead. The sample is meant for planning a job,
+# for example finding the keys that are frequent enough to need special
+# handling.
+def sampleRecords(fileName, fileFormat, numSamples):
+    if not isSplittable(fileFormat):
+        raise ValueError("Cannot sample %r files, which are not splittable."
+                         % fileFormat)
+    fileSize = os.path.getsize(fileName)
+    step = fileSize // max(numSamples, 1)
+    if step < SAMPLE_STEP_MIN:
+        return list(readRecords(fileName, fileFormat))
+    samples = []
+    for start in range(0, fileSize, step):
+        records = readRecords(fileName, fileFormat, start, None)
+        record = next(iter(records), None)
+        if hasattr(records, "close"):
+            records.close()
+        if record is not None:
+            samples.append(record)
+    return samples
+
+# Generator that yields the lines of a file whose first byte lies between
+# start (included) and end (excluded), so consecutive splits of a file read
+# every line exactly once. A split that does not start at the beginning of the
+# file skips the line it starts in, which belongs to the previous split. With
+# end set to None the lines up to the end of the file are read. Records must
+# not contain line breaks, so quoted CSV fields cannot span lines.
+def readLines(fileName, start, end):
+    data = open(fileName, 'rb')
+    try:
+        position = 0
+        if start > 0:
+            data.seek(start - 1)
+            position = start - 1 + len(data.readline())
+        for line in data:
+            if end is not None and position >= end:
+                break
+            position += len(line)
+            yield line
+    finally:
+        data.close()
+
+# Sets the encoding decodeLines uses, ENCODING if encoding is None, and
+# returns the one it replaces. Raises LookupError for an unknown encoding.
+def setInputEncoding(encoding):
+    global inputEncoding
+    if encoding is None:
+        encoding = ENCODING
+    codecs.lookup(encoding)
+    previousEncoding = inputEncoding
+    inputEncoding = encoding
+    return previousEncoding
+
+def decodeLines(lines):
+    encoding = inputEncoding
+    for line in lines:
+        yield line.decode(encoding, ENCODING_ERRORS)
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# Built-in readers.
+
+def textReader(fileName, start, end):
+    return decodeLines(readLines(fileName, start, end))
+
+def jsonReader(fileName, start, end):
+    for line in textReader(fileName, start, end):
+        yield json.loads(line)
+
+def csvReader(fileName, start, end):
+    return csv.reader(textReader(fileName, start, end), delimiter=',')
+
+# Skips the header line. Only the first split of a file has it.
+def csvSkipFirstLineReader(fileName, start, end):
+    rows = csvReader(fileName, start, end)
+    if start == 0:
+        next(rows, None)
+    return rows
+
+# Yields a single ImageRecord for the image.
+def imageReader(fileName, start, end):
+    yield ImageRecord(fileName)
+
+# The record of an image, which behaves like the list
+# [fileName, pixels, size, mode]. size is the (width, height) of the image and
+# mode its PIL mode, such as "RGB". Palette images are given as "RGBA".
+#
+# pixels is a read-only NumPy array of height x width pixels, with a third
+# dimension for the bands of images with more than one band. It holds the raw
+# pixel bytes, with no Python object per pixel. Nothing is read when the
+# record is created: the header of the image is read the first time size or
+# mode is used, and the image is decoded the first time pixels is used, so a
+# mapper that needs only the name never opens the file. In parallel mode
+# every image is a split of its own and is decoded by the map worker that
+# maps it.
+class ImageRecord(object):
+    def __init__(self, fileName):
+        self.fileName = fileName
+        self.header = None
+        self.decodedPixels = None
+
+    @property
+    def size(self):
+        return self.readHeader()[0]
+
+    @property
+    def mode(self):
+        return self.readHeader()[1]
+
+    # Returns the (size, mode) of the image, reading its header once.
+    def readHeader(self):
+        if self.header is None:
+            from PIL import Image
+            with Image.open(self.fileName) as image:
+                mode = image.mode
+                if mode == "P":
+                    mode = "RGBA"
+                self.header = (image.size, mode)
+        return self.header
+
+    # Decodes the image and returns its pixels. With maxSize, a (width,
+    # height), the image is scaled down to fit in it, keeping its aspect ratio.
+    # JPEG images are then decoded at a reduced scale directly, which is much
+    # faster than decoding them in full. With mode, the image is converted to
+    # that PIL mode before it is scaled, for example to "L" for gray levels.
+    def decode(self, maxSize=None, mode=None):
+        from PIL import Image
+        import numpy
+        with Image.open(self.fileName) as image:
+            if maxSize is not None:
+                image.draft(mode, maxSize)
+            if mode is not None:
+                image = image.convert(mode)
+            elif image.mode == "P":
+                image = image.convert("RGBA")
+            if maxSize is not None:
+                image.thumbnail(maxSize)
+            return numpy.asarray(image)
+
+    @property
+    def pixels(self):
+        if self.decodedPixels is None:
+            self.decodedPixels = self.decode()
+        return self.decodedPixels
+
+    def __getitem__(self, index):
+        if index in (0, -4):
+            return self.fileName
+        if index in (1, -3):
+            return self.pixels
+        return (self.fileName, None, self.size, self.mode)[index]
+
+    def __len__(self):
+        return 4
+
+    def __iter__(self):
+        return iter((self.fileName, self.pixels, self.size, self.mode))
+
+# SOXML is used to identify XML file dumps of StackExchange datasets.
+# In all StackExchange XML files, the main data is stored as attributes
+# of the xml element 'row'. We extract the attributes of the element as
+# a dictionary and pass that to the mapper. The mapper is responsible for
+# extracting the correct attributes from the dictionary.
+def soxmlReader(fileName, start, end):
+    return iterRows(fileName)
+
+# Generator that yields the attributes of every 'row' element directly under
+# the root of a StackExchange XML dump. The file is parsed incrementally and
+# each row is dropped from the tree once it has been read, so only one row is
+# held in memory at a time.
+def iterRows(fileName):
+    depth = 0
+    treeRoot = None
+    for event, element in ET.iterparse(fileName, events=('start', 'end')):
+        if event == 'start':
+            if treeRoot is None:
+                treeRoot = element
+            depth += 1
+            continue
+        depth -= 1
+        if depth == 1:
+            if element.tag == "row":
+                yield element.attrib
+            # Clearing the root releases the rows read so far. The attribute
+            # dictionaries already handed out are left intact.
+            treeRoot.clear()
+
+registerReader("TEXT", textReader, splittable=True)
+registerReader("JSON", jsonReader, splittable=True)
+registerReader("CSV", csvReader, splittable=True)
+registerReader("CSV-SkipFirstLine", csvSkipFirstLineReader, splittable=True)
+registerReader("IMAGE", imageReader)
+registerReader("SOXML", soxmlReader)
@@ -0,0 +1,135 @@
+# Job report.
+import os
+import sys
+import json
+import heapq
+import time
+
+# Clock used for the phase timings of the job report.
+timer = time.perf_counter
+
+# Phases timed in the job report. read, map and reduce are the time spent in
+# the input readers, the mapper (including the combiner and spills) and the
+# reducer, summed over all workers. shuffle is the time spent merging,
+# partitioning and sorting intermediate data and output the time spent
+# writing the part files of the reduce workers to the output. total is the
+# wall clock time of the job.
+PHASES = ("read", "map", "shuffle", "reduce", "output", "total")
+
+# shuffleBytes is the pickled size of the keys and values handed to the
+# reducers, that is of the map output after the combiner.
+COUNTERS = ("mapOutputPairs", "spilledRuns", "spilledBytes",
+            "reduceInputKeys", "reduceInputValues", "shuffleBytes",
+            "outputRecords")
+
+# Application counters are named by the application, which adds to them with
+# MapReduce.increment, and are reported after the counters above.
+
+# Counters and timings of a job run with a report. Every worker collects its
+# own and the job merges them.
+class JobCounters(object):
+    def __init__(self, topN):
+        self.topN = topN
+        self.files = {}
+        self.times = dict.fromkeys(PHASES, 0.0)
+        self.counts = dict.fromkeys(COUNTERS, 0)
+        self.applicationCounts = {}
+        # Min-heap of (valueCount, sequence, key) holding the topN keys with
+        # the most values. The sequence number keeps keys from being compared.
+        self.heaviestKeys = []
+        self.keysSeen = 0
+
+    # Generator that passes records through while counting them and timing
+    # how long the input reader takes to produce them.
+    def countRecords(self, records, split):
+        fileName, start, end = split
+        if end is None:
+            end = os.path.getsize(fileName)
+        self.files.setdefault(fileName, {"records": 0, "bytes": 0})
+        self.files[fileName]["bytes"] += end - start
+
+        records = iter(records)
+        while True:
+            readStart = timer()
+            try:
+                record = next(records)
+            except StopIteration:
+                self.times["read"] += timer() - readStart
+                return
+            self.times["read"] += timer() - readStart
+            self.files[fileName]["records"] += 1
+            yield record
+
+    def add(self, counter, amount):
+        self.counts[counter] += amount
+
+    def increment(self, counter, amount):
+        self.applicationCounts[counter] = (self.applicationCounts.get(counter, 0)
+                                           + amount)
+
+    def addTime(self, phase, seconds):
+        self.times[phase] += seconds
+
+    # Adds the time spent in the reduce phase minus the time in the reducer.
+    def addShuffleTime(self, reducePhaseSeconds):
+        self.times["shuffle"] += reducePhaseSeconds - self.times["reduce"]
+
+    def addKey(self, key, valueCount, byteCount):
+        self.counts["reduceInputKeys"] += 1
+        self.counts["reduceInputValues"] += valueCount
+        self.counts["shuffleBytes"] += byteCount
+        self.addHeavyKey(key, valueCount)
+
+    def addHeavyKey(self, key, valueCount):
+        self.keysSeen += 1
+        entry = (valueCount, self.keysSeen, key)
+        if len(self.heaviestKeys) < self.topN:
+            heapq.heappush(self.heaviestKeys, entry)
+        elif valueCount > self.heaviestKeys[0][0]:
+            heapq.heapreplace(self.heaviestKeys, entry)
+
+    def merge(self, other):
+        for fileName in other.files:
+            self.files.setdefault(fileName, {"records": 0, "bytes": 0})
+            for counter in other.files[fileName]:
+                self.files[fileName][counter] += other.files[fileName][counter]
+        for phase in PHASES:
+            self.times[phase] += other.times[phase]
+        for counter in COUNTERS:
+            self.counts[counter] += other.counts[counter]
+        for counter in other.applicationCounts:
+            self.increment(counter, other.applicationCounts[counter])
+        for valueCount, sequence, key in other.heaviestKeys:
+            self.addHeavyKey(key, valueCount)
+
+    def toDict(self):
+        heaviestKeys = sorted(self.heaviestKeys, reverse=True)
+        return {"files": self.files,
+                "times": self.times,
+                "counters": self.counts,
+                "applicationCounters": self.applicationCounts,
+                "heaviestKeys": [[key, valueCount]
+                                 for valueCount, sequence, key in heaviestKeys]}
+
+    def writeReport(self, report):
+        if report != "stderr":
+            with open(report, 'w') as reportFile:
+                json.dump(self.toDict(), reportFile, indent=2, sort_keys=True,
+                          default=repr)
+            return
+
+        lines = ["Job report"]
+        lines.append("  time (s): " + ", ".join("%s %.3f" % (phase, self.times[phase])
+                                                for phase in PHASES))
+        for fileName in sorted(self.files):
+            lines.append("  input %s: %d records, %d bytes" %
+                         (fileName, self.files[fileName]["records"],
+                          self.files[fileName]["bytes"]))
+        for counter in COUNTERS:
+            lines.append("  %s: %d" % (counter, self.counts[counter]))
+        for counter in self.applicationCounts:
+            lines.append("  %s: %d" % (counter, self.applicationCounts[counter]))
+        lines.append("  heaviest keys:")
+        for valueCount, sequence, key in sorted(self.heaviestKeys, reverse=True):
+            lines.append("    %r: %d values" % (key, valueCount))
+        sys.stderr.write("\n".join(lines) + "\n")
@@ -0,0 +1,152 @@
+# Sorted runs written when spilling intermediate data, and the values of a
+# key as handed to a reducer.
+import os
+import sys
+import heapq
+import pickle
+import tempfile
+import itertools
+
+# Maximum number of values of a key stored together in a run. Merging runs
+# holds one such block per run in memory.
+RUN_BLOCK_SIZE = 1000
+
+# Maximum number of runs merged at once. Partitions with more runs are merged
+# in several passes.
+MERGE_FACTOR = 64
+
+# Rough size in bytes of a key or value held in memory.
+def objectSize(obj):
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (list, tuple)):
+        for item in obj:
+            size += sys.getsizeof(item)
+    elif isinstance(obj, dict):
+        for key in obj:
+            size += sys.getsizeof(key) + sys.getsizeof(obj[key])
+    return size
+
+def sortedPairs(keys, intermediate, sortKey):
+    return [(key, intermediate[key]) for key in sorted(keys, key=sortKey)]
+
+# Writes (key, values) pairs sorted by key to a new run file. The values of a
+# key are written in blocks of at most RUN_BLOCK_SIZE, each block pickled with
+# the key, so a run can be read back one block at a time.
+def writeRun(spillDir, pairs):
+    fd, runPath = tempfile.mkstemp(dir=spillDir, suffix='.run')
+    with os.fdopen(fd, 'wb') as runFile:
+        for key, values in pairs:
+            values = iter(values)
+            block = list(itertools.islice(values, RUN_BLOCK_SIZE))
+            while block:
+                pickle.dump((key, block), runFile, pickle.HIGHEST_PROTOCOL)
+                block = list(itertools.islice(values, RUN_BLOCK_SIZE))
+    return runPath
+
+def readRun(runPath):
+    with open(runPath, 'rb') as runFile:
+        while True:
+            try:
+                yield pickle.load(runFile)
+            except EOFError:
+                break
+
+# Generator that merges runs (and a list of sorted in-memory pairs, which is
+# treated as the last run) into one (key, values) pair per key. The values are
+# an iterator that reads the blocks of the key from one run after the other.
+# It must be used before moving on to the next key.
+def mergeRuns(runs, memoryPairs, spillDir, sortKey):
+    if not runs:
+        for pair in memoryPairs:
+            yield pair
+        return
+
+    while len(runs) > MERGE_FACTOR:
+        mergedRuns = []
+        for i in range(0, len(runs), MERGE_FACTOR):
+            group = runs[i:i + MERGE_FACTOR]
+            mergedRuns.append(writeRun(spillDir, mergeRuns(group, [], spillDir,
+                                                           sortKey)))
+            for runPath in group:
+                os.remove(runPath)
+        runs = mergedRuns
+
+    sources = [readRun(runPath) for runPath in runs]
+    sources.append(memoryPairs)
+    taggedSources = [tagPairs(sources[index], index, sortKey)
+                     for index in range(len(sources))]
+
+    merged = heapq.merge(*taggedSources)
+    for key, taggedPairs in itertools.groupby(merged, lambda tagged: tagged[3]):
+        yield key, itertools.chain.from_iterable(tagged[4]
+                                                 for tagged in taggedPairs)
+
+# Prefixes every (key, values) pair with the value it is sorted by, the index
+# of the sequence it comes from and its position in that sequence. The three
+# together are unique, so heapq.merge never compares two lists of values, and
+# pairs with equal keys come out in sequence order.
+def tagPairs(pairs, index, sortKey):
+    position = 0
+    for key, values in pairs:
+        if sortKey is None:
+            yield key, index, position, key, values
+        else:
+            yield sortKey(key), index, position, key, values
+        position += 1
+
+# Iterator over the values of a key that counts the values read through it
+# and their pickled size in bytes.
+class CountedValues(object):
+    def __init__(self, values):
+        self.values = values
+        self.count = 0
+        self.bytes = 0
+
+    def __iter__(self):
+        for value in self.values:
+            self.count += 1
+            self.bytes += len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+            yield value
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# The values of a key as passed to a reducer when streamValues is set.
+#
+# Iterating over a ValueStream reads the values as they come out of the
+# shuffle, which can be done only once. Reducers written for a list keep
+# working: len(), indexing and "in" first read all the remaining values into
+# a list, after which the stream behaves like that list and can be iterated
+# over any number of times. For example, a reducer that starts with
+# len(list_of_values) holds all the values in memory, while one that only
+# does sum(list_of_values) does not.
+class ValueStream(object):
+    def __init__(self, values):
+        self.source = iter(values)
+        self.values = None
+        self.streaming = False
+
+    def __iter__(self):
+        if self.values is not None:
+            return iter(self.values)
+        if self.streaming:
+            raise RuntimeError("The values of a key can be streamed only once. "
+                               "Call len() or list() on them first to keep "
+                               "them in memory.")
+        self.streaming = True
+        return self.source
+
+    def toList(self):
+        if self.values is None:
+            if self.streaming:
+                raise RuntimeError("The values of a key cannot be turned into "
+                                   "a list once they have been streamed.")
+            self.values = list(self.source)
+        return self.values
+
+    def __len__(self):
+        return len(self.toList())
+
+    def __getitem__(self, index):
+        return self.toList()[index]
+
+    def __contains__(self, value):
+        return value in self.toList()
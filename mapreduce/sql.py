@@ -0,0 +1,2007 @@
+# SQL queries over CSV, SOXML and JSON tables, compiled into MapReduce jobs.
+#
+#     query = mapreduce.sql.Query(
+#         "SELECT Title, Score FROM Posts WHERE AnswerCount = 0",
+#         {"Posts": "Posts_Sample.csv"})
+#     query.run()
+#
+# Supported: SELECT [DISTINCT] with expressions and aliases, FROM one table or
+# an inner equi-join of two (FROM a, b WHERE a.x = b.y or FROM a JOIN b ON
+# a.x = b.y), WHERE, GROUP BY (expressions, select aliases or positions,
+# ROLLUP, CUBE and GROUPING SETS, with GROUPING) and HAVING. Expressions
+# have the usual arithmetic, comparison and logical operators, || for
+# concatenation, IS [NOT] NULL, [NOT] BETWEEN, [NOT] IN, [NOT] LIKE, CASE,
+# the functions of FUNCTIONS and the aggregates COUNT, SUM, AVG, MIN and MAX,
+# with DISTINCT for COUNT. Names of tables and columns are case insensitive.
+# Names that are not plain identifiers are quoted as "a b", [a b] or `a b`.
+# ORDER BY, LIMIT and outer joins are not supported.
+#
+# Values are read as strings and an empty CSV field is NULL. A string is
+# converted to a number where it meets one, so AnswerCount = 0 compares
+# numbers, and two strings that are both numbers compare as numbers, so
+# Score > ViewCount and Score > '9' compare numbers too. Arithmetic and SUM
+# and AVG convert their operands to numbers, strings that are not numbers
+# giving NULL. The numeric columns of COLUMNAR tables (see
+# mapreduce.columnar) hold numbers, which are printed as the text they were
+# converted from.
+#
+# Planning:
+#   Predicate pushdown - The conditions of the WHERE clause that involve only
+#                        one table are checked by the mapper of that table,
+#                        before anything is emitted.
+#   Projection pushdown- Mappers emit only the columns used after them, and
+#                        expressions read only the fields they reference.
+#   Map-only jobs      - A query without aggregates or DISTINCT over one
+#                        table, or joined with a broadcast join, runs
+#                        without a shuffle.
+#   Combiners          - Aggregates are computed as partial aggregates that
+#                        the combiner merges on the map side, so a group
+#                        moves one value per split instead of one per row.
+#   Grouping sets      - ROLLUP, CUBE and GROUPING SETS are computed in a
+#                        single scan: the mapper emits the partial
+#                        aggregates of a row once per grouping set and the
+#                        combiner merges those of each group.
+#   Joins              - When the smaller table of a join is at most
+#                        BROADCAST_LIMIT bytes, it is loaded into a hash
+#                        table shared with the map workers and the join is
+#                        done while mapping the other table (broadcast join).
+#                        Otherwise both tables are shuffled on the join key
+#                        (reduce-side join). A reduce-side join followed by
+#                        a GROUP BY runs as two jobs.
+#   Columnar tables    - Tables converted by mapreduce.columnar are read a
+#                        block of rows at a time, and only the columns the
+#                        query uses are read. Comparisons of a column with
+#                        constants and IS NULL are evaluated on whole NumPy
+#                        columns, before any row is made.
+# Query.explain() describes the jobs a query runs as.
+import os
+import re
+import operator
+import tempfile
+import itertools
+
+from .engine import MapReduce
+from .readers import readRecords
+from .columnar import openColumnFile
+
+# Largest table, in bytes, that a join broadcasts to the mappers.
+BROADCAST_LIMIT = 64 * 1024 * 1024
+
+# Number of rows of an SOXML or JSON table read to find its columns.
+SCHEMA_SAMPLE_SIZE = 1000
+
+# Formats of the table files, by file name extension.
+FORMATS_OF_EXTENSIONS = {".csv": "CSV-SkipFirstLine", ".xml": "SOXML",
+                         ".json": "JSON", ".columns": "COLUMNAR"}
+
+class SQLError(ValueError):
+    pass
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# Tokenizer.
+
+TOKEN_PATTERN = re.compile(r"""
+    (?P<space>\s+|--[^\n]*)
+  | (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)
+  | (?P<string>'(?:[^']|'')*')
+  | (?P<quoted>"(?:[^"]|"")*"|\[[^\]]*\]|`[^`]*`)
+  | (?P<name>[A-Za-z_][A-Za-z_0-9]*)
+  | (?P<op><=|>=|<>|!=|\|\||[-+*/%=<>(),.;])
+""", re.VERBOSE)
+
+# Keywords that end an expression or a table reference and can therefore not
+# be used as aliases without AS.
+RESERVED = frozenset("""SELECT DISTINCT ALL FROM WHERE GROUP BY HAVING ORDER
+    LIMIT JOIN INNER LEFT RIGHT FULL OUTER CROSS ON AS AND OR NOT IS NULL IN
+    BETWEEN LIKE CASE WHEN THEN ELSE END UNION""".split())
+
+# Returns the tokens of a query as (kind, text) pairs, ending with ("end",
+# ""). Quoted names are unquoted and get the kind "quoted".
+def tokenize(text):
+    tokens = []
+    position = 0
+    while position < len(text):
+        match = TOKEN_PATTERN.match(text, position)
+        if match is None:
+            raise SQLError("Unexpected character %r at position %d"
+                           % (text[position], position))
+        kind = match.lastgroup
+        token = match.group(kind)
+        position = match.end()
+        if kind == "space":
+            continue
+        if kind == "quoted":
+            if token[0] == '"':
+                token = token[1:-1].replace('""', '"')
+            else:
+                token = token[1:-1]
+        tokens.append((kind, token))
+    tokens.append(("end", ""))
+    return tokens
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# Parser.
+#
+# Expressions are tuples whose first element is their kind:
+#   ("literal", value)
+#   ("column", table or None, name)
+#   ("star", table or None)                  * in SELECT and COUNT(*)
+#   ("unary", "-" or "NOT", operand)
+#   ("binary", operator, left, right)        arithmetic, comparison, AND, OR,
+#                                            || and LIKE
+#   ("isnull", operand, negated)
+#   ("between", operand, low, high, negated)
+#   ("in", operand, (item, ...), negated)
+#   ("case", operand or None, ((when, then), ...), else or None)
+#   ("call", NAME, (argument, ...), distinct)
+#   ("slot", index)                          field of a row built by a job
+#   ("grouping", index)                      GROUPING() of the index-th
+#                                            GROUP BY expression in such a
+#                                            row (see Query.planGroup)
+# Being tuples, equal expressions compare equal, which is how select items
+# are matched with the GROUP BY clause.
+
+COMPARISON_OPERATORS = ("=", "<>", "!=", "<", "<=", ">", ">=")
+
+class Parser(object):
+    def __init__(self, text):
+        self.tokens = tokenize(text)
+        self.position = 0
+
+    def peek(self, offset=0):
+        return self.tokens[min(self.position + offset, len(self.tokens) - 1)]
+
+    def next(self):
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def isKeyword(self, word, offset=0):
+        kind, text = self.peek(offset)
+        return kind == "name" and text.upper() == word
+
+    def acceptKeyword(self, word):
+        if self.isKeyword(word):
+            self.position += 1
+            return True
+        return False
+
+    def expectKeyword(self, word):
+        if not self.acceptKeyword(word):
+            self.fail("Expected %s" % word)
+
+    def acceptOp(self, op):
+        if self.peek() == ("op", op):
+            self.position += 1
+            return True
+        return False
+
+    def expectOp(self, op):
+        if not self.acceptOp(op):
+            self.fail("Expected %r" % op)
+
+    def fail(self, message):
+        kind, text = self.peek()
+        raise SQLError("%s, found %s" % (message, repr(text) if text
+                                         else "the end of the query"))
+
+    def name(self):
+        kind, text = self.next()
+        if kind == "quoted" or (kind == "name" and
+                                text.upper() not in RESERVED):
+            return text
+        self.position -= 1
+        self.fail("Expected a name")
+
+    # An optional alias, with or without AS.
+    def alias(self):
+        if self.acceptKeyword("AS"):
+            return self.name()
+        kind, text = self.peek()
+        if kind == "quoted" or (kind == "name" and
+                                text.upper() not in RESERVED):
+            self.position += 1
+            return text
+        return None
+
+    # Returns the query as a dictionary with the keys distinct, select (list
+    # of (expression, alias)), tables (list of (name, alias)), conditions
+    # (list of the ON and WHERE conditions), groupBy and having.
+    def parseQuery(self):
+        self.expectKeyword("SELECT")
+        distinct = self.acceptKeyword("DISTINCT")
+        if not distinct:
+            self.acceptKeyword("ALL")
+        select = [self.selectItem()]
+        while self.acceptOp(","):
+            select.append(self.selectItem())
+
+        self.expectKeyword("FROM")
+        tables = [self.tableReference()]
+        conditions = []
+        while True:
+            if self.acceptOp(","):
+                tables.append(self.tableReference())
+            elif self.isKeyword("JOIN") or self.isKeyword("INNER"):
+                self.acceptKeyword("INNER")
+                self.expectKeyword("JOIN")
+                tables.append(self.tableReference())
+                self.expectKeyword("ON")
+                conditions.append(self.expression())
+            elif (self.isKeyword("LEFT") or self.isKeyword("RIGHT") or
+                  self.isKeyword("FULL") or self.isKeyword("CROSS")):
+                raise SQLError("Only inner joins are supported")
+            else:
+                break
+        if self.acceptKeyword("WHERE"):
+            conditions.append(self.expression())
+
+        groupBy = []
+        if self.acceptKeyword("GROUP"):
+            self.expectKeyword("BY")
+            groupBy.append(self.groupItem())
+            while self.acceptOp(","):
+                groupBy.append(self.groupItem())
+        having = None
+        if self.acceptKeyword("HAVING"):
+            having = self.expression()
+        if self.isKeyword("ORDER") or self.isKeyword("LIMIT"):
+            raise SQLError("ORDER BY and LIMIT are not supported")
+        self.acceptOp(";")
+        if self.peek()[0] != "end":
+            self.fail("Expected the end of the query")
+        return {"distinct": distinct, "select": select, "tables": tables,
+                "conditions": conditions, "groupBy": groupBy,
+                "having": having}
+
+    def selectItem(self):
+        if self.acceptOp("*"):
+            return ("star", None), None
+        if self.peek(1) == ("op", ".") and self.peek(2) == ("op", "*"):
+            table = self.name()
+            self.position += 2
+            return ("star", table), None
+        expression = self.expression()
+        return expression, self.alias()
+
+    # An item of GROUP BY: an expression, ("rollup", (expression, ...)),
+    # ("cube", (expression, ...)) or ("groupingSets", ((expression, ...),
+    # ...)).
+    def groupItem(self):
+        for word, kind in (("ROLLUP", "rollup"), ("CUBE", "cube")):
+            if self.isKeyword(word) and self.peek(1) == ("op", "("):
+                self.position += 1
+                return kind, self.expressionList()
+        if self.isKeyword("GROUPING") and self.isKeyword("SETS", 1):
+            self.position += 2
+            self.expectOp("(")
+            sets = [self.groupingSet()]
+            while self.acceptOp(","):
+                sets.append(self.groupingSet())
+            self.expectOp(")")
+            return "groupingSets", tuple(sets)
+        return self.expression()
+
+    def groupingSet(self):
+        if self.peek() == ("op", "("):
+            if self.peek(1) == ("op", ")"):
+                self.position += 2
+                return ()
+            return self.expressionList()
+        return (self.expression(),)
+
+    # A list of expressions in parentheses.
+    def expressionList(self):
+        self.expectOp("(")
+        expressions = [self.expression()]
+        while self.acceptOp(","):
+            expressions.append(self.expression())
+        self.expectOp(")")
+        return tuple(expressions)
+
+    def tableReference(self):
+        name = self.name()
+        return name, self.alias() or name
+
+    def expression(self):
+        left = self.conjunction()
+        while self.acceptKeyword("OR"):
+            left = ("binary", "OR", left, self.conjunction())
+        return left
+
+    def conjunction(self):
+        left = self.negation()
+        while self.acceptKeyword("AND"):
+            left = ("binary", "AND", left, self.negation())
+        return left
+
+    def negation(self):
+        if self.acceptKeyword("NOT"):
+            return ("unary", "NOT", self.negation())
+        return self.predicate()
+
+    def predicate(self):
+        left = self.additive()
+        kind, text = self.peek()
+        if kind == "op" and text in COMPARISON_OPERATORS:
+            self.position += 1
+            if text == "!=":
+                text = "<>"
+            return ("binary", text, left, self.additive())
+        if self.acceptKeyword("IS"):
+            negated = self.acceptKeyword("NOT")
+            self.expectKeyword("NULL")
+            return ("isnull", left, negated)
+        negated = False
+        if self.isKeyword("NOT") and (self.isKeyword("BETWEEN", 1) or
+                                      self.isKeyword("IN", 1) or
+                                      self.isKeyword("LIKE", 1)):
+            self.position += 1
+            negated = True
+        if self.acceptKeyword("BETWEEN"):
+            low = self.additive()
+            self.expectKeyword("AND")
+            return ("between", left, low, self.additive(), negated)
+        if self.acceptKeyword("IN"):
+            self.expectOp("(")
+            items = [self.expression()]
+            while self.acceptOp(","):
+                items.append(self.expression())
+            self.expectOp(")")
+            return ("in", left, tuple(items), negated)
+        if self.acceptKeyword("LIKE"):
+            like = ("binary", "LIKE", left, self.additive())
+            if negated:
+                return ("unary", "NOT", like)
+            return like
+        return left
+
+    def additive(self):
+        left = self.multiplicative()
+        while True:
+            kind, text = self.peek()
+            if kind != "op" or text not in ("+", "-", "||"):
+                return left
+            self.position += 1
+            left = ("binary", text, left, self.multiplicative())
+
+    def multiplicative(self):
+        left = self.unary()
+        while True:
+            kind, text = self.peek()
+            if kind != "op" or text not in ("*", "/", "%"):
+                return left
+            self.position += 1
+            left = ("binary", text, left, self.unary())
+
+    def unary(self):
+        if self.acceptOp("-"):
+            operand = self.unary()
+            if operand[0] == "literal" and isinstance(operand[1], (int, float)):
+                return ("literal", -operand[1])
+            return ("unary", "-", operand)
+        if self.acceptOp("+"):
+            return self.unary()
+        return self.primary()
+
+    def primary(self):
+        kind, text = self.peek()
+        if kind == "number":
+            self.position += 1
+            if re.match(r"^\d+$", text):
+                return ("literal", int(text))
+            return ("literal", float(text))
+        if kind == "string":
+            self.position += 1
+            return ("literal", text[1:-1].replace("''", "'"))
+        if self.acceptOp("("):
+            expression = self.expression()
+            self.expectOp(")")
+            return expression
+        if self.acceptKeyword("NULL"):
+            return ("literal", None)
+        if self.acceptKeyword("TRUE"):
+            return ("literal", True)
+        if self.acceptKeyword("FALSE"):
+            return ("literal", False)
+        if self.acceptKeyword("CASE"):
+            return self.case()
+        if kind == "name" and self.peek(1) == ("op", "("):
+            return self.call()
+
+        name = self.name()
+        if self.acceptOp("."):
+            return ("column", name, self.name())
+        return ("column", None, name)
+
+    def case(self):
+        operand = None
+        if not self.isKeyword("WHEN"):
+            operand = self.expression()
+        whens = []
+        while self.acceptKeyword("WHEN"):
+            when = self.expression()
+            self.expectKeyword("THEN")
+            whens.append((when, self.expression()))
+        if not whens:
+            self.fail("Expected WHEN")
+        otherwise = None
+        if self.acceptKeyword("ELSE"):
+            otherwise = self.expression()
+        self.expectKeyword("END")
+        return ("case", operand, tuple(whens), otherwise)
+
+    def call(self):
+        name = self.next()[1].upper()
+        self.expectOp("(")
+        distinct = self.acceptKeyword("DISTINCT")
+        arguments = []
+        if self.acceptOp("*"):
+            arguments.append(("star", None))
+        elif self.peek() != ("op", ")"):
+            arguments.append(self.expression())
+            while self.acceptOp(","):
+                arguments.append(self.expression())
+        self.expectOp(")")
+        if (name not in FUNCTIONS and name not in AGGREGATES and
+                name != "GROUPING"):
+            raise SQLError("Unknown function %s" % name)
+        return ("call", name, tuple(arguments), distinct)
+
+def parse(text):
+    return Parser(text).parseQuery()
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# Expression trees.
+
+# Returns the expression with fn applied to each of its subexpressions.
+def mapChildren(expression, fn):
+    kind = expression[0]
+    if kind == "unary":
+        return (kind, expression[1], fn(expression[2]))
+    if kind == "binary":
+        return (kind, expression[1], fn(expression[2]), fn(expression[3]))
+    if kind == "isnull":
+        return (kind, fn(expression[1]), expression[2])
+    if kind == "between":
+        return (kind, fn(expression[1]), fn(expression[2]), fn(expression[3]),
+                expression[4])
+    if kind == "in":
+        return (kind, fn(expression[1]),
+                tuple(fn(item) for item in expression[2]), expression[3])
+    if kind == "case":
+        return (kind, None if expression[1] is None else fn(expression[1]),
+                tuple((fn(when), fn(then)) for when, then in expression[2]),
+                None if expression[3] is None else fn(expression[3]))
+    if kind == "call":
+        return (kind, expression[1], tuple(fn(argument)
+                                           for argument in expression[2]),
+                expression[3])
+    return expression
+
+def children(expression):
+    found = []
+    def collect(child):
+        found.append(child)
+        return child
+    mapChildren(expression, collect)
+    return found
+
+# Returns the ("column", table, name) expressions used by an expression.
+def columnsOf(expression):
+    if expression[0] == "column":
+        return [expression]
+    return [column for child in children(expression)
+            for column in columnsOf(child)]
+
+def isAggregate(expression):
+    return expression[0] == "call" and expression[1] in AGGREGATES
+
+def hasAggregate(expression):
+    return isAggregate(expression) or any(hasAggregate(child)
+                                          for child in children(expression))
+
+def hasGrouping(expression):
+    return ((expression[0] == "call" and expression[1] == "GROUPING") or
+            any(hasGrouping(child) for child in children(expression)))
+
+# Splits a condition into the conditions ANDed in it.
+def conjuncts(condition):
+    if condition[0] == "binary" and condition[1] == "AND":
+        return conjuncts(condition[2]) + conjuncts(condition[3])
+    return [condition]
+
+# Returns the SQL text of an expression.
+def formatExpression(expression):
+    kind = expression[0]
+    if kind == "literal":
+        value = expression[1]
+        if value is None:
+            return "NULL"
+        if isinstance(value, str):
+            return "'%s'" % value.replace("'", "''")
+        return str(value).upper() if isinstance(value, bool) else repr(value)
+    if kind == "column":
+        if expression[1] is None:
+            return expression[2]
+        return "%s.%s" % (expression[1], expression[2])
+    if kind == "star":
+        return "*" if expression[1] is None else expression[1] + ".*"
+    if kind == "slot":
+        return "$%d" % expression[1]
+    if kind == "grouping":
+        return "GROUPING($%d)" % expression[1]
+    if kind == "unary":
+        if expression[1] == "NOT":
+            return "NOT " + formatOperand(expression[2])
+        return "-" + formatOperand(expression[2])
+    if kind == "binary":
+        return "%s %s %s" % (formatOperand(expression[2]), expression[1],
+                             formatOperand(expression[3]))
+    if kind == "isnull":
+        return "%s IS %sNULL" % (formatOperand(expression[1]),
+                                 "NOT " if expression[2] else "")
+    if kind == "between":
+        return "%s %sBETWEEN %s AND %s" % (
+            formatOperand(expression[1]), "NOT " if expression[4] else "",
+            formatOperand(expression[2]), formatOperand(expression[3]))
+    if kind == "in":
+        return "%s %sIN (%s)" % (formatOperand(expression[1]),
+                                 "NOT " if expression[3] else "",
+                                 ", ".join(formatExpression(item)
+                                           for item in expression[2]))
+    if kind == "case":
+        text = "CASE"
+        if expression[1] is not None:
+            text += " " + formatExpression(expression[1])
+        for when, then in expression[2]:
+            text += " WHEN %s THEN %s" % (formatExpression(when),
+                                          formatExpression(then))
+        if expression[3] is not None:
+            text += " ELSE " + formatExpression(expression[3])
+        return text + " END"
+    if kind == "call":
+        return "%s(%s%s)" % (expression[1],
+                             "DISTINCT " if expression[3] else "",
+                             ", ".join(formatExpression(argument)
+                                       for argument in expression[2]))
+    raise SQLError("Unknown expression %r" % (expression,))
+
+def formatOperand(expression):
+    if expression[0] in ("binary", "isnull", "between", "in"):
+        return "(%s)" % formatExpression(expression)
+    return formatExpression(expression)
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# Evaluation.
+#
+# Expressions are compiled into Python source code, from which eval makes
+# the functions of a row the jobs run. A mapper then makes one Python call
+# per operator, or none, instead of walking the expression for every record,
+# which is several times faster. NULL is None, and comparisons and logical
+# operators follow the three-valued logic of SQL: a comparison with NULL is
+# NULL, which WHERE, HAVING and WHEN treat as false.
+
+# Returns the value as a number, or None if it is NULL or not a number.
+def toNumber(value):
+    if value is None or isinstance(value, (int, float)):
+        return value
+    try:
+        return int(value)
+    except ValueError:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+
+def isNumber(value):
+    return isinstance(value, (int, float))
+
+# Returns the comparison of two values. Two values that are numbers or
+# strings of numbers compare as numbers, so '9' < '10', and others as text.
+def makeComparison(compare):
+    def compareValues(a, b):
+        if a is None or b is None:
+            return None
+        if a.__class__ is str or b.__class__ is str:
+            numberA = toNumber(a)
+            numberB = None if numberA is None else toNumber(b)
+            if numberB is None:
+                return compare(str(a), str(b))
+            a, b = numberA, numberB
+        return compare(a, b)
+    return compareValues
+
+# Returns the comparison of a value with a string constant that is not a
+# number, which always compares as text.
+def makeTextComparison(compare):
+    def compareWithText(a, text):
+        if a is None:
+            return None
+        if a.__class__ is not str:
+            a = str(a)
+        return compare(a, text)
+    return compareWithText
+
+# Returns the comparison of a value with a number, the common case of a
+# column compared with a constant.
+def makeNumberComparison(compare):
+    def compareWithNumber(a, number):
+        if a is None:
+            return None
+        if a.__class__ is str:
+            try:
+                a = int(a)
+            except ValueError:
+                a = toNumber(a)
+                if a is None:
+                    return None
+        return compare(a, number)
+    return compareWithNumber
+
+def makeArithmetic(calculate):
+    def calculation(a, b):
+        a = toNumber(a)
+        b = toNumber(b)
+        if a is None or b is None:
+            return None
+        try:
+            return calculate(a, b)
+        except ZeroDivisionError:
+            return None
+    return calculation
+
+# Returns the function that applies a numeric function to values that are
+# not NULL, converted to numbers.
+def makeNumericFunction(function):
+    def call(*values):
+        values = [toNumber(value) for value in values]
+        for value in values:
+            if value is None:
+                return None
+        return function(*values)
+    return call
+
+def logicalNot(a):
+    return None if a is None else not a
+
+def logicalAnd(a, b):
+    if a is False or b is False:
+        return False
+    if a is None or b is None:
+        return None
+    return bool(a) and bool(b)
+
+def logicalOr(a, b):
+    if a or b:
+        return True
+    if a is None or b is None:
+        return None
+    return False
+
+def negate(a):
+    a = toNumber(a)
+    return None if a is None else -a
+
+def concat(a, b):
+    if a is None or b is None:
+        return None
+    return str(a) + str(b)
+
+def like(value, match):
+    if value is None:
+        return None
+    return match(str(value)) is not None
+
+def isIn(value, strings, numbers):
+    if value is None:
+        return None
+    if value.__class__ is not str:
+        return value in numbers or str(value) in strings
+    return value in strings or (bool(numbers) and toNumber(value) in numbers)
+
+# Numbers read from a COLUMNAR table are joined with the values of other
+# tables as the text they were read from.
+def keyString(value):
+    return None if value is None else str(value)
+
+def sqlLength(value):
+    if value.__class__ is str:
+        return len(value)
+    return None if value is None else len(str(value))
+
+def sqlLower(value):
+    return None if value is None else str(value).lower()
+
+def sqlUpper(value):
+    return None if value is None else str(value).upper()
+
+def sqlTrim(value):
+    return None if value is None else str(value).strip()
+
+def sqlRound(value, digits=0):
+    return round(value, int(digits))
+
+# Scalar functions: name -> (function, is numeric). They return NULL when an
+# argument is NULL. The arguments of numeric functions are converted to
+# numbers, which makeNumericFunction takes care of.
+FUNCTIONS = {"LENGTH": (sqlLength, False), "LOWER": (sqlLower, False),
+             "UPPER": (sqlUpper, False), "TRIM": (sqlTrim, False),
+             "ABS": (abs, True), "ROUND": (sqlRound, True)}
+
+# Names of the comparison and arithmetic operators in generated code.
+COMPARISONS = {"=": ("equal", operator.eq), "<>": ("notEqual", operator.ne),
+               "<": ("less", operator.lt), "<=": ("lessOrEqual", operator.le),
+               ">": ("greater", operator.gt),
+               ">=": ("greaterOrEqual", operator.ge)}
+ARITHMETIC = {"+": ("add", operator.add),
+              "-": ("subtract", operator.sub),
+              "*": ("multiply", operator.mul),
+              "/": ("divide", operator.truediv),
+              "%": ("modulo", operator.mod)}
+# The comparison that gives the same result with its operands swapped.
+SWAPPED_COMPARISONS = {"=": "=", "<>": "<>", "<": ">", "<=": ">=", ">": "<",
+                       ">=": "<="}
+
+def between(value, low, high):
+    return logicalAnd(greaterOrEqual(value, low), lessOrEqual(value, high))
+
+def betweenNumbers(value, low, high):
+    if value is None:
+        return None
+    if value.__class__ is str:
+        value = toNumber(value)
+        if value is None:
+            return None
+    return low <= value <= high
+
+# Names generated code can use.
+HELPERS = {"toNumber": toNumber, "logicalNot": logicalNot,
+           "logicalAnd": logicalAnd, "logicalOr": logicalOr, "negate": negate,
+           "concat": concat, "like": like, "isIn": isIn, "between": between,
+           "betweenNumbers": betweenNumbers, "keyString": keyString}
+for name, compare in COMPARISONS.values():
+    HELPERS[name] = makeComparison(compare)
+    HELPERS[name + "Number"] = makeNumberComparison(compare)
+    HELPERS[name + "Text"] = makeTextComparison(compare)
+for name, calculate in ARITHMETIC.values():
+    HELPERS[name] = makeArithmetic(calculate)
+for name, (function, numeric) in FUNCTIONS.items():
+    if numeric:
+        function = makeNumericFunction(function)
+    HELPERS["function" + name] = function
+greaterOrEqual = HELPERS["greaterOrEqual"]
+lessOrEqual = HELPERS["lessOrEqual"]
+
+# Returns True if an expression can only be a number or NULL.
+def isNumeric(expression):
+    kind = expression[0]
+    if kind == "literal":
+        return isNumber(expression[1])
+    if kind == "unary":
+        return expression[1] == "-"
+    if kind == "binary":
+        return expression[1] in ARITHMETIC
+    if kind == "call":
+        return expression[1] in ("LENGTH", "ABS", "ROUND")
+    return False
+
+# Returns True if an expression is a string constant that is not a number,
+# which anything compares with as text.
+def isText(expression):
+    return (expression[0] == "literal" and
+            expression[1].__class__ is str and toNumber(expression[1]) is None)
+
+class Compiler(object):
+    # columnSource - Function of a ("column", table, name) expression that
+    #                returns the Python source reading the column from the
+    #                row, which generated code names row. Without it, only
+    #                slots can be read.
+    def __init__(self, columnSource=None):
+        self.columnSource = columnSource
+        self.namespace = dict(HELPERS)
+        # expression -> name of the local variable holding its value
+        self.locals = {}
+
+    # Returns the name generated code can use for a value.
+    def constant(self, value):
+        name = "constant%d" % len(self.namespace)
+        self.namespace[name] = value
+        return name
+
+    # Returns the function of a row that evaluates an expression. A
+    # condition only needs to be true or not, which takes less code than
+    # telling false from NULL.
+    def function(self, expression, condition=False):
+        return self.compile("lambda row: " + self.source(expression, condition))
+
+    # Returns the function of a row that gives the tuple of the values of
+    # expressions.
+    def tupleFunction(self, expressions):
+        return self.compile("lambda row: (%s)" % "".join(
+            self.source(expression) + ", " for expression in expressions))
+
+    def compile(self, source):
+        return eval(source, self.namespace)
+
+    # Defines a function from its source and returns it. names are added to
+    # the names the function can use.
+    def define(self, name, source, **names):
+        self.namespace.update(names)
+        exec(source, self.namespace)
+        return self.namespace[name]
+
+    # Returns the statements of a function of a row that compute once the
+    # subexpressions that occur more than once in expressions, which source
+    # then reads from local variables. An expression such as LENGTH(Title)
+    # in every WHEN of a CASE is then computed once per row.
+    def hoist(self, expressions):
+        counts = {}
+        order = []
+        def count(expression):
+            if (expression[0] in ("literal", "column", "slot", "star") or
+                    expression in self.locals or isAggregate(expression)):
+                return
+            counts[expression] = counts.get(expression, 0) + 1
+            if counts[expression] == 1:
+                for child in children(expression):
+                    count(child)
+                order.append(expression)
+        for expression in expressions:
+            count(expression)
+
+        statements = []
+        for expression in order:
+            if counts[expression] > 1:
+                source = self.source(expression)
+                self.locals[expression] = "value%d" % len(self.locals)
+                statements.append("%s = %s" % (self.locals[expression], source))
+        return statements
+
+    def source(self, expression, condition=False):
+        if expression in self.locals:
+            return self.locals[expression]
+        kind = expression[0]
+        if kind == "literal":
+            return repr(expression[1])
+        if kind == "column":
+            if self.columnSource is None:
+                raise SQLError("Column %s cannot be used here"
+                               % formatExpression(expression))
+            return self.columnSource(expression)
+        if kind == "slot":
+            return "row[%d]" % expression[1]
+        if kind == "grouping":
+            return "(row[-1] >> %d & 1)" % expression[1]
+        if kind == "star":
+            raise SQLError("* can only be used in SELECT and COUNT(*)")
+
+        if kind == "unary":
+            if expression[1] == "NOT":
+                return "logicalNot(%s)" % self.source(expression[2])
+            return "negate(%s)" % self.source(expression[2])
+        if kind == "binary":
+            return self.binarySource(expression, condition)
+        if kind == "isnull":
+            return "(%s is %sNone)" % (self.source(expression[1]),
+                                       "not " if expression[2] else "")
+        if kind == "between":
+            inline = self.inlineComparison(expression[1], condition,
+                                           [(">=", expression[2]),
+                                            ("<=", expression[3])])
+            if inline is not None and not expression[4]:
+                return inline
+            helper = "between"
+            if all(bound[0] == "literal" and isNumber(bound[1])
+                   for bound in expression[2:4]):
+                helper = "betweenNumbers"
+            source = "%s(%s, %s, %s)" % ((helper,) + tuple(
+                self.source(operand) for operand in expression[1:4]))
+            if expression[4]:
+                return "logicalNot(%s)" % source
+            return source
+        if kind == "in":
+            return self.inSource(expression, condition)
+        if kind == "case":
+            operand, whens, otherwise = expression[1:]
+            if operand is not None:
+                whens = tuple((("binary", "=", operand, when), then)
+                              for when, then in whens)
+            source = self.source(otherwise or ("literal", None))
+            for when, then in reversed(whens):
+                source = "(%s if %s else %s)" % (
+                    self.source(then), self.source(when, True), source)
+            return source
+        if kind == "call":
+            if expression[1] in AGGREGATES:
+                raise SQLError("Aggregate %s cannot be used here"
+                               % formatExpression(expression))
+            if expression[1] == "GROUPING":
+                raise SQLError("GROUPING can only be used in the SELECT and "
+                               "HAVING clauses of a GROUP BY query")
+            return "function%s(%s)" % (expression[1], ", ".join(
+                self.source(argument) for argument in expression[2]))
+        raise SQLError("Unknown expression %r" % (expression,))
+
+    def binarySource(self, expression, condition):
+        op, left, right = expression[1:]
+        if op in ("AND", "OR"):
+            if condition:
+                return "(%s %s %s)" % (self.source(left, True), op.lower(),
+                                       self.source(right, True))
+            return "logical%s(%s, %s)" % (op.capitalize(), self.source(left),
+                                          self.source(right))
+        if op == "||":
+            return "concat(%s, %s)" % (self.source(left), self.source(right))
+        if op == "LIKE":
+            if right[0] != "literal" or not isinstance(right[1], str):
+                raise SQLError("The pattern of LIKE must be a string")
+            pattern = "".join(".*" if char == "%" else "." if char == "_"
+                              else re.escape(char) for char in right[1])
+            match = re.compile(pattern, re.DOTALL).fullmatch
+            return "like(%s, %s)" % (self.source(left), self.constant(match))
+        if op in ARITHMETIC:
+            return "%s(%s, %s)" % (ARITHMETIC[op][0], self.source(left),
+                                   self.source(right))
+
+        if left[0] == "literal" and (isNumber(left[1]) or isText(left)):
+            op, left, right = SWAPPED_COMPARISONS[op], right, left
+        inline = self.inlineComparison(left, condition, [(op, right)])
+        if inline is not None:
+            return inline
+        if right[0] == "literal" and isNumber(right[1]):
+            return "%sNumber(%s, %r)" % (COMPARISONS[op][0], self.source(left),
+                                         right[1])
+        if isText(right):
+            return "%sText(%s, %r)" % (COMPARISONS[op][0], self.source(left),
+                                       right[1])
+        return "%s(%s, %s)" % (COMPARISONS[op][0], self.source(left),
+                               self.source(right))
+
+    # Returns Python comparisons of an expression with numbers, as a
+    # condition, when the expression is a number or NULL held in a local
+    # variable (see hoist), for example the LENGTH of a column used in the
+    # WHEN of a CASE. Returns None otherwise.
+    def inlineComparison(self, expression, condition, comparisons):
+        if (not condition or expression not in self.locals or
+                not isNumeric(expression) or
+                not all(bound[0] == "literal" and isNumber(bound[1])
+                        for op, bound in comparisons)):
+            return None
+        name = self.locals[expression]
+        pythonOperators = {"=": "==", "<>": "!="}
+        return "(%s is not None and %s)" % (name, " and ".join(
+            "%s %s %r" % (name, pythonOperators.get(op, op), bound[1])
+            for op, bound in comparisons))
+
+    def inSource(self, expression, condition):
+        operand, items, negated = expression[1:]
+        if not all(item[0] == "literal" and item[1] is not None
+                   for item in items):
+            test = ("binary", "=", operand, items[0])
+            for item in items[1:]:
+                test = ("binary", "OR", test, ("binary", "=", operand, item))
+            if negated:
+                test = ("unary", "NOT", test)
+            return self.source(test, condition)
+        # Strings of numbers are also looked up as numbers, as = compares
+        # them.
+        values = [item[1] for item in items]
+        source = "isIn(%s, %s, %s)" % (
+            self.source(operand),
+            self.constant(frozenset(value for value in values
+                                    if not isNumber(value))),
+            self.constant(frozenset(toNumber(value) for value in values
+                                    if toNumber(value) is not None)))
+        if negated:
+            return "logicalNot(%s)" % source
+        return source
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# Aggregates.
+#
+# An aggregate is computed from partial aggregates: partialSource gives the
+# code of the one of a single row, mergeSource the code combining two of
+# them and result turns the merged partial aggregate of a group into the
+# value of the aggregate. Since merging is associative, the combiner can
+# merge the partial aggregates of a split and the reducer those of the
+# splits.
+
+AGGREGATES = frozenset(["COUNT", "SUM", "AVG", "MIN", "MAX"])
+
+def distinctPartial(value):
+    return frozenset() if value is None else frozenset([value])
+
+def averagePartial(value):
+    value = toNumber(value)
+    return (0, 0) if value is None else (value, 1)
+
+# MIN and MAX compare numbers as numbers and other values as strings, which
+# come after all numbers. Their partial aggregate is the pair (is a string,
+# value), or None for NULL, so that partials of a column with both kinds of
+# values can be compared.
+def extremePartial(value):
+    if value is None:
+        return None
+    number = toNumber(value)
+    return (True, value) if number is None else (False, number)
+
+HELPERS.update(distinctPartial=distinctPartial, averagePartial=averagePartial,
+               extremePartial=extremePartial)
+
+class Aggregate(object):
+    def __init__(self, expression):
+        self.name = expression[1]
+        self.distinct = expression[3]
+        arguments = expression[2]
+        if len(arguments) != 1:
+            raise SQLError("%s takes one argument" % self.name)
+        self.argument = arguments[0]
+        if self.argument[0] == "star":
+            if self.name != "COUNT":
+                raise SQLError("Only COUNT can be applied to *")
+            self.argument = None
+        elif hasAggregate(self.argument):
+            raise SQLError("Aggregates cannot be nested")
+        if self.distinct and self.name != "COUNT":
+            raise SQLError("DISTINCT is only supported in COUNT")
+
+    def partialSource(self, compiler):
+        if self.argument is None:
+            return "1"
+        value = compiler.source(self.argument)
+        if self.distinct:
+            return "distinctPartial(%s)" % value
+        if self.name == "COUNT":
+            return "(0 if %s is None else 1)" % value
+        if self.name == "SUM":
+            return "toNumber(%s)" % value
+        if self.name == "AVG":
+            return "averagePartial(%s)" % value
+        return "extremePartial(%s)" % value
+
+    # Returns the source of the merge of the partial aggregates in the
+    # variables a and b. NULL partial aggregates are those of groups with
+    # only NULL values.
+    def mergeSource(self, a, b):
+        if self.distinct:
+            return "%s | %s" % (a, b)
+        if self.name == "COUNT":
+            return "%s + %s" % (a, b)
+        if self.name == "AVG":
+            return "(%s[0] + %s[0], %s[1] + %s[1])" % (a, b, a, b)
+        if self.name == "SUM":
+            return "%s if %s is None else %s if %s is None else %s + %s" % (
+                b, a, a, b, a, b)
+        return "%s if %s is None or (%s is not None and %s %s %s) else %s" % (
+            b, a, b, b, "<" if self.name == "MIN" else ">", a, a)
+
+    # Returns the partial aggregate of a group with no rows.
+    def emptyPartial(self):
+        if self.distinct:
+            return frozenset()
+        if self.name == "COUNT":
+            return 0
+        if self.name == "AVG":
+            return (0, 0)
+        return None
+
+    def result(self, partial):
+        if self.distinct:
+            return len(partial)
+        if self.name == "AVG":
+            return None if partial[1] == 0 else partial[0] / partial[1]
+        if self.name in ("MIN", "MAX"):
+            return None if partial is None else partial[1]
+        return partial
+
+# Returns the function that merges lists of partial aggregates, one for
+# each of the aggregates.
+def makeMerge(aggregates):
+    if len(aggregates) == 1 and aggregates[0].mergeSource("a", "b") == "a + b":
+        return sum
+    indexes = range(len(aggregates))
+    names = packSource(["a%d" % index for index in indexes], "[]")
+    others = packSource(["b%d" % index for index in indexes], "[]")
+    lines = ["def merge(partials):",
+             "    partials = iter(partials)",
+             "    %s = next(partials)" % names,
+             "    for %s in partials:" % others]
+    lines += ["        a%d = %s" % (index, aggregate.mergeSource("a%d" % index,
+                                                                 "b%d" % index))
+              for index, aggregate in enumerate(aggregates)]
+    lines += ["        pass", "    return %s" % names]
+    namespace = {}
+    exec("\n".join(lines) + "\n", namespace)
+    return namespace["merge"]
+
+# Returns the source of a single value as is, and that of several values, or
+# none, packed in brackets, "()" or "[]".
+def packSource(sources, brackets):
+    if len(sources) == 1:
+        return sources[0]
+    return (brackets[0] + "".join(source + ", " for source in sources) +
+            brackets[1])
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# Tables.
+
+class Table(object):
+    # name       - Name of the table in queries.
+    # fileName   - File holding the rows of the table.
+    # fileFormat - Reader of the file. By default it follows from the
+    #              extension of the file, see FORMATS_OF_EXTENSIONS. CSV
+    #              files must start with a line of column names.
+    def __init__(self, name, fileName, fileFormat=None):
+        if fileFormat is None:
+            extension = os.path.splitext(fileName)[1].lower()
+            if extension not in FORMATS_OF_EXTENSIONS:
+                raise SQLError("Cannot tell the format of %s from its name"
+                               % fileName)
+            fileFormat = FORMATS_OF_EXTENSIONS[extension]
+        self.name = name
+        self.fileName = fileName
+        self.fileFormat = fileFormat
+        # The rows of the CSV files of the labs start with the name of their
+        # table, in a column named TableName, which is kept in tag.
+        self.tag = None
+        # column -> "int", "float" or "string" for COLUMNAR tables, whose
+        # records are blocks of rows (see Query.scanner), None for others.
+        self.columnTypes = None
+        if fileFormat == "COLUMNAR":
+            columnFile = openColumnFile(fileName)
+            self.columns = list(columnFile.columnNames)
+            self.columnTypes = dict((column, columnFile.columnType(column))
+                                    for column in self.columns)
+            self.rowsAreLists = False
+        elif fileFormat.startswith("CSV"):
+            rows = readRecords(fileName, "CSV")
+            self.columns = next(rows, [])
+            firstRow = next(rows, None)
+            if self.columns[:1] == ["TableName"] and firstRow:
+                self.tag = firstRow[0]
+            self.rowsAreLists = True
+        else:
+            self.columns = []
+            for rowCount, row in enumerate(readRecords(fileName, fileFormat)):
+                if rowCount == SCHEMA_SAMPLE_SIZE:
+                    break
+                for column in row:
+                    if column not in self.columns:
+                        self.columns.append(column)
+            self.rowsAreLists = False
+        self.columnNames = dict((column.lower(), column)
+                                for column in self.columns)
+
+    # Returns the name of the column as given in the file, or None.
+    def findColumn(self, name):
+        return self.columnNames.get(name.lower())
+
+    # Returns the Python source reading a column from a row of the file,
+    # named row. Empty CSV fields and missing attributes are NULL.
+    def columnSource(self, column):
+        if self.rowsAreLists:
+            return "(row[%d] or None)" % self.columns.index(column)
+        return "row.get(%r)" % column
+
+    def size(self):
+        return os.path.getsize(self.fileName)
+
+# Returns the function of a ColumnBlock of a COLUMNAR table that evaluates a
+# condition on whole columns, giving a NumPy array of booleans, or None if it
+# cannot: the condition must compare a column with a constant that compares
+# with all of its values the same way, as a number for numeric columns and
+# as text for string columns, or be IS [NOT] NULL. NULL is false, as in
+# WHERE. The result is the one the rows of the CSV file would give.
+def blockFilter(table, condition):
+    kind = condition[0]
+    if kind == "isnull" and condition[1][0] == "column":
+        name, negated = condition[1][2], condition[2]
+        def testNull(block):
+            import numpy
+            nulls = block.nulls(name)
+            if nulls is None:
+                return numpy.full(len(block), negated)
+            return ~nulls if negated else nulls
+        return testNull
+    if kind == "binary" and condition[1] in COMPARISONS:
+        op, left, right = condition[1:]
+        if left[0] == "literal":
+            op, left, right = SWAPPED_COMPARISONS[op], right, left
+        if left[0] == "column" and right[0] == "literal":
+            return columnComparison(table, left[2], [(op, right[1])])
+    if (kind == "between" and not condition[4] and
+            condition[1][0] == "column" and condition[2][0] == "literal" and
+            condition[3][0] == "literal"):
+        return columnComparison(table, condition[1][2],
+                                [(">=", condition[2][1]),
+                                 ("<=", condition[3][1])])
+    return None
+
+# A string column can hold strings of numbers, which compare as numbers
+# with numbers and strings of numbers, so it is only compared with strings
+# that are not numbers. A numeric column is compared with numbers and
+# strings of numbers.
+def columnComparison(table, name, comparisons):
+    columnType = table.columnTypes[name]
+    if columnType == "string":
+        if not all(isText(("literal", value)) for op, value in comparisons):
+            return None
+    else:
+        comparisons = [(op, value if isNumber(value) else toNumber(value))
+                       for op, value in comparisons]
+        if not all(isNumber(value) and not isinstance(value, bool)
+                   for op, value in comparisons):
+            return None
+    def test(block):
+        values = block.array(name)
+        selection = None
+        for op, value in comparisons:
+            if columnType == "string":
+                op, value = codeComparison(block.columnFile, name, op, value)
+            selected = COMPARISONS[op][1](values, value)
+            selection = selected if selection is None else selection & selected
+        nulls = block.nulls(name)
+        if nulls is not None:
+            selection &= ~nulls
+        return selection
+    return test
+
+# Returns the comparison of the dictionary codes of a string column that
+# gives the comparison of its strings with a string. Codes follow the order
+# of the strings, and a string no row has gets the code -2, which no row
+# has either.
+def codeComparison(columnFile, name, op, string):
+    if op in ("=", "<>"):
+        code = columnFile.code(name, string)
+        return op, -2 if code is None else code
+    if op == "<":
+        return "<", columnFile.firstCodeAbove(name, string)
+    if op == "<=":
+        return "<", columnFile.firstCodeAbove(name, string, False)
+    if op == ">":
+        return ">=", columnFile.firstCodeAbove(name, string, False)
+    return ">=", columnFile.firstCodeAbove(name, string)
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# Planning and execution.
+
+class Query(object):
+    # text         - The SQL query.
+    # tables       - Dictionary of the tables the query may use, from their
+    #                name to a Table or to the name of their file.
+    # joinStrategy - "broadcast", "reduce" or "auto" (see BROADCAST_LIMIT).
+    def __init__(self, text, tables, joinStrategy="auto"):
+        self.text = text
+        self.tablesByName = {}
+        for name, table in tables.items():
+            if not isinstance(table, Table):
+                table = Table(name, table)
+            self.tablesByName[name.lower()] = table
+        self.joinStrategy = joinStrategy
+        self.plan(parse(text))
+
+    # +++ Name resolution.
+
+    def bindTables(self, references):
+        self.aliases = []
+        self.tableOfAlias = {}
+        for name, alias in references:
+            table = self.tablesByName.get(name.lower())
+            if table is None:
+                raise SQLError("Unknown table %s. Known tables are %s."
+                               % (name, ", ".join(sorted(self.tablesByName))))
+            if alias.lower() in self.tableOfAlias:
+                raise SQLError("Table %s is used twice, give it an alias"
+                               % alias)
+            self.aliases.append(alias)
+            self.tableOfAlias[alias.lower()] = (alias, table)
+        if len(self.aliases) > 2:
+            raise SQLError("Joins of more than two tables are not supported")
+
+    # Replaces the columns of an expression by ("column", alias, column name
+    # as in the file). Unknown unqualified names are looked up in
+    # selectAliases, a dictionary from lowercased alias to expression.
+    def resolve(self, expression, selectAliases=None):
+        if expression[0] != "column":
+            return mapChildren(expression,
+                               lambda child: self.resolve(child, selectAliases))
+        table, name = expression[1], expression[2]
+        if table is not None:
+            if table.lower() not in self.tableOfAlias:
+                raise SQLError("Unknown table %s in %s.%s"
+                               % (table, table, name))
+            alias, found = self.tableOfAlias[table.lower()]
+            column = found.findColumn(name)
+            if column is None:
+                raise SQLError("Table %s has no column %s" % (alias, name))
+            return ("column", alias, column)
+
+        matches = []
+        for alias in self.aliases:
+            column = self.tableOfAlias[alias.lower()][1].findColumn(name)
+            if column is not None:
+                matches.append(("column", alias, column))
+        if len(matches) > 1:
+            raise SQLError("Column %s is ambiguous, qualify it with its table"
+                           % name)
+        if matches:
+            return matches[0]
+        if selectAliases is not None and name.lower() in selectAliases:
+            return selectAliases[name.lower()]
+        raise SQLError("Unknown column %s" % name)
+
+    def expandSelect(self, select):
+        items = []
+        for expression, alias in select:
+            if expression[0] != "star":
+                items.append((self.resolve(expression), alias))
+                continue
+            aliases = self.aliases
+            if expression[1] is not None:
+                if expression[1].lower() not in self.tableOfAlias:
+                    raise SQLError("Unknown table %s" % expression[1])
+                aliases = [self.tableOfAlias[expression[1].lower()][0]]
+            for tableAlias in aliases:
+                table = self.tableOfAlias[tableAlias.lower()][1]
+                for column in table.columns:
+                    items.append((("column", tableAlias, column), None))
+        return items
+
+    # +++ Planning.
+
+    def plan(self, query):
+        self.bindTables(query["tables"])
+        select = self.expandSelect(query["select"])
+        self.select = [expression for expression, alias in select]
+        self.columnNames = [alias or (expression[2] if expression[0] == "column"
+                                      else formatExpression(expression))
+                            for expression, alias in select]
+        selectAliases = dict((alias.lower(), expression)
+                             for expression, alias in select if alias)
+
+        conditions = [condition for where in query["conditions"]
+                      for condition in conjuncts(self.resolve(where))]
+        for condition in conditions:
+            if hasAggregate(condition):
+                raise SQLError("Aggregates cannot be used in WHERE, use HAVING")
+            if hasGrouping(condition):
+                raise SQLError("GROUPING cannot be used in WHERE")
+
+        # The grouping sets of the GROUP BY clause: those of its items
+        # combined in every way, as in SQL. A plain expression is a single
+        # set, ROLLUP(a, b) the sets (a, b), (a) and (), and CUBE(a, b) the
+        # sets (a, b), (a), (b) and ().
+        groupingSets = [()]
+        for item in query["groupBy"]:
+            if item[0] == "rollup":
+                sets = [item[1][:size] for size in range(len(item[1]), -1, -1)]
+            elif item[0] == "cube":
+                sets = [subset for size in range(len(item[1]), -1, -1)
+                        for subset in itertools.combinations(item[1], size)]
+            elif item[0] == "groupingSets":
+                sets = list(item[1])
+            else:
+                sets = [(item,)]
+            groupingSets = [left + right for left in groupingSets
+                            for right in sets]
+        groupingSets = [[self.resolveGroupBy(expression, selectAliases)
+                         for expression in groupingSet]
+                        for groupingSet in groupingSets]
+        groupBy = []
+        for expression in itertools.chain(*groupingSets):
+            if expression not in groupBy:
+                groupBy.append(expression)
+        having = None
+        if query["having"] is not None:
+            having = self.resolve(query["having"], selectAliases)
+
+        self.grouped = (bool(groupBy) or having is not None or
+                        any(hasAggregate(expression)
+                            for expression in self.select))
+        if query["distinct"] and not self.grouped:
+            groupBy = list(self.select)
+            groupingSets = [groupBy]
+            self.grouped = True
+        if self.grouped:
+            self.planGroup(groupBy, groupingSets, having)
+        elif any(hasGrouping(expression) for expression in self.select):
+            raise SQLError("GROUPING can only be used with GROUP BY")
+
+        # Conditions on a single table are pushed down to its mapper. The
+        # others must be equalities between the two tables (the join keys)
+        # or are checked on the joined rows.
+        self.filters = dict((alias, []) for alias in self.aliases)
+        self.joinKeys = []
+        self.residual = []
+        for condition in conditions:
+            aliases = set(column[1] for column in columnsOf(condition))
+            if len(aliases) <= 1:
+                alias = aliases.pop() if aliases else self.aliases[0]
+                self.filters[alias].append(condition)
+            elif (condition[0] == "binary" and condition[1] == "=" and
+                  self.sideOf(condition[2]) is not None and
+                  self.sideOf(condition[3]) is not None and
+                  self.sideOf(condition[2]) != self.sideOf(condition[3])):
+                if self.sideOf(condition[2]) == 0:
+                    self.joinKeys.append((condition[2], condition[3]))
+                else:
+                    self.joinKeys.append((condition[3], condition[2]))
+            else:
+                self.residual.append(condition)
+        if len(self.aliases) == 2 and not self.joinKeys:
+            raise SQLError("A join needs a condition of the form "
+                           "a.column = b.column")
+
+        # The columns the rows keep after their table is scanned, in the
+        # order of the joined rows: those of the first table, then those of
+        # the second one.
+        used = list(self.select) + self.residual
+        if self.grouped:
+            used = list(self.groupBy) + [argument
+                                         for aggregate in self.aggregates
+                                         for argument in aggregate[2]]
+            used += self.residual
+        self.keptColumns = []
+        for alias in self.aliases:
+            table = self.tableOfAlias[alias.lower()][1]
+            columns = set(column[2] for expression in used
+                          for column in columnsOf(expression)
+                          if column[1] == alias)
+            self.keptColumns.append([column for column in table.columns
+                                     if column in columns])
+
+        # The filters of COLUMNAR tables that blockFilter evaluates on whole
+        # columns are taken out of the filters of the rows, and the rows
+        # hold only the columns the rest of the query reads, given by
+        # scannedColumns (see scanner).
+        self.blockFilters = dict((alias, []) for alias in self.aliases)
+        self.scannedColumns = []
+        for side, alias in enumerate(self.aliases):
+            table = self.tableOfAlias[alias.lower()][1]
+            if table.columnTypes is None:
+                self.scannedColumns.append(None)
+                continue
+            rowFilters = []
+            for condition in self.filters[alias]:
+                test = blockFilter(table, condition)
+                if test is None:
+                    rowFilters.append(condition)
+                else:
+                    self.blockFilters[alias].append((condition, test))
+            self.filters[alias] = rowFilters
+            columns = set(self.keptColumns[side])
+            for expression in rowFilters + [keys[side]
+                                            for keys in self.joinKeys]:
+                columns.update(column[2] for column in columnsOf(expression))
+            self.scannedColumns.append([column for column in table.columns
+                                        if column in columns])
+
+    # Resolves an expression of GROUP BY, which can also be the position of a
+    # select item.
+    def resolveGroupBy(self, expression, selectAliases):
+        if (expression[0] == "literal" and isinstance(expression[1], int)
+                and 1 <= expression[1] <= len(self.select)):
+            return self.select[expression[1] - 1]
+        return self.resolve(expression, selectAliases)
+
+    # Returns 0 or 1 if the expression uses the columns of only the first or
+    # only the second table, None otherwise.
+    def sideOf(self, expression):
+        aliases = set(column[1] for column in columnsOf(expression))
+        if len(aliases) != 1:
+            return None
+        return self.aliases.index(aliases.pop())
+
+    # The rows of a group are (group key values..., aggregate values...). The
+    # select items and HAVING are rewritten to read them from these slots.
+    #
+    # A query with several grouping sets has groupingSets set to the list of
+    # their masks, in which bit i is set when the i-th expression of groupBy
+    # is not in the set. Every group of every set is a group of its own,
+    # whose key values are NULL outside its set, and its rows end with the
+    # mask of the set, which GROUPING reads. A grouping set given twice is
+    # computed once.
+    def planGroup(self, groupBy, groupingSets, having):
+        self.groupBy = groupBy
+        self.groupingSets = []
+        for groupingSet in groupingSets:
+            mask = sum(1 << index for index, expression in enumerate(groupBy)
+                       if expression not in groupingSet)
+            if mask not in self.groupingSets:
+                self.groupingSets.append(mask)
+        if self.groupingSets == [0]:
+            self.groupingSets = None
+        self.aggregates = []
+        self.groupSelect = [self.bindGroup(expression)
+                            for expression in self.select]
+        self.having = None
+        self.havingText = None
+        if having is not None:
+            self.having = self.bindGroup(having)
+            self.havingText = formatExpression(having)
+        for expression in self.aggregates:
+            Aggregate(expression)
+
+    def bindGroup(self, expression):
+        if expression in self.groupBy:
+            return ("slot", self.groupBy.index(expression))
+        if expression[0] == "call" and expression[1] == "GROUPING":
+            if len(expression[2]) != 1 or expression[2][0] not in self.groupBy:
+                raise SQLError("The argument of GROUPING must be an "
+                               "expression of GROUP BY")
+            if self.groupingSets is None:
+                return ("literal", 0)
+            return ("grouping", self.groupBy.index(expression[2][0]))
+        if isAggregate(expression):
+            if expression not in self.aggregates:
+                self.aggregates.append(expression)
+            return ("slot",
+                    len(self.groupBy) + self.aggregates.index(expression))
+        if expression[0] == "column":
+            raise SQLError("Column %s must be in GROUP BY or in an aggregate"
+                           % formatExpression(expression))
+        return mapChildren(expression, self.bindGroup)
+
+    def chooseJoinStrategy(self):
+        if self.joinStrategy != "auto":
+            return self.joinStrategy
+        sizes = [self.tableOfAlias[alias.lower()][1].size()
+                 for alias in self.aliases]
+        if min(sizes) <= BROADCAST_LIMIT:
+            return "broadcast"
+        return "reduce"
+
+    # +++ Compilation.
+
+    # Returns the columnSource of a Compiler of joined rows.
+    def joinedColumns(self):
+        slots = {}
+        for side in range(len(self.aliases)):
+            for column in self.keptColumns[side]:
+                slots[(self.aliases[side], column)] = len(slots)
+        return lambda column: "row[%d]" % slots[(column[1], column[2])]
+
+    # Returns the columnSource of a Compiler of the rows of a table.
+    def tableColumns(self, side):
+        if self.scannedColumns[side] is not None:
+            columns = self.scannedColumns[side]
+            return lambda column: "row[%d]" % columns.index(column[2])
+        table = self.tableOfAlias[self.aliases[side].lower()][1]
+        return lambda column: table.columnSource(column[2])
+
+    # Returns the type of the values of an expression that is a numeric
+    # column of a COLUMNAR table, None for other expressions.
+    def numericType(self, expression):
+        if expression[0] != "column":
+            return None
+        table = self.tableOfAlias[expression[1].lower()][1]
+        if table.columnTypes is None:
+            return None
+        columnType = table.columnTypes[expression[2]]
+        return None if columnType == "string" else columnType
+
+    # Returns the mapper of the records of a table that runs function on
+    # its rows. The records of COLUMNAR tables are blocks of rows: the
+    # block filters of the table select the rows of a block on whole
+    # columns, and only those rows are made, from the scanned columns. The
+    # engine counts a block as a single record, so the pairs of every block
+    # are combined right away rather than after CHUNK_SIZE blocks. mr is
+    # None for scans outside of a job.
+    def scanner(self, mr, side, function):
+        columns = self.scannedColumns[side]
+        if columns is None:
+            return function
+        tests = [test for condition, test
+                 in self.blockFilters[self.aliases[side]]]
+        def scanBlock(block):
+            selection = None
+            for test in tests:
+                selected = test(block)
+                if selection is None:
+                    selection = selected
+                else:
+                    selection &= selected
+            if selection is not None and not selection.any():
+                return
+            for row in block.rows(columns, selection):
+                function(row)
+            if mr is not None and mr.combiner is not None:
+                mr.combine()
+        return scanBlock
+
+    # Returns the function of a row of a table, named name, that checks the
+    # pushed down conditions of the table, computes the join key of the row
+    # and runs the lines of body when the key is not NULL. body reads the
+    # key from key and the kept columns of the row from kept. names are
+    # added to the names the function can use.
+    def keyedScan(self, side, name, body, **names):
+        compiler = Compiler(self.tableColumns(side))
+        lines = []
+        conditions = self.filters[self.aliases[side]]
+        if conditions:
+            condition = conjunctionOf(conditions)
+            lines += compiler.hoist([condition])
+            lines += ["if not %s:" % compiler.source(condition, True),
+                      "    return"]
+        keys = [keys[side] for keys in self.joinKeys]
+        lines += compiler.hoist(keys)
+        sources = []
+        for key, otherKey in self.joinKeys:
+            if side == 1:
+                key, otherKey = otherKey, key
+            source = compiler.source(key)
+            if self.numericType(key) != self.numericType(otherKey):
+                source = "keyString(%s)" % source
+            sources.append(source)
+        lines.append("key = %s" % packSource(sources, "()"))
+        lines += ["if %s:" % ("key is None" if len(keys) == 1
+                              else "None in key"),
+                  "    return"]
+        lines.append("kept = (%s)" % "".join(
+            compiler.source(("column", self.aliases[side], column)) + ", "
+            for column in self.keptColumns[side]))
+        return compiler.define(name, "def %s(row):\n" % name + "".join(
+            "    %s\n" % line for line in lines + body), **names)
+
+    # Returns the function that takes the rows reaching the end of the scan
+    # or join, checks the conditions on them and emits the result of the
+    # query or, for grouped queries, the partial aggregates of their group.
+    # columnSource reads the columns of these rows, see Compiler.
+    def consumer(self, mr, columnSource, conditions):
+        compiler = Compiler(columnSource)
+        lines = []
+        if conditions:
+            condition = conjunctionOf(conditions)
+            lines += compiler.hoist([condition])
+            lines.append("if not %s:" % compiler.source(condition, True))
+            lines.append("    return")
+        if self.grouped:
+            aggregates = [Aggregate(expression)
+                          for expression in self.aggregates]
+            lines += compiler.hoist(self.groupBy + [aggregate.argument for
+                                                    aggregate in aggregates
+                                                    if aggregate.argument])
+            keys = [compiler.source(expression) for expression in self.groupBy]
+            partials = packSource([aggregate.partialSource(compiler)
+                                   for aggregate in aggregates], "[]")
+            if self.groupingSets is None:
+                lines.append("emitIntermediate(%s, %s)" % (
+                    packSource(keys, "()"), partials))
+            else:
+                # The row is emitted once per grouping set, keyed on the mask
+                # of the set and the key values, with NULL outside the set.
+                lines += ["key%d = %s" % (index, key)
+                          for index, key in enumerate(keys)]
+                lines.append("partials = %s" % partials)
+                for mask in self.groupingSets:
+                    lines.append("emitIntermediate((%d, %s), partials)" % (
+                        mask, "".join("None, " if mask >> index & 1
+                                      else "key%d, " % index
+                                      for index in range(len(keys)))))
+        else:
+            lines += compiler.hoist(self.select)
+            lines.append("emit((%s))" % "".join(
+                compiler.source(expression) + ", "
+                for expression in self.select))
+        return compiler.define("consume", "def consume(row):\n" + "".join(
+            "    %s\n" % line for line in lines),
+                               emit=mr.emit,
+                               emitIntermediate=mr.emit_intermediate)
+
+    # Returns the combiner and the reducer of the partial aggregates. The
+    # reducer reads the select items and HAVING from the rows of the groups.
+    # The key of a group is the value of the GROUP BY expression, or the
+    # tuple of the values of several ones, and its values are the partial
+    # aggregate of the aggregate, or lists of those of several ones (see
+    # packSource). With grouping sets, the key is the tuple of the mask of
+    # the set and of the values.
+    def groupFunctions(self, mr):
+        aggregates = [Aggregate(expression) for expression in self.aggregates]
+        compiler = Compiler()
+        output = compiler.tupleFunction(self.groupSelect)
+        having = None
+        if self.having is not None:
+            having = compiler.function(self.having, True)
+
+        merge = makeMerge(aggregates)
+        def combiner(key, partials):
+            return merge(partials)
+
+        groupingSets = self.groupingSets is not None
+        singleKey = len(self.groupBy) == 1 and not groupingSets
+        singleAggregate = len(aggregates) == 1
+        emptyPartials = [aggregate.emptyPartial() for aggregate in aggregates]
+        if singleAggregate:
+            emptyPartials = emptyPartials[0]
+        def reducer(key, partials):
+            # Only the keys of emptyGroupKeys can have no partials.
+            partials = merge(partials) if partials else emptyPartials
+            mask = ()
+            if singleKey:
+                key = (key,)
+            elif groupingSets:
+                key, mask = key[1:], key[:1]
+            if singleAggregate:
+                partials = [partials]
+            row = key + tuple(aggregate.result(partial) for aggregate, partial
+                              in zip(aggregates, partials)) + mask
+            if having is None or having(row):
+                mr.emit(output(row))
+        return combiner, reducer
+
+    # Returns the keys of the groups that have a row even when no row
+    # reaches them, as in SQL: the single group of a query with aggregates
+    # and no GROUP BY, and that of an empty grouping set, such as the grand
+    # total of a ROLLUP.
+    def emptyGroupKeys(self):
+        if self.groupingSets is None:
+            return [()] if not self.groupBy else []
+        allNull = (1 << len(self.groupBy)) - 1
+        if allNull not in self.groupingSets:
+            return []
+        return [(allNull,) + (None,) * len(self.groupBy)]
+
+    # +++ Jobs.
+    #
+    # A job is a dictionary with the arguments of MapReduce.execute
+    # (fileNameList, fileFormat, mapper, reducer, combiner and defaultKeys)
+    # and the lines describing it. The first job of a two job query has
+    # intermediate set.
+
+    def jobs(self, mr):
+        if len(self.aliases) == 1:
+            return [self.scanJob(mr)]
+        if self.chooseJoinStrategy() == "broadcast":
+            return [self.broadcastJob(mr)]
+        return self.reduceJoinJobs(mr)
+
+    # Adds the combiner and reducer of grouped queries to a job.
+    def finishJob(self, mr, job):
+        if self.grouped:
+            job["combiner"], job["reducer"] = self.groupFunctions(mr)
+            job["defaultKeys"] = self.emptyGroupKeys()
+            job["description"].append("  combine and reduce: merge the partial "
+                                      "aggregates of each group")
+            if self.having is not None:
+                job["description"].append("  having: " + self.havingText)
+        return job
+
+    def describeScan(self, side, description):
+        alias = self.aliases[side]
+        table = self.tableOfAlias[alias.lower()][1]
+        if self.scannedColumns[side] is not None:
+            description.append("  scan %s (%s, %s), reading %s" % (
+                alias, table.fileName, table.fileFormat,
+                ", ".join(self.scannedColumns[side]) or "no columns"))
+            for condition, test in self.blockFilters[alias]:
+                description.append("    filter on whole columns: " +
+                                   formatExpression(condition))
+        else:
+            description.append("  scan %s (%s, %s), keeping %s" % (
+                alias, table.fileName, table.fileFormat,
+                ", ".join(self.keptColumns[side]) or "no columns"))
+        for condition in self.filters[alias]:
+            description.append("    filter: " + formatExpression(condition))
+
+    def describeJoin(self, description):
+        description.append("  join on " + " AND ".join(
+            "%s = %s" % (formatExpression(left), formatExpression(right))
+            for left, right in self.joinKeys))
+
+    def describeOutput(self, conditions, description):
+        if conditions:
+            description.append("  filter: " + formatExpression(
+                conjunctionOf(conditions)))
+        if self.grouped:
+            description.append("  emit: group (%s) -> partial %s" % (
+                ", ".join(formatExpression(expression)
+                          for expression in self.groupBy),
+                ", ".join(formatExpression(expression)
+                          for expression in self.aggregates) or "nothing"))
+            if self.groupingSets is not None:
+                description.append("    once per grouping set: " + ", ".join(
+                    "(%s)" % ", ".join(formatExpression(expression)
+                                       for index, expression
+                                       in enumerate(self.groupBy)
+                                       if not mask >> index & 1)
+                    for mask in self.groupingSets))
+        else:
+            description.append("  emit: " + ", ".join(
+                formatExpression(expression) for expression in self.select))
+
+    # The mapper reads only the columns the query uses, so kept columns
+    # matter only to joins.
+    def scanJob(self, mr):
+        alias = self.aliases[0]
+        table = self.tableOfAlias[alias.lower()][1]
+        consume = self.consumer(mr, self.tableColumns(0),
+                                self.filters[alias] + self.residual)
+        mapper = self.scanner(mr, 0, consume)
+
+        description = ["%s job:" % ("Group" if self.grouped else "Map-only")]
+        self.describeScan(0, description)
+        self.describeOutput(self.residual, description)
+        return self.finishJob(mr, {"fileNameList": [table.fileName],
+                                   "fileFormat": table.fileFormat,
+                                   "mapper": mapper, "reducer": None,
+                                   "description": description})
+
+    # The smaller table is loaded into a hash table from join key to its
+    # rows. The mapper joins every row of the other table with the rows of
+    # its key. Workers are forked after the hash table is built and share it.
+    def broadcastJob(self, mr):
+        sizes = [self.tableOfAlias[alias.lower()][1].size()
+                 for alias in self.aliases]
+        built = 0 if sizes[0] <= sizes[1] else 1
+        probed = 1 - built
+        builtTable = self.tableOfAlias[self.aliases[built].lower()][1]
+        probedTable = self.tableOfAlias[self.aliases[probed].lower()][1]
+
+        rowsOfKey = {}
+        build = self.scanner(None, built, self.keyedScan(
+            built, "build", ["rowsOfKey.setdefault(key, []).append(kept)"],
+            rowsOfKey=rowsOfKey))
+        for record in readRecords(builtTable.fileName, builtTable.fileFormat):
+            build(record)
+
+        consume = self.consumer(mr, self.joinedColumns(), self.residual)
+        mapper = self.scanner(mr, probed, self.keyedScan(probed, "mapper", [
+            "rows = rowsOfKey.get(key)",
+            "if rows is not None:",
+            "    for builtRow in rows:",
+            "        consume(%s)" % ("builtRow + kept" if built == 0
+                                     else "kept + builtRow")],
+                                rowsOfKey=rowsOfKey, consume=consume))
+
+        description = ["Broadcast join job%s:" % ("" if self.grouped
+                                                  else ", map-only")]
+        self.describeScan(built, description)
+        description.append("    hash table of %d keys" % len(rowsOfKey))
+        self.describeScan(probed, description)
+        self.describeJoin(description)
+        self.describeOutput(self.residual, description)
+        return self.finishJob(mr, {"fileNameList": [probedTable.fileName],
+                                   "fileFormat": probedTable.fileFormat,
+                                   "mapper": mapper, "reducer": None,
+                                   "description": description})
+
+    # Both tables are mapped to (join key, (side, kept columns)) and the
+    # reducer joins the rows of the two sides of each key. With a GROUP BY
+    # the joined rows are written to a temporary JSON file that a second job
+    # groups.
+    def reduceJoinJobs(self, mr):
+        tables = [self.tableOfAlias[alias.lower()][1] for alias in self.aliases]
+        if tables[0].fileFormat != tables[1].fileFormat:
+            raise SQLError("A reduce-side join needs two tables of the same "
+                           "format")
+        if tables[0].fileName == tables[1].fileName:
+            raise SQLError("A reduce-side join needs two different files")
+        sideOf = self.sideOfRecord(tables)
+        sideMappers = [self.scanner(mr, side, self.keyedScan(
+            side, "mapSide", ["emitIntermediate(key, (%d, kept))" % side],
+            emitIntermediate=mr.emit_intermediate)) for side in (0, 1)]
+
+        def mapper(record):
+            side = sideOf(record)
+            if side is not None:
+                sideMappers[side](record)
+
+        description = ["Reduce-side join job:"]
+        self.describeScan(0, description)
+        self.describeScan(1, description)
+        self.describeJoin(description)
+        if self.grouped:
+            residual = None
+            if self.residual:
+                residual = Compiler(self.joinedColumns()).function(
+                    conjunctionOf(self.residual), True)
+            def consume(row):
+                if residual is None or residual(row):
+                    mr.emit(row)
+            if self.residual:
+                description.append("  filter: " + formatExpression(
+                    conjunctionOf(self.residual)))
+            description.append("  emit: the joined rows, to a temporary file")
+        else:
+            consume = self.consumer(mr, self.joinedColumns(), self.residual)
+            self.describeOutput(self.residual, description)
+
+        def reducer(key, values):
+            rows = ([], [])
+            for side, row in values:
+                rows[side].append(row)
+            for left in rows[0]:
+                for right in rows[1]:
+                    consume(left + right)
+
+        jobs = [{"fileNameList": [tables[0].fileName, tables[1].fileName],
+                 "fileFormat": tables[0].fileFormat, "mapper": mapper,
+                 "reducer": reducer, "description": description}]
+        if self.grouped:
+            jobs[0]["intermediate"] = True
+            description = ["Group job:", "  scan the joined rows"]
+            self.describeOutput([], description)
+            # The file name is set by run.
+            jobs.append(self.finishJob(mr, {
+                "fileNameList": None, "fileFormat": "JSON",
+                "mapper": self.consumer(mr, self.joinedColumns(), []),
+                "reducer": None, "description": description}))
+        return jobs
+
+    # Returns the function that tells which of the two tables of a
+    # reduce-side join a record comes from: CSV rows by their tag (see
+    # Table) or else their number of fields, SOXML and JSON rows by a column
+    # only one of the tables has and blocks of COLUMNAR tables by their file.
+    def sideOfRecord(self, tables):
+        if tables[0].columnTypes is not None:
+            sideOfFile = {tables[0].fileName: 0, tables[1].fileName: 1}
+            return lambda block: sideOfFile.get(block.fileName)
+        if tables[0].rowsAreLists:
+            if (tables[0].tag is not None and
+                    tables[1].tag not in (None, tables[0].tag)):
+                sideOfTag = {tables[0].tag: 0, tables[1].tag: 1}
+                return lambda record: sideOfTag.get(record[0])
+            lengths = [len(table.columns) for table in tables]
+            if lengths[0] == lengths[1]:
+                raise SQLError("Cannot tell the rows of %s and %s apart for a "
+                               "reduce-side join" % tuple(self.aliases))
+            sideOfLength = {lengths[0]: 0, lengths[1]: 1}
+            return lambda record: sideOfLength.get(len(record))
+
+        marks = [[column for column in tables[side].columns
+                  if column not in tables[1 - side].columns] for side in (0, 1)]
+        if not marks[0] and not marks[1]:
+            raise SQLError("Cannot tell the rows of %s and %s apart for a "
+                           "reduce-side join" % tuple(self.aliases))
+        def sideOf(record):
+            for side in (0, 1):
+                for column in marks[side]:
+                    if column in record:
+                        return side
+            return None
+        return sideOf
+
+    # Returns the description of the jobs the query runs as.
+    def explain(self):
+        return "\n".join(line for job in self.jobs(MapReduce())
+                         for line in job["description"])
+
+    # Runs the query. The options are passed to MapReduce.execute, the
+    # default outputFormat being "CSV". The first job of a two job query
+    # gets only numWorkers, memoryBudget and splitSize.
+    def run(self, mr=None, **options):
+        if mr is None:
+            mr = MapReduce()
+        options.setdefault("outputFormat", "CSV")
+        joinedPath = None
+        try:
+            for job in self.jobs(mr):
+                fileNameList = job["fileNameList"] or [joinedPath]
+                jobOptions = options
+                if job.get("intermediate"):
+                    fd, joinedPath = tempfile.mkstemp(suffix=".json")
+                    os.close(fd)
+                    jobOptions = dict(
+                        (name, options[name]) for name in
+                        ("numWorkers", "memoryBudget", "splitSize")
+                        if name in options)
+                    jobOptions["outputPath"] = joinedPath
+                    jobOptions["outputFormat"] = "JSON"
+                mr.execute(fileNameList, job["mapper"], job["reducer"],
+                           job["fileFormat"], combiner=job.get("combiner"),
+                           defaultKeys=job.get("defaultKeys", ()),
+                           **jobOptions)
+        finally:
+            if joinedPath is not None:
+                os.remove(joinedPath)
+
+def conjunctionOf(conditions):
+    condition = conditions[0]
+    for other in conditions[1:]:
+        condition = ("binary", "AND", condition, other)
+    return condition
+
+# Compiles and runs a query, see Query.
+def runQuery(text, tables, mr=None, joinStrategy="auto", **options):
+    Query(text, tables, joinStrategy).run(mr, **options)
@@ -0,0 +1,115 @@
+# Text analysis for mappers of TEXT input.
+#
+# A Tokenizer turns a line into the list of its normalized words:
+#
+#     tokenizer = mapreduce.Tokenizer(stopWords=["a", "an", "the"])
+#
+#     def mapper(line):
+#         for word in tokenizer.tokens(line):
+#             mr.emit_intermediate(word, 1)
+#
+# The line is case folded as a whole, the words are found with one call of a
+# precompiled regular expression, stop words are dropped with a set lookup
+# and stems are computed once per distinct word and then looked up. Lines of
+# ASCII text, the common case, skip the regular expression: every character
+# that cannot be part of a word is turned into a space with bytes.translate,
+# which runs in C, and the line is split on white space.
+import re
+import string
+
+# A word is a run of letters and digits, possibly joined by apostrophes as in
+# "don't". Everything else, punctuation included, separates words.
+WORD_PATTERN = re.compile(r"\w+(?:['’]\w+)*")
+
+# Used instead of WORD_PATTERN when punctuation is kept: words are then the
+# runs of characters between white space, as str.split() gives them.
+SPACE_SEPARATED_PATTERN = re.compile(r"\S+")
+
+# Translation table of the ASCII fast path. It keeps the ASCII characters
+# matched by \w and the apostrophe and maps all other bytes to a space.
+WORD_BYTES = frozenset((string.ascii_letters + string.digits + "_'").encode())
+ASCII_SEPARATORS = bytes(byte if byte in WORD_BYTES else 32
+                         for byte in range(256))
+
+class Tokenizer(object):
+    # stopWords        - Words to leave out. They are normalized like the
+    #                    words of the text, so "The" also stops "the" when
+    #                    case folding. Entries that hold no word, such as ",",
+    #                    are ignored when punctuation is stripped.
+    # caseFold         - Set to False to keep the case of the words. Case
+    #                    folding is str.casefold, which also folds non ASCII
+    #                    letters ("Straße" becomes "strasse").
+    # stripPunctuation - Set to False to split on white space only and keep
+    #                    punctuation attached to the words.
+    # stemmer          - Optional function of a word that returns its stem,
+    #                    applied after stop words are removed. stem below is a
+    #                    light English stemmer. Any other function taking and
+    #                    returning a string works too, for example the stem
+    #                    method of NLTK's PorterStemmer.
+    def __init__(self, stopWords=(), caseFold=True, stripPunctuation=True,
+                 stemmer=None):
+        self.caseFold = caseFold
+        if stripPunctuation:
+            self.pattern = WORD_PATTERN
+        else:
+            self.pattern = SPACE_SEPARATED_PATTERN
+        self.stemmer = stemmer
+        self.stems = {}
+        self.stopWords = frozenset(word for stopWord in stopWords
+                                   for word in self.words(stopWord))
+
+    # Returns the words of text after case folding, before stop words are
+    # removed and stemming.
+    def words(self, text):
+        if self.caseFold:
+            text = text.casefold()
+        if self.pattern is not WORD_PATTERN or not text.isascii():
+            return self.pattern.findall(text)
+
+        words = text.encode().translate(ASCII_SEPARATORS).decode().split()
+        if "'" in text:
+            # Apostrophes only join words, so "'hello'" gives "hello".
+            words = [word for part in words
+                     for word in ((part,) if "'" not in part
+                                  else WORD_PATTERN.findall(part))]
+        return words
+
+    # Returns the list of the normalized words of text.
+    def tokens(self, text):
+        stopWords = self.stopWords
+        words = [word for word in self.words(text) if word not in stopWords]
+        if self.stemmer is None:
+            return words
+        stems = self.stems
+        for index in range(len(words)):
+            word = words[index]
+            wordStem = stems.get(word)
+            if wordStem is None:
+                wordStem = stems[word] = self.stemmer(word)
+            words[index] = wordStem
+        return words
+
+# Plural endings removed by stem, with what replaces them. A final "s" after
+# "s", "u" or "i" is kept, as in "glass", "status" or "this".
+PLURAL_SUFFIXES = (("sses", "ss"), ("ies", "y"), ("ss", "ss"), ("us", "us"),
+                   ("is", "is"), ("s", ""))
+
+# Other suffixes removed by stem, longest first, with what replaces them.
+SUFFIXES = (("ational", "ate"), ("fulness", "ful"), ("iveness", "ive"),
+            ("ization", "ize"), ("ingly", ""), ("edly", ""), ("ement", ""),
+            ("ness", ""), ("ment", ""), ("ing", ""), ("ed", ""), ("ly", ""))
+
+# Light English stemmer. It removes a plural ending and then one other suffix,
+# provided at least three letters are left, so "teachings", "teaching" and
+# "teached" all give "teach". It does not handle irregular forms.
+def stem(word):
+    return stripSuffix(stripSuffix(word, PLURAL_SUFFIXES), SUFFIXES)
+
+# Replaces the first of suffixes the word ends in.
+def stripSuffix(word, suffixes):
+    for suffix, replacement in suffixes:
+        if word.endswith(suffix):
+            if len(word) - len(suffix) < 3:
+                return word
+            return word[:len(word) - len(suffix)] + replacement
+    return word
@@ -0,0 +1,11 @@
+from setuptools import setup
+
+setup(
+    name="mapreduce",
+    version="1.0",
+    description="Single machine MapReduce engine of the Map Reduce and "
+                "Hadoop workshop labs",
+    packages=["mapreduce"],
+    python_requires=">=3.7",
+    extras_require={"images": ["Pillow"]},
+)
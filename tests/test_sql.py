@@ -0,0 +1,129 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from mapreduce import sql
+
+POSTS = """Id,Score,ViewCount,Title
+1,10,9,Alpha
+2,9,10,beta
+3,,5,
+4,100,20,Gamma
+5,2,abc,delta
+"""
+
+class SQLTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.tables = {"Posts": self.write("Posts.csv", POSTS)}
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, text):
+        fileName = os.path.join(self.directory, name)
+        with open(fileName, "w") as dataFile:
+            dataFile.write(text)
+        return fileName
+
+    # Returns the sorted lines of the result of a query.
+    def query(self, text, tables=None, **options):
+        outputPath = os.path.join(self.directory, "result.csv")
+        sql.Query(text, tables or self.tables).run(outputPath=outputPath,
+                                                   **options)
+        with open(outputPath) as result:
+            return sorted(result.read().splitlines())
+
+class ComparisonTest(SQLTestCase):
+    def testColumnsCompareAsNumbers(self):
+        self.assertEqual(self.query(
+            "SELECT Id FROM Posts WHERE Score > ViewCount"), ["1", "4"])
+
+    def testStringsOfNumbersCompareAsNumbers(self):
+        self.assertEqual(self.query(
+            "SELECT Id FROM Posts WHERE Score > '9'"), ["1", "4"])
+        self.assertEqual(self.query(
+            "SELECT Id FROM Posts WHERE '9' < Score"), ["1", "4"])
+        self.assertEqual(self.query(
+            "SELECT Id FROM Posts WHERE Score IN ('09', '100')"), ["2", "4"])
+
+    def testOtherStringsCompareAsText(self):
+        self.assertEqual(self.query(
+            "SELECT Id FROM Posts WHERE ViewCount >= 'a'"), ["5"])
+        self.assertEqual(self.query(
+            "SELECT Id FROM Posts WHERE Title < 'a'"), ["1", "4"])
+
+class AggregateTest(SQLTestCase):
+    def testExtremesOfNumbersAndStrings(self):
+        for numWorkers in (1, 2):
+            self.assertEqual(self.query(
+                "SELECT MIN(ViewCount), MAX(ViewCount) FROM Posts",
+                numWorkers=numWorkers), ["5,abc"])
+
+    def testAggregatesOfNoRows(self):
+        for numWorkers in (1, 2):
+            self.assertEqual(self.query(
+                "SELECT COUNT(*), SUM(Score), MIN(Title), AVG(Score) "
+                "FROM Posts WHERE Id > 100", numWorkers=numWorkers),
+                ["0,,,"])
+        self.assertEqual(self.query(
+            "SELECT COUNT(*) FROM Posts WHERE Id > 100 HAVING COUNT(*) > 0"),
+            [])
+        self.assertEqual(self.query(
+            "SELECT Title, COUNT(*) FROM Posts WHERE Id > 100 GROUP BY Title"),
+            [])
+        self.assertEqual(self.query(
+            "SELECT Title, COUNT(*) FROM Posts WHERE Id > 100 "
+            "GROUP BY ROLLUP(Title)"), [",0"])
+
+class FormatTest(SQLTestCase):
+    # Code holds numbers and strings, Rate floats.
+    ROWS = """Id,Score,ViewCount,Rate,Code,Title
+1,10,9,0.5,10,Alpha
+2,9,10,2.25,9,beta
+3,,5,,abc,
+4,100,20,1.0,,Gamma
+5,2,7,10.5,07,delta
+6,-3,7,-1.5,B2,10
+"""
+
+    QUERIES = [
+        "SELECT Id FROM T WHERE Score > ViewCount",
+        "SELECT Id FROM T WHERE Score > '9'",
+        "SELECT Id FROM T WHERE Score <= '9' AND ViewCount <> 7",
+        "SELECT Id FROM T WHERE Score > 'a' OR NOT Score < 'a'",
+        "SELECT Id FROM T WHERE Code > '8'",
+        "SELECT Id FROM T WHERE Code < 'b'",
+        "SELECT Id FROM T WHERE Code = 7 OR Code = 'abc'",
+        "SELECT Id FROM T WHERE Code > Score",
+        "SELECT Id FROM T WHERE Title > Code",
+        "SELECT Id FROM T WHERE Rate BETWEEN '0.5' AND 2",
+        "SELECT Id FROM T WHERE Rate > Score / 10",
+        "SELECT Id FROM T WHERE Score IN ('09', 100, '2')",
+        "SELECT Id FROM T WHERE Code IN ('07', 10)",
+        "SELECT Id FROM T WHERE Score IS NULL OR Code IS NULL",
+        "SELECT Id, Score || Code, LENGTH(Rate) FROM T WHERE Title LIKE '%a'",
+        "SELECT COUNT(*), SUM(Score), AVG(Rate), MIN(Code), MAX(Code) FROM T",
+        "SELECT MIN(Title), MAX(Title), COUNT(DISTINCT ViewCount) FROM T",
+        "SELECT ViewCount, COUNT(*), MAX(Rate) FROM T GROUP BY ViewCount",
+        "SELECT COUNT(*), MIN(Score) FROM T WHERE Score > 1000",
+    ]
+
+    def testColumnarTablesGiveTheRowsOfCSVTables(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest("NumPy is not installed")
+        from mapreduce import columnar
+        csvFileName = self.write("T.csv", self.ROWS)
+        columnsFileName = columnar.convert(csvFileName)
+        for text in self.QUERIES:
+            expected = self.query(text, {"T": csvFileName})
+            for numWorkers in (1, 2):
+                self.assertEqual(self.query(text, {"T": columnsFileName},
+                                            numWorkers=numWorkers),
+                                 expected, text)
+
+if __name__ == "__main__":
+    unittest.main()